@@ -1,3 +1,8 @@
+import time
+
+# Reference point for the cold start time reported once a worker is ready
+IMPORTED_AT = time.perf_counter()
+
 # temporarily adding organization column configurations, it should be moved to a database
 
 ORGANIZATION_COLUMNS = {
@@ -0,0 +1,338 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from operator import and_, or_
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.database import FACET_COLUMNS, _select_list
+from app.query_builder import SORT_ORDER
+
+# Columns held in memory, dictionary encoded: value -> bitset of row positions
+ENCODED_COLUMNS = ("status", "department", "location", "company", "position")
+EQUALITY_COLUMNS = ("status", "department", "location", "company")
+
+# Bitsets are split into chunks of this many rows, so a page only touches the chunks it
+# reads; within a chunk set bits are located a block at a time
+CHUNK_BITS = 65536
+_CHUNK_BYTES = CHUNK_BITS // 8
+_BLOCK_BYTES = 64
+
+# Organizations whose searches are counted towards becoming hot, per snapshot slot
+SEARCH_COUNTS_PER_ORG = 16
+
+if hasattr(int, "bit_count"):
+    _popcount = int.bit_count
+else:  # Python < 3.10
+    def _popcount(bits: int) -> int:
+        return bin(bits).count("1")
+
+
+def _like_pattern(pattern: str):
+    """Compile a SQLite LIKE pattern, matched anywhere, with SQLite's ASCII-only case folding."""
+    regex = "".join(".*" if char == "%" else "." if char == "_" else re.escape(char) for char in pattern)
+    return re.compile(regex, re.IGNORECASE | re.ASCII | re.DOTALL)
+
+
+def _union(bitsets: List[List[int]], chunks: int) -> List[int]:
+    if not bitsets:
+        return [0] * chunks
+    if len(bitsets) == 1:
+        return bitsets[0]
+    return [reduce(or_, parts) for parts in zip(*bitsets)]
+
+
+def _count(bitset: List[int]) -> int:
+    return sum(map(_popcount, bitset))
+
+
+def _set_positions(bitset: List[int], start: int, skip: int, limit: int) -> List[int]:
+    """Positions of set bits at or after ``start``, skipping the first ``skip`` of them."""
+    positions = []
+    first_chunk, start_bit = divmod(start, CHUNK_BITS)
+    for index in range(first_chunk, len(bitset)):
+        chunk = bitset[index]
+        if index == first_chunk and start_bit:
+            chunk = chunk >> start_bit << start_bit
+        if not chunk:
+            continue
+        if skip:
+            count = _popcount(chunk)
+            if skip >= count:
+                skip -= count
+                continue
+
+        data = chunk.to_bytes(_CHUNK_BYTES, "little")
+        for block_start in range(0, _CHUNK_BYTES, _BLOCK_BYTES):
+            block = int.from_bytes(data[block_start:block_start + _BLOCK_BYTES], "little")
+            if not block:
+                continue
+            if skip:
+                count = _popcount(block)
+                if skip >= count:
+                    skip -= count
+                    continue
+            # Binary digits, most significant first: bit n is at len(digits) - 1 - n
+            digits = format(block, "b")
+            last = len(digits) - 1
+            base = index * CHUNK_BITS + block_start * 8
+            digit = digits.rfind("1")
+            while digit >= 0:
+                if skip:
+                    skip -= 1
+                else:
+                    positions.append(base + last - digit)
+                    if len(positions) == limit:
+                        return positions
+                digit = digits.rfind("1", 0, digit)
+    return positions
+
+
+class ColumnarSnapshot:
+    """One organization's employees in sort order, with per-value bitsets.
+
+    Row position i is the i-th employee in SORT_ORDER, so any filter mask is already
+    sorted and a page is just the next set bits. A bitset is a list of Python ints of
+    CHUNK_BITS rows each: AND, OR and popcount run word-at-a-time in C.
+    """
+
+    def __init__(self, organization_id: str, version: int, rowids: List[int],
+                 values: Dict[str, List[Optional[str]]]):
+        self.organization_id = organization_id
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.rowids = rowids
+        self.size = len(rowids)
+        self.chunks = (self.size + CHUNK_BITS - 1) // CHUNK_BITS
+        self.all_rows = [(1 << min(CHUNK_BITS, self.size - index * CHUNK_BITS)) - 1 for index in range(self.chunks)]
+        self.bitmaps = {column: self._encode(column_values, self.size) for column, column_values in values.items()}
+
+    @staticmethod
+    def _encode(values: Sequence[Optional[str]], size: int) -> Dict[Optional[str], List[int]]:
+        positions = {}
+        for position, value in enumerate(values):
+            positions.setdefault(value, []).append(position)
+
+        bitmaps = {}
+        for value, members in positions.items():
+            bits = bytearray((size + 7) // 8)
+            for position in members:
+                bits[position >> 3] |= 1 << (position & 7)
+            bitmaps[value] = [int.from_bytes(bits[offset:offset + _CHUNK_BYTES], "little")
+                              for offset in range(0, len(bits), _CHUNK_BYTES)]
+        return bitmaps
+
+    def mask(self, filters: Dict[str, Any]) -> List[int]:
+        column_sets = [self.all_rows]
+        for column in EQUALITY_COLUMNS:
+            value = filters.get(column)
+            if not value:
+                continue
+            bitmaps = self.bitmaps[column]
+            column_sets.append(_union([bitmaps[item] for item in (value if isinstance(value, (list, tuple)) else (value,))
+                                       if item in bitmaps], self.chunks))
+
+        if filters.get('position'):
+            pattern = _like_pattern(filters['position'])
+            column_sets.append(_union([bits for value, bits in self.bitmaps['position'].items()
+                                       if value is not None and pattern.search(value)], self.chunks))
+
+        if len(column_sets) == 1:
+            return self.all_rows
+        return [reduce(and_, parts) for parts in zip(*column_sets)]
+
+    def facet_counts(self, mask: List[int]) -> Dict[str, Any]:
+        result = {}
+        for column, key in FACET_COLUMNS.items():
+            counts = {}
+            for value, bits in self.bitmaps[column].items():
+                count = sum(_popcount(a & b) for a, b in zip(mask, bits))
+                if count:
+                    counts[value] = count
+            result[key] = dict(sorted(counts.items()))
+        result["total_count"] = _count(mask)
+        return result
+
+
+class ColumnarEngine:
+    """In-memory filter engine for the most searched organizations.
+
+    SQLite stays the source of truth. An organization is loaded in the background
+    once it has been searched ``hot_threshold`` times, and a snapshot only answers
+    while its data version matches the database and it is younger than ``max_age``;
+    otherwise the caller falls back to SQLite and a reload is scheduled. At most
+    ``max_orgs`` snapshots are kept, least recently used first out.
+
+    Free-text queries are left to the full-text indexes: ``search`` and
+    ``facet_counts`` return None for anything the engine cannot answer.
+    """
+
+    def __init__(self, db, max_orgs: int = 4, hot_threshold: int = 3, max_age: Optional[float] = 300.0):
+        self.db = db
+        self.max_orgs = max_orgs
+        self.hot_threshold = hot_threshold
+        self.max_age = max_age
+        self._snapshots = OrderedDict()
+        # Searches per organization without a snapshot, most recent last; bounded because
+        # organization ids come from request headers
+        self._searches = OrderedDict()
+        self._loading = set()
+        self._lock = threading.Lock()
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="columnar-loader")
+        self.hits = 0
+        self.fallbacks = 0
+        self.loads = 0
+
+    @staticmethod
+    def supports(filters: Dict[str, Any]) -> bool:
+        return not filters.get('query')
+
+    def load(self, organization_id: str) -> Optional[ColumnarSnapshot]:
+        """Build a snapshot of the organization synchronously and install it.
+
+        An organization without employees gets no snapshot, so made-up ids cannot
+        take the place of real ones; it has to turn hot again before the next try.
+        Returns the snapshot, or None.
+        """
+        database = self.db.for_organization(organization_id)
+        version = database.data_version(organization_id)
+        with database.read_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            rows = cursor.execute(f"""
+                SELECT rowid, {", ".join(ENCODED_COLUMNS)} FROM employees
+                WHERE organization_id = ?
+                ORDER BY {SORT_ORDER}
+            """, (organization_id,)).fetchall()
+
+        if not rows:
+            with self._lock:
+                self._snapshots.pop(organization_id, None)
+                self._searches.pop(organization_id, None)
+            return None
+
+        values = {column: [row[index + 1] for row in rows] for index, column in enumerate(ENCODED_COLUMNS)}
+        snapshot = ColumnarSnapshot(organization_id, version, [row[0] for row in rows], values)
+
+        with self._lock:
+            self._snapshots[organization_id] = snapshot
+            self._snapshots.move_to_end(organization_id)
+            while len(self._snapshots) > self.max_orgs:
+                self._snapshots.popitem(last=False)
+            self.loads += 1
+        return snapshot
+
+    def _load_in_background(self, organization_id: str):
+        try:
+            self.load(organization_id)
+        finally:
+            with self._lock:
+                self._loading.discard(organization_id)
+
+    def snapshot(self, organization_id: str) -> Optional[ColumnarSnapshot]:
+        """Return a fresh snapshot for the organization, scheduling a (re)load when needed."""
+        version = self.db.data_version(organization_id)
+        with self._lock:
+            snapshot = self._snapshots.get(organization_id)
+            if snapshot is not None:
+                fresh = snapshot.version == version and (
+                    not self.max_age or time.monotonic() - snapshot.loaded_at < self.max_age)
+                if fresh:
+                    self._snapshots.move_to_end(organization_id)
+                    return snapshot
+                del self._snapshots[organization_id]
+                schedule = True
+            else:
+                searches = self._searches.pop(organization_id, 0) + 1
+                self._searches[organization_id] = searches
+                while len(self._searches) > SEARCH_COUNTS_PER_ORG * self.max_orgs:
+                    self._searches.popitem(last=False)
+                schedule = searches >= self.hot_threshold
+
+            if schedule and organization_id not in self._loading:
+                self._loading.add(organization_id)
+                self._loader.submit(self._load_in_background, organization_id)
+        return None
+
+    def _position_after(self, conn, snapshot: ColumnarSnapshot, after: Tuple[str, str, str]) -> Optional[int]:
+        """Binary search for the first position sorting after the keyset cursor."""
+        low, high = 0, snapshot.size
+        while low < high:
+            middle = (low + high) // 2
+            key = conn.execute("SELECT first_name, last_name, id FROM employees WHERE rowid = ?",
+                               (snapshot.rowids[middle],)).fetchone()
+            if key is None:
+                return None
+            if tuple(key) <= tuple(after):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def search(self, organization_id: str, filters: Dict[str, Any], limit: int, offset: int,
+               after: Optional[Tuple[str, str, str]] = None, count_cap: Optional[int] = None,
+               columns: Optional[Sequence[str]] = None) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+        """Same contract as Database.search_employees, or None to fall back to SQLite."""
+        snapshot = self.snapshot(organization_id) if self.supports(filters) else None
+        if snapshot is None:
+            self.fallbacks += 1
+            return None
+
+        mask = snapshot.mask(filters)
+        total_count = _count(mask)
+        if count_cap is not None:
+            total_count = min(total_count, count_cap + 1)
+
+        with self.db.for_organization(organization_id).read_pool.connection() as conn:
+            start = 0
+            if after is not None:
+                start = self._position_after(conn, snapshot, after)
+                if start is None:
+                    self.fallbacks += 1
+                    return None
+
+            positions = _set_positions(mask, start, offset, limit)
+            rowids = [snapshot.rowids[position] for position in positions]
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            rows = cursor.execute(f"""
+                SELECT employees.rowid, {_select_list(tuple(columns) if columns is not None else None)}
+                FROM employees WHERE rowid IN ({", ".join("?" for _ in rowids)})
+            """, rowids).fetchall() if rowids else []
+            names = [description[0] for description in cursor.description][1:] if rowids else []
+
+        by_rowid = {row[0]: row[1:] for row in rows}
+        if len(by_rowid) != len(rowids):
+            # Deleted by a writer this process has not heard about yet
+            self.fallbacks += 1
+            return None
+
+        self.hits += 1
+        return [dict(zip(names, by_rowid[rowid])) for rowid in rowids], total_count
+
+    def facet_counts(self, organization_id: str, filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Same contract as Database.get_facet_counts, or None to fall back to SQLite."""
+        snapshot = self.snapshot(organization_id) if self.supports(filters) else None
+        if snapshot is None:
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+        return snapshot.facet_counts(snapshot.mask(filters))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                # Counts only: /health is not scoped to an organization
+                "organizations": len(self._snapshots),
+                "rows": sum(snapshot.size for snapshot in self._snapshots.values()),
+                "max_orgs": self.max_orgs,
+                "loading": len(self._loading),
+                "hits": self.hits,
+                "fallbacks": self.fallbacks,
+                "loads": self.loads,
+            }
+
+    def close(self):
+        self._loader.shutdown(wait=True)
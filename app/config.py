@@ -0,0 +1,129 @@
+import os
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+# SQLite database file; defaults to /tmp/employees.db
+DATABASE_PATH = os.getenv("DATABASE_PATH")
+
+# Sharding: with DATABASE_SHARDS > 0, organizations are spread over that many SQLite
+# files next to DATABASE_PATH by a hash of their id, unless the move tool
+# (python -m app.sharding) pinned them to a shard of their own
+DATABASE_SHARDS = _env_int("DATABASE_SHARDS", 0)
+# Read-only snapshot copies per shard, used for reads while identical to the shard;
+# a changed shard is copied again at most every SHARD_REPLICA_REFRESH_INTERVAL seconds
+SHARD_REPLICAS = _env_int("SHARD_REPLICAS", 0)
+SHARD_REPLICA_REFRESH_INTERVAL = _env_float("SHARD_REPLICA_REFRESH_INTERVAL", 5.0)
+SHARD_REPLICA_DIR = os.getenv("SHARD_REPLICA_DIR")
+# How often workers look for organizations moved to another shard
+SHARD_CATALOG_REFRESH_INTERVAL = _env_float("SHARD_CATALOG_REFRESH_INTERVAL", 1.0)
+
+# Load the demo organizations (org_1, org_2) into an empty database on startup
+SEED_SAMPLE_DATA = _env_bool("SEED_SAMPLE_DATA", False)
+
+# Read connections opened and prepared before the app reports ready; 0 skips the warmup
+DB_WARMUP_CONNECTIONS = _env_int("DB_WARMUP_CONNECTIONS", 4)
+
+# Connection pool settings
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 8)
+DB_POOL_TIMEOUT = _env_float("DB_POOL_TIMEOUT", 5.0)
+DB_HEALTH_CHECK_INTERVAL = _env_float("DB_HEALTH_CHECK_INTERVAL", 30.0)
+DB_MMAP_SIZE = _env_int("DB_MMAP_SIZE", 256 * 1024 * 1024)
+DB_CACHE_SIZE_KB = _env_int("DB_CACHE_SIZE_KB", 64 * 1024)
+DB_BUSY_TIMEOUT_MS = _env_int("DB_BUSY_TIMEOUT_MS", 5000)
+# Prepared statements kept per connection. Search SQL is compiled per filter shape, so
+# this bounds how many shapes each connection serves without preparing again
+DB_STATEMENT_CACHE_SIZE = _env_int("DB_STATEMENT_CACHE_SIZE", 512)
+
+# Per-organization cache of available filter values
+FACET_CACHE_SIZE = _env_int("FACET_CACHE_SIZE", 1024)
+FACET_CACHE_TTL = _env_float("FACET_CACHE_TTL", 300)
+
+# /search/export streams run on their own read connections, at most this many at once
+# per database file; further exports are turned away with 503 rather than queued, and
+# 0 disables exports
+EXPORT_MAX_CONCURRENT = _env_int("EXPORT_MAX_CONCURRENT", 2)
+
+# Thread pool that runs blocking database calls off the event loop
+DB_EXECUTOR_WORKERS = _env_int("DB_EXECUTOR_WORKERS", DB_POOL_SIZE)
+DB_EXECUTOR_QUEUE_SIZE = _env_int("DB_EXECUTOR_QUEUE_SIZE", 64)
+
+# Rate limiting: "memory" (per process), "shared_memory" (all workers on a host) or "redis"
+RATE_LIMIT_REQUESTS_PER_MINUTE = _env_int("RATE_LIMIT_REQUESTS_PER_MINUTE", 100)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SHM_PATH = os.getenv(
+    "RATE_LIMIT_SHM_PATH",
+    "/dev/shm/employee_search_rate_limit" if os.path.isdir("/dev/shm") else "/tmp/employee_search_rate_limit"
+)
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+
+# Search result cache, keyed on organization and normalized filters; 0 disables it
+RESULT_CACHE_SIZE = _env_int("RESULT_CACHE_SIZE", 4096)
+RESULT_CACHE_TTL = _env_float("RESULT_CACHE_TTL", 30)
+
+# POST /search/batch: searches per request, and connections one batch may read on at once
+BATCH_SEARCH_MAX_SIZE = _env_int("BATCH_SEARCH_MAX_SIZE", 50)
+BATCH_SEARCH_PARALLELISM = _env_int("BATCH_SEARCH_PARALLELISM", min(4, os.cpu_count() or 1))
+
+# In-memory columnar engine for frequently searched organizations; 0 disables it
+COLUMNAR_MAX_ORGS = _env_int("COLUMNAR_MAX_ORGS", 0)
+COLUMNAR_HOT_THRESHOLD = _env_int("COLUMNAR_HOT_THRESHOLD", 3)
+COLUMNAR_MAX_AGE = _env_float("COLUMNAR_MAX_AGE", 300)
+
+# /suggest: in-memory name indexes for up to SUGGEST_MAX_ORGS organizations of at most
+# SUGGEST_MAX_ROWS employees; others, and organizations still loading, are served by SQLite
+SUGGEST_MAX_ORGS = _env_int("SUGGEST_MAX_ORGS", 8)
+SUGGEST_MAX_ROWS = _env_int("SUGGEST_MAX_ROWS", 100_000)
+# Lookups an organization needs before its index is built
+SUGGEST_HOT_THRESHOLD = _env_int("SUGGEST_HOT_THRESHOLD", 2)
+# Newest employee_changes entries kept when the log is trimmed after a large bulk load
+CHANGE_LOG_MAX_ROWS = _env_int("CHANGE_LOG_MAX_ROWS", 100_000)
+
+# Bulk loads writing at least this many rows fully merge the full-text indexes and
+# re-analyze afterwards; smaller ones merge at most BULK_MERGE_PAGES index pages
+BULK_OPTIMIZE_MIN_ROWS = _env_int("BULK_OPTIMIZE_MIN_ROWS", 10_000)
+BULK_MERGE_PAGES = _env_int("BULK_MERGE_PAGES", 64)
+
+# Organizations whose change log position is kept between commits for ETags and cache versions
+ORGANIZATION_VERSION_CACHE_SIZE = _env_int("ORGANIZATION_VERSION_CACHE_SIZE", 4096)
+
+# Cache-Control sent with the ETag on /search and /filters. Responses vary only by
+# X-Organization-ID, so shared caches may store them and revalidate with If-None-Match
+HTTP_CACHE_CONTROL = os.getenv("HTTP_CACHE_CONTROL", "public, no-cache")
+
+# Server-Timing header, /metrics histograms and the slow query log; 0 disables the slow query log
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+METRICS_MAX_ORGANIZATIONS = _env_int("METRICS_MAX_ORGANIZATIONS", 100)
+SLOW_QUERY_MS = _env_float("SLOW_QUERY_MS", 250)
+
+# Index advisor: "recommend" only reports indexes for the recorded query shapes,
+# "apply" also creates them every INDEX_ADVISOR_APPLY_EVERY searches
+INDEX_ADVISOR_MODE = os.getenv("INDEX_ADVISOR_MODE", "recommend")
+INDEX_ADVISOR_MIN_QUERIES = _env_int("INDEX_ADVISOR_MIN_QUERIES", 50)
+INDEX_ADVISOR_MAX_INDEXES = _env_int("INDEX_ADVISOR_MAX_INDEXES", 6)
+INDEX_ADVISOR_APPLY_EVERY = _env_int("INDEX_ADVISOR_APPLY_EVERY", 1000)
+# GET /indexes, scoped to the caller's X-Organization-ID and rate limited like searches
+INDEX_ADVISOR_ENDPOINT_ENABLED = _env_bool("INDEX_ADVISOR_ENDPOINT_ENABLED", True)
+
+# python -m app.server: forked worker processes sharing one listening socket. A worker
+# is replaced after WORKER_MAX_REQUESTS requests or WORKER_MAX_AGE seconds, plus up to
+# the matching jitter; 0 disables either limit
+WORKERS = _env_int("WORKERS", 1)
+WORKER_MAX_REQUESTS = _env_int("WORKER_MAX_REQUESTS", 0)
+WORKER_MAX_REQUESTS_JITTER = _env_int("WORKER_MAX_REQUESTS_JITTER", 0)
+WORKER_MAX_AGE = _env_float("WORKER_MAX_AGE", 0)
+WORKER_MAX_AGE_JITTER = _env_float("WORKER_MAX_AGE_JITTER", 0)
+# Seconds a stopping worker may spend finishing in-flight requests
+WORKER_GRACEFUL_TIMEOUT = _env_float("WORKER_GRACEFUL_TIMEOUT", 30)
+# Read the database files into the page cache before forking
+WORKER_PREWARM = _env_bool("WORKER_PREWARM", True)
@@ -0,0 +1,216 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+from app import config
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "last_used")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of sqlite3 connections to a single database file.
+
+    Reader pools open connections with ``query_only`` so a bug in a read path can
+    never write. The writer pool is normally sized 1, which matches SQLite's
+    single-writer model and turns lock contention into a queue wait.
+    """
+
+    def __init__(self, db_path: str, max_size: int = None, read_only: bool = True,
+                 timeout: float = None, health_check_interval: float = None,
+                 mmap_size: int = None, cache_size_kb: int = None):
+        self.db_path = db_path
+        self.max_size = max_size or config.DB_POOL_SIZE
+        self.read_only = read_only
+        self.timeout = config.DB_POOL_TIMEOUT if timeout is None else timeout
+        self.health_check_interval = (config.DB_HEALTH_CHECK_INTERVAL
+                                      if health_check_interval is None else health_check_interval)
+        self.mmap_size = config.DB_MMAP_SIZE if mmap_size is None else mmap_size
+        self.cache_size_kb = config.DB_CACHE_SIZE_KB if cache_size_kb is None else cache_size_kb
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+
+        self._created = 0
+        self._acquired = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._discarded = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               timeout=config.DB_BUSY_TIMEOUT_MS / 1000, uri=self.db_path.startswith("file:"),
+                               cached_statements=config.DB_STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute(f"PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT_MS)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kb)}")
+        if self.read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._discarded += 1
+
+    def acquire(self, wait: bool = True) -> Optional[sqlite3.Connection]:
+        """Check out a connection, waiting up to ``timeout`` for one to be released.
+
+        With ``wait`` False, returns None instead of waiting when every connection is in use.
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                pooled = None
+                with self._lock:
+                    can_create = self._size < self.max_size
+                    if can_create:
+                        self._size += 1
+                if can_create:
+                    try:
+                        pooled = _PooledConnection(self._connect())
+                    except Exception:
+                        with self._lock:
+                            self._size -= 1
+                        raise
+                    with self._lock:
+                        self._created += 1
+                elif not wait:
+                    return None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        with self._lock:
+                            self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {self.timeout}s waiting for a database connection"
+                        )
+                    waited = True
+                    started = time.monotonic()
+                    try:
+                        pooled = self._idle.get(timeout=remaining)
+                    except queue.Empty:
+                        continue
+                    finally:
+                        with self._lock:
+                            self._wait_time += time.monotonic() - started
+
+            if time.monotonic() - pooled.last_used > self.health_check_interval:
+                if not self._is_healthy(pooled.conn):
+                    self._discard(pooled)
+                    continue
+
+            with self._lock:
+                self._in_use += 1
+                self._acquired += 1
+                if waited:
+                    self._waits += 1
+            return pooled.conn
+
+    def release(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._in_use -= 1
+
+        pooled = _PooledConnection(conn)
+        if self._closed:
+            self._discard(pooled)
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(pooled)
+            return
+        self._idle.put(pooled)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def health_check(self) -> bool:
+        """Ping every idle connection, dropping broken ones. Returns True if the database answers."""
+        checked = []
+        while True:
+            try:
+                checked.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+        for pooled in checked:
+            if self._is_healthy(pooled.conn):
+                pooled.last_used = time.monotonic()
+                self._idle.put(pooled)
+            else:
+                self._discard(pooled)
+
+        try:
+            with self.connection() as conn:
+                return self._is_healthy(conn)
+        except Exception:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": self._size - self._in_use,
+                "created": self._created,
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "wait_time_ms": round(self._wait_time * 1000, 3),
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+            }
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled)
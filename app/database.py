@@ -1,54 +1,227 @@
+import contextvars
 import sqlite3
 import os
-from typing import List, Dict, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from app.models import Status, Location, Company, Department
+from app.connection_pool import ConnectionPool, PoolTimeoutError
+from app.cache import LRUCache
+from app.executor import BoundedExecutor
+from app.metrics import current_timings, log_slow_query, timed
+from app.migrations import (
+    analyze, apply_migrations, change_log_position, organization_change_position, prune_change_log
+)
+from app.index_advisor import IndexAdvisor
+from app.query_builder import SearchShape, bind_search, compile_clauses, compile_search
+from app import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process init lock
+    fcntl = None
+
+FTS_COLUMNS = ("first_name", "last_name", "email", "position")
+
+EMPLOYEE_COLUMNS = (
+    "id", "organization_id", "first_name", "last_name", "email", "status", "department", "location",
+    "company", "position", "phone", "hire_date", "termination_date", "created_at",
+)
+
+# Facet column -> response key, matching the naming used by get_available_filters
+FACET_COLUMNS = {
+    "status": "status",
+    "location": "locations",
+    "company": "companies",
+    "department": "departments",
+    "position": "positions",
+}
+
+
+@lru_cache(maxsize=256)
+def _select_list(columns: Optional[Tuple[str, ...]]) -> str:
+    if columns is None:
+        return "employees.*"
+    unknown = [column for column in columns if column not in EMPLOYEE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown employee columns: {', '.join(unknown)}")
+    return ", ".join(f"employees.{column}" for column in dict.fromkeys(columns))
+
+
+class ExportLimitError(PoolTimeoutError):
+    pass
+
+
+class RowBatchStream:
+    """Iterator over fetchmany() batches of an executed query that owns a pooled connection.
+
+    The connection goes back to the pool when the rows run out, on close(), or when
+    the stream is garbage collected, whichever comes first.
+    """
+
+    def __init__(self, pool: ConnectionPool, conn: sqlite3.Connection, cursor: sqlite3.Cursor, batch_size: int):
+        self.columns = [description[0] for description in cursor.description]
+        self._pool = pool
+        self._conn = conn
+        self._cursor = cursor
+        self._batch_size = batch_size
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> List[tuple]:
+        if self._cursor is None:
+            raise StopIteration
+        rows = self._cursor.fetchmany(self._batch_size)
+        if not rows:
+            self.close()
+            raise StopIteration
+        return rows
+
+    def close(self):
+        if self._cursor is not None:
+            cursor, self._cursor = self._cursor, None
+            cursor.close()
+            self._pool.release(self._conn)
+
+    def __del__(self):
+        self.close()
+
+
+def default_database_path() -> str:
+    return config.DATABASE_PATH or ("/tmp/employees.db" if os.path.exists("/tmp") else "employees.db")
+
+
+@contextmanager
+def _init_lock(db_path: str):
+    """Exclusive lock held while a process creates or upgrades the schema.
+
+    Every worker initializes on startup; the first one to take the lock does the
+    work and the others find nothing left to do once they get it.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{db_path}.init.lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
 
 
 class Database:
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, seed_sample_data: bool = None, executor: BoundedExecutor = None):
         if db_path is None:
-            db_path = "/tmp/employees.db" if os.path.exists("/tmp") else "employees.db"
+            db_path = default_database_path()
         self.db_path = db_path
+        self.seed_sample_data = config.SEED_SAMPLE_DATA if seed_sample_data is None else seed_sample_data
+        self.write_pool = ConnectionPool(db_path, max_size=1, read_only=False)
+        self.read_pool = ConnectionPool(db_path, read_only=True)
+        # Exports hold a connection and a read transaction for as long as the client
+        # reads, so they get their own few connections and never wait for one
+        self.export_pool = ConnectionPool(db_path, max_size=max(config.EXPORT_MAX_CONCURRENT, 1),
+                                          read_only=True, timeout=0)
+        # Shards share their router's executor, which then owns its shutdown
+        self._owns_executor = executor is None
+        self.executor = executor if executor is not None else BoundedExecutor(
+            max_workers=config.DB_EXECUTOR_WORKERS, max_queue=config.DB_EXECUTOR_QUEUE_SIZE)
+        self.fts_enabled = False
+        self.facet_cache = LRUCache(maxsize=config.FACET_CACHE_SIZE, ttl=config.FACET_CACHE_TTL)
+        self.result_cache = LRUCache(maxsize=config.RESULT_CACHE_SIZE, ttl=config.RESULT_CACHE_TTL)
+        self.slow_query_seconds = config.SLOW_QUERY_MS / 1000
+        self.index_advisor = IndexAdvisor(
+            self,
+            min_queries=config.INDEX_ADVISOR_MIN_QUERIES,
+            max_indexes=config.INDEX_ADVISOR_MAX_INDEXES,
+            auto_apply_every=config.INDEX_ADVISOR_APPLY_EVERY if config.INDEX_ADVISOR_MODE == "apply" else 0
+        )
+        self._generations = {}
+        self._generations_lock = threading.Lock()
+        self._batch_executor = None
+        self._batch_executor_lock = threading.Lock()
+        # Connection used only by organization_version
+        self._monitor = None
+        # Change log positions tagged with the data_version they were read at; bounded
+        # because organization ids come from request headers
+        self._organization_versions = LRUCache(maxsize=config.ORGANIZATION_VERSION_CACHE_SIZE, ttl=None)
+        self._versions_lock = threading.Lock()
         self._init_db()
 
     def _init_db(self):
         print(f"📁 Initializing database at: {self.db_path}")
 
-        conn = sqlite3.connect(self.db_path)
+        with _init_lock(self.db_path), self.write_pool.connection() as conn:
+            self._create_schema(conn)
+
+    def _create_schema(self, conn: sqlite3.Connection):
         cursor = conn.cursor()
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS employees (
-                id TEXT PRIMARY KEY,
-                organization_id TEXT NOT NULL,
-                first_name TEXT NOT NULL,
-                last_name TEXT NOT NULL,
-                email TEXT NOT NULL,
-                status TEXT NOT NULL CHECK(status IN ('active', 'not_started', 'terminated')),
-                department TEXT NOT NULL,
-                location TEXT NOT NULL,
-                company TEXT NOT NULL,
-                position TEXT NOT NULL,
-                phone TEXT,
-                hire_date TEXT,
-                termination_date TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_org_id ON employees(organization_id)')
-        cursor.execute('CREATE INDEX idx_search_comprehensive ON employees(organization_id, status, department, location, company, position)')
-        cursor.execute('CREATE INDEX idx_name ON employees(first_name, last_name)')
-
-        # Insert sample data if empty
-        cursor.execute('SELECT COUNT(*) FROM employees')
-        if cursor.fetchone()[0] == 0:
+        migrations = apply_migrations(conn)
+        if migrations:
+            print(f"📦 Applied schema migrations: {', '.join(migrations)}")
+
+        self.fts_enabled = self._create_fts(cursor)
+
+        seeded = self.seed_sample_data and cursor.execute('SELECT 1 FROM employees LIMIT 1').fetchone() is None
+        if seeded:
             self.insert_sample_data(cursor)
 
         conn.commit()
-        conn.close()
+        if seeded:
+            self.record_write(["org_1", "org_2"])
 
-    def insert_sample_data(self, cursor):
+    def _create_fts(self, cursor) -> bool:
+        """Create the full-text indexes over FTS_COLUMNS, kept in sync with employees by triggers.
+
+        employees_fts (unicode61) serves token and prefix matching with bm25 ranking,
+        employees_trigram serves substring matching with the same semantics as LIKE '%q%'.
+        Both are external-content tables keyed on the implicit employees rowid.
+        """
+        columns = ", ".join(FTS_COLUMNS)
+        new_values = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+        old_values = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+        tables = {
+            "employees_fts": "tokenize='unicode61', prefix='2 3'",
+            "employees_trigram": "tokenize='trigram'",
+        }
+
+        for table, options in tables.items():
+            exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).fetchone()
+            try:
+                cursor.execute(f"""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+                        {columns}, content='employees', content_rowid='rowid', {options}
+                    )
+                """)
+            except sqlite3.OperationalError as e:
+                print(f"⚠️ Full-text search unavailable, falling back to LIKE: {e}")
+                return False
+
+            cursor.executescript(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON employees BEGIN
+                    INSERT INTO {table}(rowid, {columns}) VALUES (new.rowid, {new_values});
+                END;
+                CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON employees BEGIN
+                    INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+                END;
+                CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {columns} ON employees BEGIN
+                    INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+                    INSERT INTO {table}(rowid, {columns}) VALUES (new.rowid, {new_values});
+                END;
+            """)
+
+            if not exists:
+                cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+
+        return True
+
+    def insert_sample_data(self, cursor, organization_ids: Sequence[str] = None):
         sample_employees = []
 
         positions = [
@@ -105,119 +278,493 @@ class Database:
                 "org_2"
             ))
 
+        if organization_ids is not None:
+            sample_employees = [row for row in sample_employees if row[-1] in organization_ids]
         cursor.executemany('''
             INSERT INTO employees 
             (id, first_name, last_name, email, status, department, location, company, position, phone, hire_date, termination_date, organization_id)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', sample_employees)
 
-    def search_employees(self, organization_id: str, filters: Dict[str, Any],
-                         limit: int, offset: int) -> tuple[List[Dict[str, Any]], int]:
-
-        where_conditions = ["organization_id = ?"]
-        params = [organization_id]
-
-        if filters.get('query'):
-            where_conditions.append(
-                "(first_name LIKE ? OR last_name LIKE ? OR email LIKE ? OR position LIKE ?)"
-            )
-            search_term = f"%{filters['query']}%"
-            params.extend([search_term, search_term, search_term, search_term])
-
-        if filters.get('status'):
-            if isinstance(filters['status'], list):
-                placeholders = ','.join(['?' for _ in filters['status']])
-                where_conditions.append(f"status IN ({placeholders})")
-                params.extend(filters['status'])
-            else:
-                where_conditions.append("status = ?")
-                params.append(filters['status'])
-
-        if filters.get('department'):
-            if isinstance(filters['department'], list):
-                placeholders = ','.join(['?' for _ in filters['department']])
-                where_conditions.append(f"department IN ({placeholders})")
-                params.extend(filters['department'])
-            else:
-                where_conditions.append("department = ?")
-                params.append(filters['department'])
-
-        if filters.get('location'):
-            if isinstance(filters['location'], list):
-                placeholders = ','.join(['?' for _ in filters['location']])
-                where_conditions.append(f"location IN ({placeholders})")
-                params.extend(filters['location'])
-            else:
-                where_conditions.append("location = ?")
-                params.append(filters['location'])
-
-        if filters.get('company'):
-            if isinstance(filters['company'], list):
-                placeholders = ','.join(['?' for _ in filters['company']])
-                where_conditions.append(f"company IN ({placeholders})")
-                params.extend(filters['company'])
-            else:
-                where_conditions.append("company = ?")
-                params.append(filters['company'])
+    def _build_search_query(self, organization_id: str, filters: Dict[str, Any]):
+        """Return (from_clause, where_clause, order_by, params) for a filter set."""
+        shape, params = bind_search(organization_id, filters, self.fts_enabled)
+        return compile_clauses(shape) + (params,)
 
-        if filters.get('position'):
-            where_conditions.append("position LIKE ?")
-            params.append(f"%{filters['position']}%")
+    def search_employees(self, organization_id: str, filters: Dict[str, Any],
+                         limit: int, offset: int,
+                         after: Optional[Tuple[str, str, str]] = None,
+                         count_cap: Optional[int] = None,
+                         columns: Optional[Sequence[str]] = None) -> tuple[List[Dict[str, Any]], int]:
+        """Return one page of employees and the total match count.
 
-        where_clause = " AND ".join(where_conditions)
+        ``after`` is a decoded keyset cursor: the (first_name, last_name, id) of the last
+        row of the previous page. Rows strictly after it are returned, so deep pages cost
+        the same as the first one.
 
-        count_query = f"SELECT COUNT(*) FROM employees WHERE {where_clause}"
+        With ``count_cap`` the count stops after count_cap + 1 matches, so a returned
+        total above count_cap means "more than count_cap".
 
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute(count_query, params)
-        total_count = cursor.fetchone()[0]
+        ``columns`` limits the SELECT list, and the returned dicts, to those columns.
 
-        search_query = f"""
-            SELECT * FROM employees 
-            WHERE {where_clause}
-            ORDER BY first_name, last_name
-            LIMIT ? OFFSET ?
+        Results are served from result_cache while the organization's data version is
+        unchanged, so repeated identical searches do not touch SQLite.
         """
-        params.extend([limit, offset])
-
-        cursor.execute(search_query, params)
-        rows = cursor.fetchall()
+        cache_key = None
+        if self.result_cache.maxsize:
+            cache_key = self._result_cache_key(organization_id, filters, limit, offset, after, count_cap, columns)
+            version = self.data_version(organization_id)
+            with timed("result_cache"):
+                cached = self.result_cache.get(cache_key, version=version)
+            if cached is not None:
+                names, rows, total_count = cached
+                return [dict(zip(names, row)) for row in rows], total_count
+
+        names, rows, total_count = self._execute_search(organization_id, filters, limit, offset,
+                                                        after, count_cap, columns)
+        if cache_key is not None:
+            self.result_cache.set(cache_key, (names, rows, total_count), version=version)
+
+        return [dict(zip(names, row)) for row in rows], total_count
+
+    def search_employees_batch(self, organization_id: str, searches: Sequence[Dict[str, Any]],
+                               include_filters: bool = False) -> Tuple[List[tuple], Optional[Dict[str, List[str]]]]:
+        """Run several searches for one organization against a single read snapshot.
+
+        Each search is a dict of search_employees keyword arguments. Cached results
+        are used as in search_employees; the remaining searches, and the available
+        filters when requested and not cached, are read in one read transaction so
+        they agree with each other. With BATCH_SEARCH_PARALLELISM above 1 the misses
+        are spread over extra connections, each of which only runs its share if it
+        was idle and its transaction sees the same change log position as the first
+        one; otherwise the first connection runs that share itself.
+
+        Returns a list of (employees, total_count), in order, and the available
+        filters or None.
+        """
+        version = self.data_version(organization_id)
+        results = [None] * len(searches)
+        pending = []
+        for position, search in enumerate(searches):
+            cache_key = None
+            if self.result_cache.maxsize:
+                cache_key = self._result_cache_key(organization_id, **search)
+                with timed("result_cache"):
+                    cached = self.result_cache.get(cache_key, version=version)
+                if cached is not None:
+                    results[position] = cached
+                    continue
+            pending.append((position, cache_key, search))
+
+        available_filters = self.facet_cache.get(organization_id, version=version) if include_filters else None
+        if pending or (include_filters and available_filters is None):
+            with self.read_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                cursor.execute("BEGIN")
+                try:
+                    if include_filters and available_filters is None:
+                        with timed("available_filters"):
+                            available_filters = self._query_available_filters(cursor, organization_id)
+                        self.facet_cache.set(organization_id, available_filters, version=version)
+                    for position, cache_key, result in self._run_batch(cursor, organization_id, pending):
+                        results[position] = result
+                        if cache_key is not None:
+                            self.result_cache.set(cache_key, result, version=version)
+                finally:
+                    conn.rollback()
+
+        return [([dict(zip(names, row)) for row in rows], total_count)
+                for names, rows, total_count in results], available_filters
+
+    def _run_batch(self, cursor, organization_id: str, pending: List[tuple]) -> List[tuple]:
+        """(position, cache_key, result) for each pending search, read on ``cursor``'s snapshot or an equal one."""
+        workers = min(config.BATCH_SEARCH_PARALLELISM, len(pending))
+        if workers <= 1:
+            return self._run_searches(cursor, organization_id, pending)
+
+        shares = [pending[worker::workers] for worker in range(workers)]
+        position = change_log_position(cursor)
+        futures = [self._batch_helpers().submit(contextvars.copy_context().run, self._run_searches_at,
+                                                position, organization_id, share)
+                   for share in shares[1:]]
+        done = self._run_searches(cursor, organization_id, shares[0])
+        for share, future in zip(shares[1:], futures):
+            helper_done = future.result()
+            done.extend(helper_done if helper_done is not None else self._run_searches(cursor, organization_id, share))
+        return done
+
+    def _run_searches_at(self, position: int, organization_id: str, pending: List[tuple]) -> Optional[List[tuple]]:
+        # The caller already holds a connection from this pool, so waiting for a second
+        # one could starve it: concurrent batches would hold every connection while
+        # their helpers wait for more. Without an idle connection the caller runs the share.
+        conn = self.read_pool.acquire(wait=False)
+        if conn is None:
+            return None
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("BEGIN")
+            try:
+                # A commit landed between the two transactions starting: different snapshots
+                if change_log_position(cursor) != position:
+                    return None
+                return self._run_searches(cursor, organization_id, pending)
+            finally:
+                conn.rollback()
+        finally:
+            self.read_pool.release(conn)
+
+    def _run_searches(self, cursor, organization_id: str, pending: List[tuple]) -> List[tuple]:
+        return [(position, cache_key, self._execute_search(organization_id, cursor=cursor, **search))
+                for position, cache_key, search in pending]
+
+    def _batch_helpers(self) -> ThreadPoolExecutor:
+        with self._batch_executor_lock:
+            if self._batch_executor is None:
+                self._batch_executor = ThreadPoolExecutor(max_workers=config.BATCH_SEARCH_PARALLELISM - 1,
+                                                          thread_name_prefix="search-batch")
+            return self._batch_executor
+
+    def _result_cache_key(self, organization_id: str, filters: Dict[str, Any], limit: int, offset: int,
+                          after: Optional[Tuple[str, str, str]] = None, count_cap: Optional[int] = None,
+                          columns: Optional[Sequence[str]] = None) -> tuple:
+        return (organization_id, self._normalize_filters(filters), limit, offset, after, count_cap,
+                tuple(columns) if columns is not None else None)
+
+    @staticmethod
+    def _normalize_filters(filters: Dict[str, Any]) -> tuple:
+        """Hashable, order-insensitive form of a filter set: status=a equals status=[a]."""
+        normalized = []
+        for key, value in filters.items():
+            if not value or (key == 'query_mode' and not filters.get('query')):
+                continue
+            if isinstance(value, (list, tuple)):
+                value = tuple(sorted(set(value)))
+            elif key in ('status', 'department', 'location', 'company'):
+                value = (value,)
+            normalized.append((key, value))
+        return tuple(sorted(normalized))
+
+    def validate_search(self, organization_id: str, filters: Dict[str, Any],
+                        after: Optional[Tuple[str, str, str]] = None) -> Tuple[SearchShape, List[Any]]:
+        """Bind a search without running it; raises ValueError for anything _execute_search would reject."""
+        shape, params = bind_search(organization_id, filters, self.fts_enabled)
+        if after is not None and shape.ranked:
+            raise ValueError("Cursor pagination is not supported for relevance-ranked query modes")
+        return shape, params
+
+    def _execute_search(self, organization_id: str, filters: Dict[str, Any], limit: int, offset: int,
+                        after: Optional[Tuple[str, str, str]] = None, count_cap: Optional[int] = None,
+                        columns: Optional[Sequence[str]] = None,
+                        cursor: sqlite3.Cursor = None) -> Tuple[List[str], List[tuple], int]:
+        shape, params = self.validate_search(organization_id, filters, after)
+        self.index_advisor.record(filters)
+        search_query, count_query = compile_search(
+            shape, _select_list(tuple(columns) if columns is not None else None),
+            count_cap is not None, after is not None)
+
+        count_params = params if count_cap is None else params + [count_cap + 1]
+        page_params = params if after is None else params + list(after)
+
+        params = count_params + page_params + [limit, offset]
+        if cursor is not None:
+            return self._fetch_page(cursor, search_query, params, count_query, count_params, offset, after)
+        with self.read_pool.connection() as conn:
+            cursor = conn.cursor()
+            # Plain tuples are cheaper than sqlite3.Row when every row becomes a dict anyway
+            cursor.row_factory = None
+            return self._fetch_page(cursor, search_query, params, count_query, count_params, offset, after)
+
+    def _fetch_page(self, cursor, search_query: str, params: List[Any], count_query: str,
+                    count_params: List[Any], offset: int,
+                    after: Optional[Tuple[str, str, str]]) -> Tuple[List[str], List[tuple], int]:
+        rows = self._fetch_all(cursor, "query", search_query, params)
+        names = [description[0] for description in cursor.description]
+
+        if rows:
+            total_count = rows[0][-1]
+        elif offset or after is not None:
+            # Past the last page there is no row to carry the count
+            total_count = self._fetch_all(cursor, "count", count_query, count_params)[0][0]
+        else:
+            total_count = 0
+
+        # zip() with the shorter names list drops the trailing _total_count column
+        return names[:-1], rows, total_count
+
+    def _fetch_all(self, cursor, stage: str, sql: str, params: Sequence) -> List[tuple]:
+        """Execute and fetch a statement, timing it as ``stage`` and logging it when slow."""
+        timings = current_timings()
+        if timings is None and not self.slow_query_seconds:
+            return cursor.execute(sql, params).fetchall()
+
+        started = time.perf_counter()
+        rows = cursor.execute(sql, params).fetchall()
+        elapsed = time.perf_counter() - started
+        if timings is not None:
+            timings.add(stage, elapsed)
+        if self.slow_query_seconds and elapsed >= self.slow_query_seconds:
+            log_slow_query(cursor.connection, sql, params, elapsed)
+        return rows
+
+    def for_organization(self, organization_id: str, refresh: bool = False) -> "Database":
+        """The Database holding the organization's rows; see ShardedDatabase."""
+        return self
+
+    def data_version(self, organization_id: str) -> Tuple[int, int]:
+        """Version of an organization's rows that cached reads are tagged with.
+
+        Pairs the in-process generation bumped by record_write with the change log
+        position, so commits made by other processes retire cached reads too.
+        """
+        return self._generations.get(organization_id, 0), self.organization_version(organization_id)
 
-        employees = [dict(row) for row in rows]
-        conn.close()
+    def organization_version(self, organization_id: str) -> int:
+        """The organization's position in the change log, which moves on every committed write.
 
-        return employees, total_count
+        This sees writes from every process. Positions are cached and reread only
+        after PRAGMA data_version reports a commit, so an unchanged database costs
+        one pragma and no table access.
+        """
+        with self._versions_lock:
+            if self._monitor is None:
+                self._monitor = sqlite3.connect(self.db_path, check_same_thread=False,
+                                                uri=self.db_path.startswith("file:"))
+            data_version = self._monitor.execute("PRAGMA data_version").fetchone()[0]
+            version = self._organization_versions.get(organization_id, version=data_version)
+            if version is None:
+                version = organization_change_position(self._monitor, organization_id)
+                self._organization_versions.set(organization_id, version, version=data_version)
+            return version
+
+    def version_tag(self, organization_id: str) -> str:
+        """Opaque token that changes whenever the organization's employees do; used as the HTTP ETag."""
+        return str(self.organization_version(organization_id))
+
+    def record_write(self, organization_ids):
+        """Call after committing writes to employees so cached reads for those orgs are dropped."""
+        organization_ids = set(organization_ids)
+        with self._generations_lock:
+            for organization_id in organization_ids:
+                self._generations[organization_id] = self._generations.get(organization_id, 0) + 1
+        self.facet_cache.invalidate(lambda key: key in organization_ids)
+        self.result_cache.invalidate(lambda key: key[0] in organization_ids)
 
     def get_available_filters(self, organization_id: str) -> Dict[str, List[str]]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        available_filters = {}
+        """Distinct filter values for an organization, served from facet_cache when fresh.
 
-        cursor.execute("SELECT DISTINCT status FROM employees WHERE organization_id = ? ORDER BY status", (organization_id,))
-        available_filters['status'] = [row[0] for row in cursor.fetchall()]
-
-        cursor.execute("SELECT DISTINCT location FROM employees WHERE organization_id = ? ORDER BY location", (organization_id,))
-        available_filters['locations'] = [row[0] for row in cursor.fetchall()]
+        Cached values are shared between callers and must not be mutated.
+        """
+        version = self.data_version(organization_id)
+        available_filters = self.facet_cache.get(organization_id, version=version)
+        if available_filters is not None:
+            return available_filters
 
-        cursor.execute("SELECT DISTINCT company FROM employees WHERE organization_id = ? ORDER BY company", (organization_id,))
-        available_filters['companies'] = [row[0] for row in cursor.fetchall()]
+        with self.read_pool.connection() as conn:
+            available_filters = self._query_available_filters(conn.cursor(), organization_id)
 
-        cursor.execute("SELECT DISTINCT department FROM employees WHERE organization_id = ? ORDER BY department", (organization_id,))
-        available_filters['departments'] = [row[0] for row in cursor.fetchall()]
+        self.facet_cache.set(organization_id, available_filters, version=version)
+        return available_filters
 
-        cursor.execute("""
+    def _query_available_filters(self, cursor, organization_id: str) -> Dict[str, List[str]]:
+        available_filters = {}
+        for column, key in (("status", "status"), ("location", "locations"), ("company", "companies"),
+                            ("department", "departments")):
+            rows = self._fetch_all(cursor, "filters_query", f"""
+                SELECT DISTINCT {column} FROM employees WHERE organization_id = ? ORDER BY {column}
+            """, (organization_id,))
+            available_filters[key] = [row[0] for row in rows]
+
+        rows = self._fetch_all(cursor, "filters_query", """
             SELECT DISTINCT position FROM employees 
             WHERE organization_id = ? 
             ORDER BY position
             LIMIT 20
         """, (organization_id,))
-        available_filters['positions'] = [row[0] for row in cursor.fetchall()]
+        available_filters['positions'] = [row[0] for row in rows]
 
-        conn.close()
         return available_filters
 
+    def stream_employees(self, organization_id: str, filters: Dict[str, Any],
+                         columns: Optional[Sequence[str]] = None, batch_size: int = 1000) -> RowBatchStream:
+        """Run the search without LIMIT or COUNT and return a stream of row batches.
 
-db = Database()
+        The statement is prepared and executed once up front, so errors surface here
+        rather than mid-stream. Rows are then pulled with fetchmany, keeping memory per
+        export constant regardless of the result size. At most EXPORT_MAX_CONCURRENT
+        exports run at once; beyond that ExportLimitError is raised immediately.
+        """
+        from_clause, where_clause, order_by, params = self._build_search_query(organization_id, filters)
+        query = f"""
+            SELECT {_select_list(tuple(columns) if columns is not None else None)} FROM {from_clause}
+            WHERE {where_clause}
+            ORDER BY {order_by}
+        """
+
+        if config.EXPORT_MAX_CONCURRENT <= 0:
+            raise ExportLimitError("Exports are disabled")
+        try:
+            conn = self.export_pool.acquire()
+        except PoolTimeoutError:
+            raise ExportLimitError(f"{self.export_pool.max_size} exports are already running, try again later")
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(query, params)
+        except BaseException:
+            self.export_pool.release(conn)
+            raise
+        return RowBatchStream(self.export_pool, conn, cursor, batch_size)
+
+    def get_facet_counts(self, organization_id: str, filters: Dict[str, Any]) -> Dict[str, Any]:
+        """Value -> count for every facet column among employees matching ``filters``.
+
+        One grouped scan over the facet column combinations, folded per facet in Python.
+        The number of groups is bounded by the combinations that actually occur, which
+        is far below the row count for these low-cardinality columns.
+        """
+        from_clause, where_clause, _, params = self._build_search_query(organization_id, filters)
+        self.index_advisor.record(filters)
+        columns = ", ".join(f"employees.{column}" for column in FACET_COLUMNS)
+
+        with self.read_pool.connection() as conn:
+            rows = self._fetch_all(conn.cursor(), "facets", f"""
+                SELECT {columns}, COUNT(*) FROM {from_clause}
+                WHERE {where_clause}
+                GROUP BY {columns}
+            """, params)
+
+        facets = {key: {} for key in FACET_COLUMNS.values()}
+        total_count = 0
+        for row in rows:
+            count = row[-1]
+            total_count += count
+            for index, key in enumerate(FACET_COLUMNS.values()):
+                counts = facets[key]
+                counts[row[index]] = counts.get(row[index], 0) + count
+
+        result = {key: dict(sorted(counts.items())) for key, counts in facets.items()}
+        result["total_count"] = total_count
+        return result
+
+    def optimize_after_bulk_load(self, rows_written: int = None):
+        """Tidy the indexes after a bulk load, in proportion to its size.
+
+        Loads of at least BULK_OPTIMIZE_MIN_ROWS rows (or of unknown size) fully merge
+        the full-text indexes, trim the change log and refresh planner statistics,
+        which rewrites index data for every organization. Smaller loads only merge a
+        bounded number of index pages and let ``PRAGMA optimize`` decide whether any
+        statistics are worth refreshing, so they never hold the writer for long.
+        """
+        full = rows_written is None or rows_written >= config.BULK_OPTIMIZE_MIN_ROWS
+        with self.write_pool.connection() as conn:
+            if self.fts_enabled:
+                for table in ("employees_fts", "employees_trigram"):
+                    if full:
+                        conn.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+                    else:
+                        conn.execute(f"INSERT INTO {table}({table}, rank) VALUES ('merge', ?)",
+                                     (config.BULK_MERGE_PAGES,))
+            # Small loads still trim the log once it has grown well past its budget
+            oldest, newest = conn.execute("SELECT MIN(seq), MAX(seq) FROM employee_changes").fetchone()
+            if full or (newest or 0) - (oldest or 0) >= 2 * config.CHANGE_LOG_MAX_ROWS:
+                prune_change_log(conn, config.CHANGE_LOG_MAX_ROWS)
+            if full:
+                analyze(conn)
+            else:
+                conn.execute("PRAGMA analysis_limit = 1000")
+                conn.execute("PRAGMA optimize")
+            conn.commit()
+
+    def warmup(self, connections: int = None) -> int:
+        """Open read connections and prepare the hot statements before traffic arrives.
+
+        A new connection runs its PRAGMAs and parses the schema on first use, and
+        sqlite3 prepares a statement the first time it sees its SQL on a connection.
+        Returns the number of connections warmed.
+        """
+        connections = min(connections or self.read_pool.max_size, self.read_pool.max_size)
+        conns = []
+        try:
+            for _ in range(connections):
+                conns.append(self.read_pool.acquire())
+            for conn in conns:
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                # No organization has an empty id: every statement prepares and returns nothing
+                self._query_available_filters(cursor, "")
+        finally:
+            for conn in conns:
+                self.read_pool.release(conn)
+        return len(conns)
+
+    async def run_async(self, fn, *args, **kwargs):
+        """Run a blocking database call on the bounded executor, off the event loop."""
+        return await self.executor.run(fn, *args, **kwargs)
+
+    async def get_available_filters_async(self, organization_id: str) -> Dict[str, List[str]]:
+        return await self.run_async(self.get_available_filters, organization_id)
+
+    def health_check(self) -> bool:
+        return self.read_pool.health_check() and self.write_pool.health_check()
+
+    def index_report(self, organization_id: str = None) -> Dict[str, Any]:
+        return self.index_advisor.report(organization_id)
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            "facets": self.facet_cache.stats(),
+            "results": self.result_cache.stats(),
+        }
+
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            "read": self.read_pool.stats(),
+            "write": self.write_pool.stats(),
+            "export": self.export_pool.stats(),
+            "executor": self.executor.stats(),
+        }
+
+    def close(self):
+        if self._owns_executor:
+            self.executor.shutdown()
+        if self._batch_executor is not None:
+            self._batch_executor.shutdown()
+        with self._versions_lock:
+            if self._monitor is not None:
+                self._monitor.close()
+                self._monitor = None
+        self.read_pool.close()
+        self.export_pool.close()
+        self.write_pool.close()
+
+
+_database: Optional[Database] = None
+_database_lock = threading.Lock()
+
+
+def get_database():
+    """The process-wide Database (or ShardedDatabase), opened and initialized on first use.
+
+    Nothing touches the database file at import time, so forked workers and test
+    processes each open their own connections when they first need them.
+    """
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                if config.DATABASE_SHARDS:
+                    from app.sharding import ShardedDatabase
+                    _database = ShardedDatabase()
+                else:
+                    _database = Database()
+    return _database
+
+
+def close_database():
+    global _database
+    with _database_lock:
+        database, _database = _database, None
+    if database is not None:
+        database.close()
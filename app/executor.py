@@ -0,0 +1,69 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class ExecutorOverloadedError(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """Runs blocking calls on a fixed thread pool without blocking the event loop.
+
+    At most ``max_workers`` calls run at once and at most ``max_queue`` more may wait;
+    beyond that ``run`` fails fast with ExecutorOverloadedError so callers can shed
+    load instead of piling up unbounded work.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, thread_name_prefix: str = "db"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+        self._slots.release()
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorOverloadedError("Too many queued database requests, try again later")
+
+        with self._lock:
+            self._pending += 1
+        try:
+            # Run in a copy of the caller's context so request-scoped state follows the call
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot is released when the thread finishes, not when the awaiting
+        # request is cancelled, so abandoned work still counts against the bound.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "queued": max(self._pending - self.max_workers, 0),
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
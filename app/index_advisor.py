@@ -0,0 +1,199 @@
+import sqlite3
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+from app.migrations import analyze
+
+# Equality-filterable columns in the order they appear in advised indexes. A fixed
+# order lets shapes that filter on a leading subset share one index.
+FILTER_COLUMNS = ("status", "department", "location", "company")
+SORT_COLUMNS = ("first_name", "last_name", "id")
+
+AUTO_INDEX_PREFIX = "idx_auto_"
+
+
+class QueryShape(NamedTuple):
+    """What a search filters on, independent of the values: the unit of index advice."""
+    filter_columns: Tuple[str, ...]
+    position: bool
+    query_mode: Optional[str]
+
+    @classmethod
+    def from_filters(cls, filters: Dict[str, Any]) -> "QueryShape":
+        return cls(
+            tuple(column for column in FILTER_COLUMNS if filters.get(column)),
+            bool(filters.get('position')),
+            (filters.get('query_mode') or "substring") if filters.get('query') else None,
+        )
+
+    def describe(self) -> str:
+        parts = list(self.filter_columns)
+        if self.position:
+            parts.append("position~")
+        if self.query_mode:
+            parts.append(f"query:{self.query_mode}")
+        return "+".join(parts) or "(organization only)"
+
+
+class WorkloadRecorder:
+    """Counts the query shapes that reach SQLite, keeping at most ``max_shapes`` of them."""
+
+    def __init__(self, max_shapes: int = 256):
+        self.max_shapes = max_shapes
+        self._counts = {}
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def record(self, filters: Dict[str, Any]):
+        shape = QueryShape.from_filters(filters)
+        with self._lock:
+            self.total += 1
+            if shape in self._counts or len(self._counts) < self.max_shapes:
+                self._counts[shape] = self._counts.get(shape, 0) + 1
+
+    def shapes(self) -> List[Tuple[QueryShape, int]]:
+        with self._lock:
+            return sorted(self._counts.items(), key=lambda item: -item[1])
+
+
+class IndexRecommendation(NamedTuple):
+    name: str
+    columns: Tuple[str, ...]
+    shapes: Tuple[str, ...]
+    queries: int
+
+    @property
+    def sql(self) -> str:
+        return f"CREATE INDEX IF NOT EXISTS {self.name} ON employees({', '.join(self.columns)})"
+
+
+class IndexAdvisor:
+    """Turns the recorded workload into org-prefixed covering indexes.
+
+    For a shape filtering on equality columns C the advised index is
+    (organization_id, C..., first_name, last_name, id): the count subquery is
+    answered from the index alone, and with single-value filters the page comes
+    out already in sort order. A shape is considered served when an existing
+    index starts with organization_id followed by its columns in any order.
+    """
+
+    def __init__(self, db, recorder: WorkloadRecorder = None, min_queries: int = 50, max_indexes: int = 6,
+                 auto_apply_every: int = 0):
+        self.db = db
+        self.recorder = recorder if recorder is not None else WorkloadRecorder()
+        self.min_queries = min_queries
+        self.max_indexes = max_indexes
+        self.auto_apply_every = auto_apply_every
+        self._applying = threading.Lock()
+
+    def record(self, filters: Dict[str, Any]):
+        """Record a search that reached SQLite; in auto-apply mode, periodically act on the advice."""
+        self.recorder.record(filters)
+        if self.auto_apply_every and self.recorder.total % self.auto_apply_every == 0:
+            threading.Thread(target=self._apply_in_background, name="index-advisor", daemon=True).start()
+
+    def _apply_in_background(self):
+        if not self._applying.acquire(blocking=False):
+            return
+        try:
+            self.apply()
+        finally:
+            self._applying.release()
+
+    def existing_indexes(self) -> Dict[str, Tuple[str, ...]]:
+        with self.db.read_pool.connection() as conn:
+            names = [row[1] for row in conn.execute("PRAGMA index_list(employees)")]
+            return {name: tuple(row[2] for row in conn.execute(f"PRAGMA index_info({name})")) for name in names}
+
+    @staticmethod
+    def _serves(index_columns: Tuple[str, ...], filter_columns: Tuple[str, ...]) -> bool:
+        width = len(filter_columns) + 1
+        return (len(index_columns) >= width and index_columns[0] == "organization_id"
+                and set(index_columns[1:width]) == set(filter_columns))
+
+    def explain(self, organization_id: str, filters: Dict[str, Any]) -> Dict[str, List[str]]:
+        """EXPLAIN QUERY PLAN for the page and count statements of a search."""
+        from_clause, where_clause, order_by, params = self.db._build_search_query(organization_id, filters)
+        statements = {
+            "page": (f"SELECT employees.* FROM {from_clause} WHERE {where_clause} ORDER BY {order_by} LIMIT 50",
+                     params),
+            "count": (f"SELECT COUNT(*) FROM {from_clause} WHERE {where_clause}", params),
+        }
+        # EXPLAIN reads no table, so a long-lived connection never notices schema changes
+        # and keeps planning against the indexes it saw first; use a fresh one
+        conn = sqlite3.connect(f"file:{quote(self.db.db_path)}?mode=ro", uri=True)
+        try:
+            return {name: [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", sql_params)]
+                    for name, (sql, sql_params) in statements.items()}
+        finally:
+            conn.close()
+
+    def recommend(self) -> List[IndexRecommendation]:
+        existing = list(self.existing_indexes().values())
+        recommendations = []
+        for shape, count in self.recorder.shapes():
+            # Text queries are served by the full-text indexes and position is a LIKE '%x%'
+            if count < self.min_queries or not shape.filter_columns or shape.query_mode:
+                continue
+            if any(self._serves(columns, shape.filter_columns) for columns in existing):
+                continue
+
+            for index, recommendation in enumerate(recommendations):
+                if self._serves(recommendation.columns, shape.filter_columns):
+                    recommendations[index] = recommendation._replace(
+                        shapes=recommendation.shapes + (shape.describe(),), queries=recommendation.queries + count)
+                    break
+            else:
+                if len(recommendations) < self.max_indexes:
+                    recommendations.append(IndexRecommendation(
+                        AUTO_INDEX_PREFIX + "_".join(shape.filter_columns),
+                        ("organization_id",) + shape.filter_columns + SORT_COLUMNS,
+                        (shape.describe(),), count))
+        return sorted(recommendations, key=lambda recommendation: -recommendation.queries)
+
+    def apply(self, recommendations: List[IndexRecommendation] = None) -> List[str]:
+        """Create the recommended indexes and refresh planner statistics. Returns the names created."""
+        recommendations = self.recommend() if recommendations is None else recommendations
+        if not recommendations:
+            return []
+        with self.db.write_pool.connection() as conn:
+            for recommendation in recommendations:
+                conn.execute(recommendation.sql)
+            analyze(conn)
+            conn.commit()
+        return [recommendation.name for recommendation in recommendations]
+
+    def report(self, organization_id: str = None) -> Dict[str, Any]:
+        """Recorded shapes, current indexes and advice; with an organization, query plans too."""
+        shapes = []
+        for shape, count in self.recorder.shapes():
+            entry = {"shape": shape.describe(), "queries": count}
+            if organization_id:
+                entry["plan"] = self.explain(organization_id, self._example_filters(organization_id, shape))
+            shapes.append(entry)
+        return {
+            "queries_recorded": self.recorder.total,
+            "shapes": shapes,
+            "indexes": {name: list(columns) for name, columns in self.existing_indexes().items()},
+            "recommendations": [
+                {"name": recommendation.name, "sql": recommendation.sql, "shapes": list(recommendation.shapes),
+                 "queries": recommendation.queries}
+                for recommendation in self.recommend()
+            ],
+        }
+
+    def _example_filters(self, organization_id: str, shape: QueryShape) -> Dict[str, Any]:
+        """Concrete filters of the given shape, using values present in the organization."""
+        available = self.db.get_available_filters(organization_id)
+        keys = {"status": "status", "department": "departments", "location": "locations", "company": "companies"}
+        filters = {}
+        for column in shape.filter_columns:
+            values = available.get(keys[column]) or [""]
+            filters[column] = values[0]
+        if shape.position:
+            filters['position'] = "engineer"
+        if shape.query_mode:
+            filters['query'] = "ana"
+            filters['query_mode'] = shape.query_mode
+        return filters
@@ -1,19 +1,90 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, Request
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import List, Optional, Dict, Any
+
+from app.models import (
+    EmployeeSearchResponse, Employee, FilterOptionsResponse, FacetCountsResponse, BulkIngestResponse,
+    SuggestResponse, BatchSearchRequest, BatchSearchResponse
+)
+from app.search import (
+    EmployeeSearch, close_columnar_engine, close_suggester, get_columnar_engine, get_suggester
+)
+from app.rate_limiter import RateLimiter, create_rate_limiter
+from app.connection_pool import PoolTimeoutError
+from app.executor import ExecutorOverloadedError
+from app.metrics import MetricsRegistry, TimingMiddleware, timed
+from app.ingest import BulkIngestor, CsvParser, NdjsonParser, iter_stream_lines
+from app.serialization import (
+    FastJSONResponse, search_response_content, RESPONSE_SHAPES, EXPORT_FORMATS, ndjson_chunks, csv_chunks
+)
+from app.database import close_database, get_database
+from app import IMPORTED_AT, get_organization_columns, config
+
+metrics = MetricsRegistry(max_organizations=config.METRICS_MAX_ORGANIZATIONS)
+
+# Seconds per startup phase of this worker, filled in by start_up()
+startup_seconds: Dict[str, float] = {}
+
+
+def start_up():
+    """Open and migrate the database, then warm its connections, before serving traffic."""
+    started = time.perf_counter()
+    database = get_database()
+    get_columnar_engine()
+    get_suggester()
+    initialized = time.perf_counter()
+    connections = database.warmup(config.DB_WARMUP_CONNECTIONS) if config.DB_WARMUP_CONNECTIONS else 0
+    ready = time.perf_counter()
+
+    startup_seconds.update(
+        imports=started - IMPORTED_AT,
+        database=initialized - started,
+        warmup=ready - initialized,
+        ready=ready - IMPORTED_AT,
+    )
+    metrics.set_startup(startup_seconds)
+    print(f"🚀 Ready in {startup_seconds['ready'] * 1000:.0f} ms "
+          f"(imports {startup_seconds['imports'] * 1000:.0f} ms, database {startup_seconds['database'] * 1000:.0f} ms, "
+          f"warmup {startup_seconds['warmup'] * 1000:.0f} ms over {connections} connections)")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Blocking is fine here: the server accepts no connections until startup returns
+    start_up()
+    app.state.ready = True
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        close_columnar_engine()
+        close_suggester()
+        close_database()
 
-from app.models import EmployeeSearchResponse, Employee, FilterOptionsResponse
-from app.search import EmployeeSearch
-from app.rate_limiter import RateLimiter
-from app import get_organization_columns
 
 app = FastAPI(
     title="Employee Search API",
     description="Microservice for searching employee",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
+app.state.ready = False
+
+if config.METRICS_ENABLED:
+    app.add_middleware(TimingMiddleware, registry=metrics)
 
-rate_limiter = RateLimiter(requests_per_minute=100)
+rate_limiter = create_rate_limiter(
+    requests_per_minute=config.RATE_LIMIT_REQUESTS_PER_MINUTE,
+    backend=config.RATE_LIMIT_BACKEND,
+    shm_path=config.RATE_LIMIT_SHM_PATH,
+    redis_url=config.RATE_LIMIT_REDIS_URL
+)
+
+# Deeper pages should be walked with the keyset cursor instead of OFFSET
+MAX_OFFSET = 10000
 
 
 def get_organization_id(request: Request):
@@ -32,8 +103,13 @@ def check_rate_limit(
     client_identifier: str = Depends(get_client_identifier),
     rate_limiter: RateLimiter = Depends(lambda: rate_limiter)
 ):
+    return charge_rate_limit(rate_limiter, client_identifier)
+
 
-    if not rate_limiter.is_allowed(client_identifier):
+def charge_rate_limit(rate_limiter: RateLimiter, client_identifier: str, cost: int = 1):
+    with timed("rate_limit"):
+        allowed = rate_limiter.is_allowed(client_identifier, cost=cost)
+    if not allowed:
         raise HTTPException(
             status_code=429,
             detail="Rate limit exceeded. Please try again later."
@@ -41,54 +117,286 @@ def check_rate_limit(
     return True
 
 
+def validator_headers(organization_id: str) -> Dict[str, str]:
+    """ETag and caching headers for a response built from the organization's current employees.
+
+    Taken before the response is built: a write landing in between then leaves a
+    newer body under an older tag, which only costs the client one more full
+    response.
+    """
+    with timed("etag"):
+        tag = get_database().version_tag(organization_id)
+    return {"ETag": f'W/"{tag}"', "Cache-Control": config.HTTP_CACHE_CONTROL, "Vary": "X-Organization-ID"}
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Weak If-None-Match comparison against ``etag``."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any((tag[2:] if tag.startswith("W/") else tag) == opaque
+               for tag in (candidate.strip() for candidate in if_none_match.split(",")))
+
+
+def get_search_filters(
+        query: Optional[str] = Query(None, description="Search query across multiple fields"),
+        query_mode: str = Query("substring", description="Text matching mode: substring, prefix, token (ranked by relevance) or like"),
+        status: Optional[List[str]] = Query(None, description="Filter by status (active, not_started, terminated)"),
+        department: Optional[List[str]] = Query(None, description="Filter by department"),
+        location: Optional[List[str]] = Query(None, description="Filter by location"),
+        company: Optional[List[str]] = Query(None, description="Filter by company"),
+        position: Optional[str] = Query(None, description="Filter by position")
+) -> Dict[str, Any]:
+    return {
+        "query": query,
+        "query_mode": query_mode,
+        "status": status,
+        "department": department,
+        "location": location,
+        "company": company,
+        "position": position,
+    }
+
+
 @app.get("/")
 async def root():
     return {"message": "Employee Search API"}
 
 
+@app.get("/ready")
+async def ready():
+    """200 once startup and warmup have finished, for load balancer and orchestrator probes."""
+    if not app.state.ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", "startup_ms": {phase: round(seconds * 1000, 3)
+                                              for phase, seconds in startup_seconds.items()}}
+
+
+@app.get("/health")
+async def health():
+    db = get_database()
+    try:
+        healthy = await db.run_async(db.health_check)
+    except ExecutorOverloadedError:
+        healthy = False
+    database = {"path": db.db_path, "pools": db.pool_stats(), "caches": db.cache_stats()}
+    columnar_engine = get_columnar_engine()
+    if columnar_engine is not None:
+        database["columnar"] = columnar_engine.stats()
+    suggester = get_suggester()
+    if suggester is not None:
+        database["suggest"] = suggester.stats()
+    return JSONResponse(
+        status_code=200 if healthy else 503,
+        content={"status": "ok" if healthy else "unavailable", "database": database}
+    )
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Latency histograms in the Prometheus text exposition format."""
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/indexes")
+async def get_index_advice(
+        explain: bool = Query(False, description="Include query plans for the caller's organization"),
+        organization_id=Depends(get_organization_id),
+        rate_limit_ok=Depends(check_rate_limit)
+):
+    """Recorded query shapes, current indexes and the indexes the advisor recommends."""
+    if not config.INDEX_ADVISOR_ENDPOINT_ENABLED:
+        raise HTTPException(status_code=404, detail="Index advice is disabled")
+    # Only the database holding the caller's organization, and only its plans
+    db = get_database().for_organization(organization_id)
+    try:
+        return await db.run_async(db.index_report, organization_id if explain else None)
+    except (PoolTimeoutError, ExecutorOverloadedError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
 @app.get("/search", response_model=EmployeeSearchResponse)
 async def search_employees(
         request: Request,
-        query=Query(None, description="Search query across multiple fields"),
-        status=Query(None, description="Filter by status (active, not_started, terminated)"),
-        department=Query(None, description="Filter by department"),
-        location=Query(None, description="Filter by location"),
-        company=Query(None, description="Filter by company"),
-        position=Query(None, description="Filter by position"),
-        limit=Query(50, ge=1, le=1000, description="Number of results to return"),
-        offset=Query(0, ge=0, description="Offset for pagination"),
+        search_filters: Dict[str, Any] = Depends(get_search_filters),
+        limit: int = Query(50, ge=1, le=1000, description="Number of results to return"),
+        offset: int = Query(0, ge=0, le=MAX_OFFSET, description="Offset for pagination"),
+        cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page, used instead of offset"),
+        include_filters: bool = Query(True, description="Include available_filters in the response"),
+        count_mode: str = Query("exact", description="exact, or capped to stop counting after count_cap matches"),
+        count_cap: int = Query(1000, ge=1, le=100000, description="Upper bound for total_count when count_mode=capped"),
+        shape: str = Query("rows", description="rows (employees as objects) or columnar (columns + rows arrays)"),
         organization_id=Depends(get_organization_id),
         client_identifier=Depends(get_client_identifier),
         rate_limit_ok=Depends(check_rate_limit)
 ):
     try:
+        if cursor and offset:
+            raise ValueError("Use either cursor or offset for pagination, not both")
+        if shape not in RESPONSE_SHAPES:
+            raise ValueError(f"Invalid shape '{shape}', expected one of: {', '.join(RESPONSE_SHAPES)}")
+
         search_service = EmployeeSearch()
+        # Only a request that would have succeeded may be answered 304
+        search_service.validate_search(**search_filters, cursor=cursor, count_mode=count_mode,
+                                       organization_id=organization_id)
+        headers = validator_headers(organization_id)
+        if is_not_modified(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
 
-        results, total_count, available_filters = search_service.search_employees(
-            query=query,
-            status=status,
-            department=department,
-            location=location,
-            company=company,
-            position=position,
+        result = await search_service.search_employees_async(
+            **search_filters,
             limit=limit,
             offset=offset,
+            cursor=cursor,
+            include_filters=include_filters,
+            count_mode=count_mode,
+            count_cap=count_cap,
             organization_id=organization_id
         )
 
         columns = get_organization_columns(organization_id)
 
-        return EmployeeSearchResponse(
-            employees=results,
-            total_count=total_count,
-            limit=limit,
-            offset=offset,
-            columns=columns,
-            available_filters=available_filters
+        # Rows come straight from our database, so per-row validation is skipped
+        with timed("serialize"):
+            return FastJSONResponse(search_response_content(
+                result.employees,
+                columns,
+                shape=shape,
+                total_count=result.total_count,
+                total_count_exact=result.total_count_exact,
+                limit=limit,
+                offset=offset,
+                available_filters=result.available_filters,
+                next_cursor=result.next_cursor
+            ), headers=headers)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (PoolTimeoutError, ExecutorOverloadedError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/search/batch", response_model=BatchSearchResponse)
+async def search_employees_batch(
+        request: Request,
+        batch: BatchSearchRequest,
+        organization_id=Depends(get_organization_id),
+        client_identifier=Depends(get_client_identifier)
+):
+    """Run several searches for one organization in one request, charged as one request per search."""
+    if len(batch.searches) > config.BATCH_SEARCH_MAX_SIZE:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {config.BATCH_SEARCH_MAX_SIZE} searches are allowed per batch")
+    charge_rate_limit(rate_limiter, client_identifier, cost=len(batch.searches))
+
+    try:
+        if batch.shape not in RESPONSE_SHAPES:
+            raise ValueError(f"Invalid shape '{batch.shape}', expected one of: {', '.join(RESPONSE_SHAPES)}")
+        searches = [search.model_dump() for search in batch.searches]
+        for search in searches:
+            if search['cursor'] and search['offset']:
+                raise ValueError("Use either cursor or offset for pagination, not both")
+            if search['offset'] > MAX_OFFSET:
+                raise ValueError(f"offset must be at most {MAX_OFFSET}")
+
+        search_service = EmployeeSearch()
+        result = await search_service.search_employees_batch_async(
+            searches=searches,
+            organization_id=organization_id,
+            include_filters=batch.include_filters
         )
 
+        columns = get_organization_columns(organization_id)
+
+        with timed("serialize"):
+            return FastJSONResponse({
+                "results": [
+                    search_response_content(
+                        search_result.employees,
+                        columns,
+                        shape=batch.shape,
+                        total_count=search_result.total_count,
+                        total_count_exact=search_result.total_count_exact,
+                        limit=search['limit'],
+                        offset=search['offset'],
+                        next_cursor=search_result.next_cursor
+                    )
+                    for search, search_result in zip(searches, result.results)
+                ],
+                "available_filters": result.available_filters,
+            })
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (PoolTimeoutError, ExecutorOverloadedError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/search/export")
+async def export_employees(
+        request: Request,
+        search_filters: Dict[str, Any] = Depends(get_search_filters),
+        format: str = Query("ndjson", description="ndjson or csv"),
+        organization_id=Depends(get_organization_id),
+        client_identifier=Depends(get_client_identifier),
+        rate_limit_ok=Depends(check_rate_limit)
+):
+    """Stream every employee matching the /search filters, without paging or counting."""
+    try:
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Invalid format '{format}', expected one of: {', '.join(EXPORT_FORMATS)}")
+
+        search_service = EmployeeSearch()
+        stream = await search_service.export_employees_async(**search_filters, organization_id=organization_id)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (PoolTimeoutError, ExecutorOverloadedError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    chunks = ndjson_chunks if format == "ndjson" else csv_chunks
+    return StreamingResponse(
+        chunks(stream.columns, stream),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="employees.{format}"'}
+    )
+
+
+@app.get("/suggest", response_model=SuggestResponse)
+async def suggest_employees(
+        request: Request,
+        query: str = Query(..., min_length=1, max_length=100, description="What has been typed so far"),
+        limit: int = Query(10, ge=1, le=50, description="Number of suggestions to return"),
+        fuzzy: bool = Query(False, description="Also match names one typo away from the query"),
+        status: Optional[List[str]] = Query(None, description="Only suggest employees with these statuses"),
+        organization_id=Depends(get_organization_id),
+        client_identifier=Depends(get_client_identifier),
+        rate_limit_ok=Depends(check_rate_limit)
+):
+    """Autocomplete employees by the start of their first name, last name or email."""
+    try:
+        search_service = EmployeeSearch()
+        with timed("suggest"):
+            suggestions = await search_service.suggest_async(query=query, organization_id=organization_id,
+                                                             limit=limit, fuzzy=fuzzy, status=status)
+        return FastJSONResponse({"suggestions": suggestions})
+
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except (PoolTimeoutError, ExecutorOverloadedError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -96,16 +404,78 @@ async def search_employees(
 @app.get("/filters", response_model=FilterOptionsResponse)
 async def get_available_filters(
         request: Request,
+        response: Response,
         organization_id=Depends(get_organization_id),
         client_identifier =Depends(get_client_identifier),
         rate_limit_ok=Depends(check_rate_limit)
 ):
     try:
+        headers = validator_headers(organization_id)
+        if is_not_modified(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
         search_service = EmployeeSearch()
-        available_filters = search_service.db.get_available_filters(organization_id)
+        available_filters = await search_service.db.get_available_filters_async(organization_id)
 
+        response.headers.update(headers)
         return FilterOptionsResponse(**available_filters)
 
+    except (PoolTimeoutError, ExecutorOverloadedError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/facets", response_model=FacetCountsResponse)
+async def get_facet_counts(
+        request: Request,
+        search_filters: Dict[str, Any] = Depends(get_search_filters),
+        organization_id=Depends(get_organization_id),
+        client_identifier=Depends(get_client_identifier),
+        rate_limit_ok=Depends(check_rate_limit)
+):
+    try:
+        search_service = EmployeeSearch()
+        facet_counts = await search_service.facet_counts_async(**search_filters, organization_id=organization_id)
+
+        return FacetCountsResponse(**facet_counts)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (PoolTimeoutError, ExecutorOverloadedError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/employees/bulk", response_model=BulkIngestResponse)
+async def bulk_ingest_employees(
+        request: Request,
+        batch_size: int = Query(5000, ge=1, le=100000, description="Records per write transaction"),
+        organization_id=Depends(get_organization_id),
+        client_identifier=Depends(get_client_identifier),
+        rate_limit_ok=Depends(check_rate_limit)
+):
+    """Upsert employees from an NDJSON body, or CSV with a header row when Content-Type is text/csv."""
+    content_type = request.headers.get("content-type", "")
+    parser = CsvParser() if content_type.startswith("text/csv") else NdjsonParser()
+    db = get_database()
+    ingestor = BulkIngestor(db, organization_id, batch_size=batch_size)
+
+    try:
+        async for line in iter_stream_lines(request.stream()):
+            for line_number, record in parser.feed(line):
+                if ingestor.add(line_number, record):
+                    await db.run_async(ingestor.flush)
+        for line_number, record in parser.close():
+            ingestor.add(line_number, record)
+
+        return BulkIngestResponse(**await db.run_async(ingestor.finish))
+
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Request body is not valid UTF-8: {e}")
+    except (PoolTimeoutError, ExecutorOverloadedError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
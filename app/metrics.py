@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import MutableHeaders
+
+slow_query_logger = logging.getLogger("app.slow_queries")
+
+# Upper bounds in seconds, Prometheus style; +Inf is implied
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Organizations beyond the tracked limit share this label, keeping series count bounded
+OTHER_ORGANIZATIONS = "other"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """Thread-safe latency histogram with one series per label tuple."""
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], seconds: float):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket (not cumulative) counts, the last one for +Inf, then sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+
+        for labels, values in sorted(series.items()):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label_text},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {values[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Request and per-stage latency histograms, labelled by route and organization."""
+
+    def __init__(self, max_organizations: int = 100):
+        self.max_organizations = max_organizations
+        self._organizations = set()
+        self._lock = threading.Lock()
+        self.request_duration = Histogram(
+            "http_request_duration_seconds", "Time from request start to response headers.",
+            ("path", "organization_id", "status"))
+        self.stage_duration = Histogram(
+            "search_stage_duration_seconds", "Time spent in each stage of a request.",
+            ("path", "stage", "organization_id"))
+        self.startup_seconds = {}
+
+    def organization_label(self, organization_id: Optional[str]) -> str:
+        if not organization_id:
+            return ""
+        if organization_id in self._organizations:
+            return organization_id
+        with self._lock:
+            if len(self._organizations) < self.max_organizations:
+                self._organizations.add(organization_id)
+                return organization_id
+        return OTHER_ORGANIZATIONS
+
+    def observe_request(self, path: str, organization_id: Optional[str], status: int, seconds: float,
+                        stages: Dict[str, float]):
+        organization = self.organization_label(organization_id)
+        self.request_duration.observe((path, organization, str(status)), seconds)
+        for stage, stage_seconds in stages.items():
+            self.stage_duration.observe((path, stage, organization), stage_seconds)
+
+    def set_startup(self, phases: Dict[str, float]):
+        self.startup_seconds = dict(phases)
+
+    def render(self) -> str:
+        lines = self.request_duration.render() + self.stage_duration.render()
+        if self.startup_seconds:
+            lines += ["# HELP process_startup_seconds Time spent in each phase of worker startup.",
+                      "# TYPE process_startup_seconds gauge"]
+            lines += [f'process_startup_seconds{{phase="{phase}"}} {seconds:.6f}'
+                      for phase, seconds in self.startup_seconds.items()]
+        return "\n".join(lines) + "\n"
+
+
+class RequestTimings:
+    """Seconds spent per named stage during one request; repeated stages add up."""
+    __slots__ = ("stages",)
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        entries = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.stages.items()]
+        entries.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(entries)
+
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+class timed:
+    """Context manager adding the enclosed block's duration to the current request's timings.
+
+    Outside an instrumented request it only costs the context variable lookup.
+    """
+    __slots__ = ("stage", "timings", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.timings = _current_timings.get()
+
+    def __enter__(self):
+        if self.timings is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.add(self.stage, time.perf_counter() - self.started)
+
+
+def log_slow_query(conn, sql: str, params: Sequence, seconds: float):
+    """Log a statement that took longer than the slow query threshold, with its query plan."""
+    try:
+        plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+    except Exception as e:
+        plan = [f"unavailable: {e}"]
+    slow_query_logger.warning(
+        "slow query took %.1f ms\nSQL: %s\nparams: %r\nplan:\n  %s",
+        seconds * 1000, " ".join(sql.split()), list(params), "\n  ".join(plan)
+    )
+
+
+class TimingMiddleware:
+    """ASGI middleware that collects stage timings for each HTTP request.
+
+    Adds a Server-Timing header to the response and records the request and its
+    stages in ``registry``. The path label is the matched route template, so
+    unmatched paths collapse into one series.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        started = time.perf_counter()
+        response = {"status": 500, "seconds": None}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                seconds = time.perf_counter() - started
+                response.update(status=message["status"], seconds=seconds)
+                MutableHeaders(scope=message).append("Server-Timing", timings.server_timing(seconds))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timings.reset(token)
+            route = scope.get("route")
+            organization_id = None
+            for name, value in scope["headers"]:
+                if name == b"x-organization-id":
+                    organization_id = value.decode("latin-1")
+                    break
+            seconds = response["seconds"] if response["seconds"] is not None else time.perf_counter() - started
+            self.registry.observe_request(route.path if route is not None else "unmatched", organization_id,
+                                          response["status"], seconds, timings.stages)
@@ -0,0 +1,176 @@
+import sqlite3
+from typing import Callable, List, NamedTuple, Union
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    # SQL script, or a callable taking the connection for steps that need logic
+    apply: Union[str, Callable[[sqlite3.Connection], None]]
+
+
+def analyze(conn: sqlite3.Connection):
+    """Refresh planner statistics from a bounded sample of each index."""
+    conn.execute("PRAGMA analysis_limit = 1000")
+    conn.execute("ANALYZE")
+
+
+def _analyze_if_populated(conn: sqlite3.Connection):
+    # Statistics taken on an empty table would mislead the planner once data arrives;
+    # bulk loads analyze on their own
+    if conn.execute("SELECT 1 FROM employees LIMIT 1").fetchone():
+        analyze(conn)
+
+
+def _create_change_log(conn: sqlite3.Connection):
+    # Trigger bodies contain semicolons, so these cannot go through the script splitter
+    statements = [
+        '''
+        CREATE TABLE IF NOT EXISTS employee_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            organization_id TEXT NOT NULL,
+            employee_rowid INTEGER NOT NULL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_employee_changes_org ON employee_changes(organization_id, seq)",
+        '''
+        CREATE TRIGGER IF NOT EXISTS employee_changes_ai AFTER INSERT ON employees BEGIN
+            INSERT INTO employee_changes (organization_id, employee_rowid) VALUES (new.organization_id, new.rowid);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS employee_changes_au
+        AFTER UPDATE OF organization_id, first_name, last_name, email, status ON employees BEGIN
+            INSERT INTO employee_changes (organization_id, employee_rowid) VALUES (old.organization_id, old.rowid);
+            INSERT INTO employee_changes (organization_id, employee_rowid)
+                SELECT new.organization_id, new.rowid WHERE new.organization_id IS NOT old.organization_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS employee_changes_ad AFTER DELETE ON employees BEGIN
+            INSERT INTO employee_changes (organization_id, employee_rowid) VALUES (old.organization_id, old.rowid);
+        END
+        ''',
+    ]
+    for statement in statements:
+        conn.execute(statement)
+
+
+def _log_every_update(conn: sqlite3.Connection):
+    conn.execute("DROP TRIGGER IF EXISTS employee_changes_au")
+    conn.execute('''
+        CREATE TRIGGER employee_changes_au AFTER UPDATE ON employees BEGIN
+            INSERT INTO employee_changes (organization_id, employee_rowid) VALUES (old.organization_id, old.rowid);
+            INSERT INTO employee_changes (organization_id, employee_rowid)
+                SELECT new.organization_id, new.rowid WHERE new.organization_id IS NOT old.organization_id;
+        END
+    ''')
+
+
+def change_log_position(conn: sqlite3.Connection) -> int:
+    """Newest change log entry: two read transactions agreeing on it see the same employees."""
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM employee_changes").fetchone()[0]
+
+
+def organization_change_position(conn: sqlite3.Connection, organization_id: str) -> int:
+    """Newest change log entry for one organization; it moves whenever the organization's rows change."""
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM employee_changes WHERE organization_id = ?",
+                        (organization_id,)).fetchone()[0]
+
+
+def prune_change_log(conn: sqlite3.Connection, keep: int):
+    """Drop all but the newest ``keep`` change log entries, and each organization's newest entry."""
+    # Without its newest entry an organization's position would fall back to an
+    # earlier value, which clients may still hold as an ETag
+    conn.execute("""
+        DELETE FROM employee_changes
+        WHERE seq <= (SELECT MAX(seq) FROM employee_changes) - ?
+          AND seq NOT IN (SELECT MAX(seq) FROM employee_changes GROUP BY organization_id)
+    """, (keep,))
+
+
+# Every step must be safe to run against a database created before this table
+# existed, which is why the statements use IF (NOT) EXISTS throughout.
+MIGRATIONS = [
+    Migration(1, "create employees", '''
+        CREATE TABLE IF NOT EXISTS employees (
+            id TEXT PRIMARY KEY,
+            organization_id TEXT NOT NULL,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            status TEXT NOT NULL CHECK(status IN ('active', 'not_started', 'terminated')),
+            department TEXT NOT NULL,
+            location TEXT NOT NULL,
+            company TEXT NOT NULL,
+            position TEXT NOT NULL,
+            phone TEXT,
+            hire_date TEXT,
+            termination_date TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS idx_search_comprehensive
+            ON employees(organization_id, status, department, location, company, position);
+    '''),
+    # Matches ORDER BY first_name, last_name, id within an organization so keyset
+    # pages are index seeks. It also covers every lookup the organization-only and
+    # global name indexes served, so those go.
+    Migration(2, "organization sort index", '''
+        CREATE INDEX IF NOT EXISTS idx_org_name ON employees(organization_id, first_name, last_name, id);
+        DROP INDEX IF EXISTS idx_org_id;
+        DROP INDEX IF EXISTS idx_name;
+    '''),
+    Migration(3, "planner statistics", _analyze_if_populated),
+    # Rows inserted, deleted or renamed, in commit order per organization, so in-memory
+    # structures such as the suggest index can catch up without reloading everything
+    Migration(4, "employee change log", _create_change_log),
+    # Any update, not only to indexed name columns, so the newest entry identifies
+    # the employees table as a snapshot sees it (see Database.search_employees_batch)
+    Migration(5, "log every employee update", _log_every_update),
+]
+
+
+def applied_versions(conn: sqlite3.Connection) -> List[int]:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return [row[0] for row in conn.execute("SELECT version FROM schema_migrations ORDER BY version")]
+
+
+def apply_migrations(conn: sqlite3.Connection, migrations: List[Migration] = None) -> List[str]:
+    """Apply pending migrations in version order, each in its own transaction.
+
+    Returns the names of the migrations applied by this call.
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    done = set(applied_versions(conn))
+    conn.commit()
+
+    applied = []
+    for migration in sorted(migrations, key=lambda migration: migration.version):
+        if migration.version in done:
+            continue
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Another process may have applied it while we waited for the write lock
+            if conn.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (migration.version,)).fetchone():
+                conn.rollback()
+                continue
+            if callable(migration.apply):
+                migration.apply(conn)
+            else:
+                for statement in migration.apply.split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+            conn.execute("INSERT INTO schema_migrations (version, name) VALUES (?, ?)",
+                         (migration.version, migration.name))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append(migration.name)
+    return applied
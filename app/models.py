@@ -60,10 +60,38 @@ class Employee(BaseModel):
 class EmployeeSearchResponse(BaseModel):
     employees: List[Dict[str, Any]] = Field(..., description="List of employees with dynamic columns")
     total_count: int = Field(..., description="Total number of matching employees")
+    total_count_exact: bool = Field(True, description="False when total_count was capped and more employees match")
     limit: int = Field(..., description="Number of results returned")
     offset: int = Field(..., description="Offset used for pagination")
     columns: List[str] = Field(..., description="Columns to display for this organization")
-    available_filters: Dict[str, List[str]] = Field(..., description="Available filter options")
+    available_filters: Optional[Dict[str, List[str]]] = Field(None, description="Available filter options, omitted when include_filters=false")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, absent on the last page")
+
+
+class BatchSearchQuery(BaseModel):
+    query: Optional[str] = Field(None, description="Search query across multiple fields")
+    query_mode: str = Field("substring", description="Text matching mode: substring, prefix, token or like")
+    status: Optional[List[str]] = Field(None, description="Filter by status")
+    department: Optional[List[str]] = Field(None, description="Filter by department")
+    location: Optional[List[str]] = Field(None, description="Filter by location")
+    company: Optional[List[str]] = Field(None, description="Filter by company")
+    position: Optional[str] = Field(None, description="Filter by position")
+    limit: int = Field(50, ge=1, le=1000, description="Number of results to return")
+    offset: int = Field(0, ge=0, description="Offset for pagination")
+    cursor: Optional[str] = Field(None, description="Opaque next_cursor from a previous page, used instead of offset")
+    count_mode: str = Field("exact", description="exact, or capped to stop counting after count_cap matches")
+    count_cap: int = Field(1000, ge=1, le=100000, description="Upper bound for total_count when count_mode=capped")
+
+
+class BatchSearchRequest(BaseModel):
+    searches: List[BatchSearchQuery] = Field(..., min_length=1, description="Searches to run, each as for /search")
+    include_filters: bool = Field(True, description="Include available_filters, once for the whole batch")
+    shape: str = Field("rows", description="rows or columnar, applied to every result")
+
+
+class BatchSearchResponse(BaseModel):
+    results: List[EmployeeSearchResponse] = Field(..., description="One /search response per search, in request order")
+    available_filters: Optional[Dict[str, List[str]]] = Field(None, description="Available filter options, omitted when include_filters=false")
 
 
 class FilterOptionsResponse(BaseModel):
@@ -72,3 +100,35 @@ class FilterOptionsResponse(BaseModel):
     companies: List[str] = Field(..., description="Available company options")
     departments: List[str] = Field(..., description="Available department options")
     positions: List[str] = Field(..., description="Available position options")
+
+
+class FacetCountsResponse(BaseModel):
+    total_count: int = Field(..., description="Total number of matching employees")
+    status: Dict[str, int] = Field(..., description="Matching employees per status")
+    locations: Dict[str, int] = Field(..., description="Matching employees per location")
+    companies: Dict[str, int] = Field(..., description="Matching employees per company")
+    departments: Dict[str, int] = Field(..., description="Matching employees per department")
+    positions: Dict[str, int] = Field(..., description="Matching employees per position")
+
+
+class Suggestion(BaseModel):
+    id: str = Field(..., description="Employee identifier")
+    first_name: str = Field(..., description="Employee first name")
+    last_name: str = Field(..., description="Employee last name")
+    email: Optional[str] = Field(None, description="Employee email, for organizations that show it")
+    fuzzy: bool = Field(False, description="True when matched with one typo rather than as typed")
+
+
+class SuggestResponse(BaseModel):
+    suggestions: List[Suggestion] = Field(..., description="Matching employees, exact prefix matches first")
+
+
+class BulkIngestResponse(BaseModel):
+    rows_received: int = Field(..., description="Records read from the request body")
+    rows_written: int = Field(..., description="Records inserted or updated")
+    rows_rejected: int = Field(..., description="Records that failed validation")
+    rows_unchanged: int = Field(..., description="Valid records identical to the stored row or owned by another organization")
+    batches: int = Field(..., description="Write transactions committed")
+    elapsed_seconds: float = Field(..., description="Wall time of the load")
+    rows_per_second: float = Field(..., description="Throughput over rows_received")
+    errors: List[str] = Field(..., description="First validation errors, by record line number")
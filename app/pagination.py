@@ -0,0 +1,24 @@
+import base64
+import json
+from typing import Tuple
+
+SORT_KEY_COLUMNS = ("first_name", "last_name", "id")
+
+
+def encode_cursor(employee) -> str:
+    """Opaque token for the sort key of the last employee on a page."""
+    key = [employee[column] for column in SORT_KEY_COLUMNS]
+    raw = json.dumps(key, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid pagination cursor")
+
+    if not isinstance(key, list) or len(key) != len(SORT_KEY_COLUMNS) or not all(isinstance(v, str) for v in key):
+        raise ValueError("Invalid pagination cursor")
+    return tuple(key)
@@ -0,0 +1,174 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+QUERY_MODES = ("substring", "prefix", "token", "like")
+RANKED_QUERY_MODES = ("prefix", "token")
+
+# The trigram tokenizer cannot match anything shorter than one trigram.
+MIN_TRIGRAM_QUERY_LENGTH = 3
+
+SORT_ORDER = "first_name, last_name, id"
+
+# Equality-filterable columns, in the order their conditions are written and bound
+LIST_FILTER_COLUMNS = ("status", "department", "location", "company")
+
+# Lists up to this long bind to an IN list padded to a power of two, so list lengths
+# only add a handful of statement texts; longer ones bind as one JSON array
+MAX_INLINE_VALUES = 16
+JSON_LIST = -1
+
+_TEXT_JOINS = {
+    "fts": """
+        JOIN (SELECT rowid AS fts_rowid, rank AS fts_rank
+              FROM employees_fts WHERE employees_fts MATCH ?) AS fts
+        ON fts.fts_rowid = employees.rowid
+    """,
+}
+_TEXT_CONDITIONS = {
+    "trigram": "employees.rowid IN (SELECT rowid FROM employees_trigram WHERE employees_trigram MATCH ?)",
+    "like": "(first_name LIKE ? OR last_name LIKE ? OR email LIKE ? OR position LIKE ?)",
+}
+
+
+class SearchShape(NamedTuple):
+    """What a filter set's SQL depends on, with every value left out.
+
+    ``text`` is how the free-text query is matched ("fts", "trigram", "like" or
+    None). ``lists`` has one entry per LIST_FILTER_COLUMNS column: 0 when it is
+    not filtered, the number of IN placeholders, or JSON_LIST.
+    """
+    text: Optional[str]
+    lists: Tuple[int, ...]
+    position: bool
+
+    @property
+    def ranked(self) -> bool:
+        return self.text == "fts"
+
+
+class SearchClauses(NamedTuple):
+    from_clause: str
+    where_clause: str
+    order_by: str
+
+
+class SearchStatements(NamedTuple):
+    search: str
+    count: str
+
+
+def _placeholders(count: int) -> int:
+    """Smallest power of two holding ``count`` values."""
+    return 1 << (count - 1).bit_length()
+
+
+def _bind_text(query: str, mode: str, fts_enabled: bool) -> Tuple[str, List[Any]]:
+    if mode not in QUERY_MODES:
+        raise ValueError(f"Invalid query_mode '{mode}', expected one of: {', '.join(QUERY_MODES)}")
+
+    if fts_enabled and mode in RANKED_QUERY_MODES:
+        tokens = re.findall(r"\w+", query)
+        if tokens:
+            suffix = "*" if mode == "prefix" else ""
+            return "fts", [" AND ".join('"{}"{}'.format(token, suffix) for token in tokens)]
+
+    if fts_enabled and mode == "substring" and len(query) >= MIN_TRIGRAM_QUERY_LENGTH:
+        return "trigram", ['"{}"'.format(query.replace('"', '""'))]
+
+    search_term = f"%{query}%"
+    return "like", [search_term] * 4
+
+
+def bind_search(organization_id: str, filters: Dict[str, Any], fts_enabled: bool) -> Tuple[SearchShape, List[Any]]:
+    """Split a filter set into its shape and the parameters, in binding order, of compile_clauses(shape)."""
+    text = None
+    params = [organization_id]
+    if filters.get('query'):
+        text, text_params = _bind_text(filters['query'], filters.get('query_mode') or "substring", fts_enabled)
+        # Joined params bind before the WHERE clause params
+        params = text_params + params if text in _TEXT_JOINS else params + text_params
+
+    lists = []
+    for column in LIST_FILTER_COLUMNS:
+        value = filters.get(column)
+        if not value:
+            lists.append(0)
+        elif not isinstance(value, (list, tuple)):
+            lists.append(1)
+            params.append(value)
+        elif len(value) == 1:
+            lists.append(1)
+            params.append(value[0])
+        elif len(value) > MAX_INLINE_VALUES:
+            lists.append(JSON_LIST)
+            params.append(json.dumps(value))
+        else:
+            slots = _placeholders(len(value))
+            lists.append(slots)
+            # Repeating a value leaves the IN list's meaning unchanged
+            params.extend(value)
+            params.extend([value[-1]] * (slots - len(value)))
+
+    position = bool(filters.get('position'))
+    if position:
+        params.append(f"%{filters['position']}%")
+
+    return SearchShape(text, tuple(lists), position), params
+
+
+@lru_cache(maxsize=1024)
+def compile_clauses(shape: SearchShape) -> SearchClauses:
+    from_clause = "employees"
+    where_conditions = ["organization_id = ?"]
+    order_by = SORT_ORDER
+
+    if shape.text in _TEXT_JOINS:
+        from_clause += _TEXT_JOINS[shape.text]
+        order_by = "fts.fts_rank, " + order_by
+    elif shape.text is not None:
+        where_conditions.append(_TEXT_CONDITIONS[shape.text])
+
+    for column, slots in zip(LIST_FILTER_COLUMNS, shape.lists):
+        if slots == 1:
+            where_conditions.append(f"{column} = ?")
+        elif slots == JSON_LIST:
+            where_conditions.append(f"{column} IN (SELECT value FROM json_each(?))")
+        elif slots:
+            where_conditions.append(f"{column} IN ({', '.join('?' * slots)})")
+
+    if shape.position:
+        where_conditions.append("position LIKE ?")
+
+    return SearchClauses(from_clause, " AND ".join(where_conditions), order_by)
+
+
+@lru_cache(maxsize=1024)
+def compile_search(shape: SearchShape, select_list: str, capped: bool, after: bool) -> SearchStatements:
+    """Page and count statements for a shape.
+
+    The page statement binds the count parameters (plus the cap when ``capped``),
+    the clause parameters (plus the cursor key when ``after``), then LIMIT and OFFSET.
+    """
+    from_clause, where_clause, order_by = compile_clauses(shape)
+    if capped:
+        count_query = f"SELECT COUNT(*) FROM (SELECT 1 FROM {from_clause} WHERE {where_clause} LIMIT ?)"
+    else:
+        count_query = f"SELECT COUNT(*) FROM {from_clause} WHERE {where_clause}"
+
+    page_where_clause = where_clause
+    if after:
+        page_where_clause += " AND (first_name, last_name, id) > (?, ?, ?)"
+
+    # The count rides along as an uncorrelated scalar subquery, which SQLite runs once,
+    # so page and total come back from a single statement. COUNT(*) OVER () would
+    # buffer every matching row before LIMIT applies and is far slower on broad filters.
+    search_query = f"""
+        SELECT {select_list}, ({count_query}) AS _total_count
+        FROM {from_clause}
+        WHERE {page_where_clause}
+        ORDER BY {order_by}
+        LIMIT ? OFFSET ?
+    """
+    return SearchStatements(search_query, count_query)
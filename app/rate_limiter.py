@@ -1,37 +1,337 @@
+import hashlib
+import mmap
+import os
+import struct
+import threading
 import time
-from typing import Dict, List
-from collections import defaultdict
+from typing import Dict, Any, Optional
 
+try:
+    import fcntl
+except ImportError:  # Windows: no shared_memory backend
+    fcntl = None
 
-class RateLimiter:
-    def __init__(self, requests_per_minute: int = 100):
-        self.requests_per_minute = requests_per_minute
-        self.requests = defaultdict(list)
 
-    def is_allowed(self, identifier: str) -> bool:
-        current_time = time.time()
-        window_start = current_time - 60
+def _window_weight(current_time: float, window: int, window_seconds: float) -> float:
+    """Fraction of the previous fixed window still covered by the sliding window."""
+    return 1.0 - (current_time - window * window_seconds) / window_seconds
+
+
+class RateLimitBackend:
+    """Storage for sliding window counters.
+
+    ``hit`` must atomically decide and record one check: charge ``cost`` to
+    ``identifier`` and return True if the weighted count stays within ``limit``,
+    otherwise leave the counters untouched and return False.
+    """
+
+    def hit(self, identifier: str, cost: int, limit: int, current_time: float, window_seconds: float) -> bool:
+        raise NotImplementedError
+
+    def cleanup(self, current_time: float, window_seconds: float):
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__, "tracked_identifiers": len(self)}
+
+
+class _WindowCounter:
+    """Sliding-window-counter state for one identifier: two fixed-window counts."""
+    __slots__ = ("window", "previous", "current")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.previous = 0
+        self.current = 0
+
+
+class _Shard:
+    __slots__ = ("lock", "counters", "next_sweep")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.next_sweep = 0.0
+
+
+class MemoryBackend(RateLimitBackend):
+    """Per-process counters spread over independently locked shards.
+
+    Each shard drops idle identifiers at most once per window, on the first check
+    after it is due, so eviction cost is amortized over regular traffic.
+    """
+
+    def __init__(self, shards: int = 64):
+        self._shards = [_Shard() for _ in range(shards)]
+
+    def hit(self, identifier: str, cost: int, limit: int, current_time: float, window_seconds: float) -> bool:
+        window = int(current_time // window_seconds)
+        shard = self._shards[hash(identifier) % len(self._shards)]
+
+        with shard.lock:
+            if current_time >= shard.next_sweep:
+                self._sweep(shard, window)
+                shard.next_sweep = current_time + window_seconds
+
+            counter = shard.counters.get(identifier)
+            if counter is None:
+                counter = shard.counters[identifier] = _WindowCounter(window)
+            elif counter.window != window:
+                counter.previous = counter.current if counter.window == window - 1 else 0
+                counter.current = 0
+                counter.window = window
+
+            estimated = counter.previous * _window_weight(current_time, window, window_seconds) + counter.current
+            if estimated + cost <= limit:
+                counter.current += cost
+                return True
+
+        return False
+
+    @staticmethod
+    def _sweep(shard: _Shard, window: int):
+        # Counters older than the previous window no longer affect any decision
+        counters = shard.counters
+        for identifier in [key for key, counter in counters.items() if counter.window < window - 1]:
+            del counters[identifier]
+
+    def cleanup(self, current_time: float, window_seconds: float):
+        window = int(current_time // window_seconds)
+        for shard in self._shards:
+            with shard.lock:
+                self._sweep(shard, window)
+                shard.next_sweep = current_time + window_seconds
+
+    def __len__(self) -> int:
+        return sum(len(shard.counters) for shard in self._shards)
+
+
+class SharedMemoryBackend(RateLimitBackend):
+    """Counter table in a memory-mapped file, shared by every process on the host.
+
+    The table is split into fixed-size buckets of ``bucket_size`` slots. An identifier
+    hashes to one bucket and lives in one of its slots; when a bucket is full the
+    slot with the oldest window is reused. Buckets are guarded by striped locks: a
+    threading lock for threads of this process plus an fcntl byte-range lock for
+    other processes, so a check costs two uncontended syscalls.
+    """
+
+    _MAGIC = b"RLSHM001"
+    _HEADER = struct.Struct("<8sII")
+    _SLOT = struct.Struct("<QqII")  # key hash, window, previous count, current count
+
+    def __init__(self, path: str, buckets: int = 65536, bucket_size: int = 8, stripes: int = 256):
+        if fcntl is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=shared_memory requires fcntl, which this platform lacks")
+        self.path = path
+        self.buckets = buckets
+        self.bucket_size = bucket_size
+        self.stripes = stripes
+        self._slots_offset = self._HEADER.size
+        size = self._slots_offset + buckets * bucket_size * self._SLOT.size
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+            magic, existing_buckets, existing_bucket_size = self._HEADER.unpack_from(self._map, 0)
+            if magic == self._MAGIC:
+                if (existing_buckets, existing_bucket_size) != (buckets, bucket_size):
+                    raise ValueError(f"Rate limit table {path} was created with a different layout")
+            else:
+                self._HEADER.pack_into(self._map, 0, self._MAGIC, buckets, bucket_size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+        self._locks = [threading.Lock() for _ in range(stripes)]
 
-        user_requests = self.requests[identifier]
-        user_requests = [req_time for req_time in user_requests if req_time > window_start]
+    @staticmethod
+    def _key_hash(identifier: str) -> int:
+        # Stable across processes, unlike hash(); 0 marks an empty slot
+        digest = hashlib.blake2b(identifier.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
 
-        # Check if under limit
-        if len(user_requests) < self.requests_per_minute:
-            user_requests.append(current_time)
-            self.requests[identifier] = user_requests
+    def _lock_stripe(self, stripe: int):
+        self._locks[stripe].acquire()
+        # Advisory lock: the byte offset only names the stripe, slot data is not affected
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+
+    def _unlock_stripe(self, stripe: int):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+        self._locks[stripe].release()
+
+    def hit(self, identifier: str, cost: int, limit: int, current_time: float, window_seconds: float) -> bool:
+        key_hash = self._key_hash(identifier)
+        bucket = key_hash % self.buckets
+        stripe = bucket % self.stripes
+        window = int(current_time // window_seconds)
+        slot_size = self._SLOT.size
+        first_slot = self._slots_offset + bucket * self.bucket_size * slot_size
+
+        self._lock_stripe(stripe)
+        try:
+            match = free = oldest = None
+            for index in range(self.bucket_size):
+                offset = first_slot + index * slot_size
+                slot = self._SLOT.unpack_from(self._map, offset)
+                if slot[0] == key_hash:
+                    match = (offset, slot)
+                    break
+                if free is None and (slot[0] == 0 or slot[1] < window - 1):
+                    free = offset
+                if oldest is None or slot[1] < oldest[1]:
+                    oldest = (offset, slot[1])
+
+            if match is not None:
+                target, (_, slot_window, previous, current) = match
+            else:
+                target = free if free is not None else oldest[0]
+                slot_window, previous, current = window, 0, 0
+
+            if slot_window != window:
+                previous = current if slot_window == window - 1 else 0
+                current = 0
+
+            estimated = previous * _window_weight(current_time, window, window_seconds) + current
+            allowed = estimated + cost <= limit
+            if allowed:
+                current += cost
+            self._SLOT.pack_into(self._map, target, key_hash, window, previous, current)
+            return allowed
+        finally:
+            self._unlock_stripe(stripe)
+
+    def __len__(self) -> int:
+        count = 0
+        for index in range(self.buckets * self.bucket_size):
+            if self._SLOT.unpack_from(self._map, self._slots_offset + index * self._SLOT.size)[0]:
+                count += 1
+        return count
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+class RemoteBackend(RateLimitBackend):
+    """Counters kept in a network key-value store shared by every replica.
+
+    ``client`` needs ``get``, ``incrby``, ``decrby`` and ``expire`` with Redis
+    semantics, so a ``redis.Redis`` instance works as is. The current window is
+    charged optimistically and refunded when over the limit: a single atomic
+    increment decides, so concurrent replicas can never admit more than the
+    limit between them.
+    """
+
+    def __init__(self, client, prefix: str = "rl"):
+        self.client = client
+        self.prefix = prefix
+
+    def hit(self, identifier: str, cost: int, limit: int, current_time: float, window_seconds: float) -> bool:
+        window = int(current_time // window_seconds)
+        current_key = f"{self.prefix}:{identifier}:{window}"
+        previous = int(self.client.get(f"{self.prefix}:{identifier}:{window - 1}") or 0)
+
+        current = self.client.incrby(current_key, cost)
+        if current == cost:
+            self.client.expire(current_key, int(window_seconds * 2) + 1)
+
+        estimated = previous * _window_weight(current_time, window, window_seconds) + current
+        if estimated <= limit:
             return True
 
+        self.client.decrby(current_key, cost)
         return False
 
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__}
+
+
+class LocalCounterStore:
+    """In-process stand-in for the key-value store used by RemoteBackend."""
+
+    def __init__(self):
+        self._values = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _expire_key(self, key: str):
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self._values.pop(key, None)
+            self._expires.pop(key, None)
+
+    def get(self, key: str) -> Optional[int]:
+        with self._lock:
+            self._expire_key(key)
+            return self._values.get(key)
+
+    def incrby(self, key: str, amount: int) -> int:
+        with self._lock:
+            self._expire_key(key)
+            self._values[key] = self._values.get(key, 0) + amount
+            return self._values[key]
+
+    def decrby(self, key: str, amount: int) -> int:
+        return self.incrby(key, -amount)
+
+    def expire(self, key: str, seconds: int) -> bool:
+        with self._lock:
+            if key not in self._values:
+                return False
+            self._expires[key] = time.time() + seconds
+            return True
+
+
+class RateLimiter:
+    """Sliding window counter rate limiter.
+
+    Each identifier keeps the request count of the current and the previous fixed
+    window. The previous count is weighted by how much of it still overlaps the
+    sliding window, which approximates a true sliding log in O(1) time and memory.
+    Where the counters live is up to the backend.
+    """
+
+    def __init__(self, requests_per_minute: int = 100, window_seconds: float = 60.0,
+                 backend: RateLimitBackend = None):
+        self.requests_per_minute = requests_per_minute
+        self.window_seconds = window_seconds
+        self.backend = backend if backend is not None else MemoryBackend()
+
+    def is_allowed(self, identifier: str, cost: int = 1) -> bool:
+        return self.backend.hit(identifier, cost, self.requests_per_minute, time.time(), self.window_seconds)
+
     def cleanup_old_requests(self):
-        current_time = time.time()
-        window_start = current_time - 60
+        self.backend.cleanup(time.time(), self.window_seconds)
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.backend.stats()
+        stats.update({
+            "requests_per_minute": self.requests_per_minute,
+            "window_seconds": self.window_seconds,
+        })
+        return stats
 
-        for identifier in list(self.requests.keys()):
-            self.requests[identifier] = [
-                req_time for req_time in self.requests[identifier]
-                if req_time > window_start
-            ]
 
-            if not self.requests[identifier]:
-                del self.requests[identifier]
+def create_rate_limiter(requests_per_minute: int, backend: str = "memory", shm_path: str = None,
+                        redis_url: str = None) -> RateLimiter:
+    if backend == "memory":
+        return RateLimiter(requests_per_minute=requests_per_minute)
+    if backend == "shared_memory":
+        return RateLimiter(requests_per_minute=requests_per_minute, backend=SharedMemoryBackend(shm_path))
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the redis package")
+        return RateLimiter(requests_per_minute=requests_per_minute,
+                           backend=RemoteBackend(redis.Redis.from_url(redis_url)))
+    raise ValueError(f"Unknown rate limit backend '{backend}'")
@@ -1,21 +1,91 @@
-from typing import List, Dict, Any, Optional
-from app.database import db
-from app import get_organization_columns
+import threading
+from typing import List, Dict, Any, Optional, NamedTuple
+from app.database import get_database
+from app.query_builder import RANKED_QUERY_MODES
+from app.columnar import ColumnarEngine
+from app.suggest import Suggester, sqlite_suggest
+from app.metrics import timed
+from app.pagination import encode_cursor, decode_cursor, SORT_KEY_COLUMNS
+from app import get_organization_columns, config
 
+COUNT_MODES = ("exact", "capped")
 
-class EmployeeSearch:
-    def __init__(self):
-        self.db = db
+_columnar_engine: Optional[ColumnarEngine] = None
+_columnar_engine_lock = threading.Lock()
 
-    def search_employees(self, query=None, status=None, department=None, location=None, company=None,
-                         position=None, limit=50, offset=0, organization_id=None):
 
-        if not organization_id:
-            raise ValueError("Organization ID is required")
+def get_columnar_engine() -> Optional[ColumnarEngine]:
+    """The columnar engine over the process-wide Database, or None when disabled."""
+    global _columnar_engine
+    if _columnar_engine is None and config.COLUMNAR_MAX_ORGS:
+        with _columnar_engine_lock:
+            if _columnar_engine is None:
+                _columnar_engine = ColumnarEngine(
+                    get_database(),
+                    max_orgs=config.COLUMNAR_MAX_ORGS,
+                    hot_threshold=config.COLUMNAR_HOT_THRESHOLD,
+                    max_age=config.COLUMNAR_MAX_AGE
+                )
+    return _columnar_engine
+
+
+_suggester: Optional[Suggester] = None
+_suggester_lock = threading.Lock()
+
+
+def get_suggester() -> Optional[Suggester]:
+    """The /suggest index over the process-wide Database, or None when SUGGEST_MAX_ORGS is 0."""
+    global _suggester
+    if _suggester is None and config.SUGGEST_MAX_ORGS:
+        with _suggester_lock:
+            if _suggester is None:
+                _suggester = Suggester(get_database(), max_orgs=config.SUGGEST_MAX_ORGS,
+                                       max_rows=config.SUGGEST_MAX_ROWS, hot_threshold=config.SUGGEST_HOT_THRESHOLD)
+    return _suggester
+
+
+def close_suggester():
+    global _suggester
+    with _suggester_lock:
+        suggester, _suggester = _suggester, None
+    if suggester is not None:
+        suggester.close()
+
+
+def close_columnar_engine():
+    global _columnar_engine
+    with _columnar_engine_lock:
+        engine, _columnar_engine = _columnar_engine, None
+    if engine is not None:
+        engine.close()
+
+
+class SearchResult(NamedTuple):
+    employees: List[Dict[str, Any]]
+    total_count: int
+    available_filters: Optional[Dict[str, List[str]]]
+    next_cursor: Optional[str]
+    total_count_exact: bool
+
 
+class BatchSearchResult(NamedTuple):
+    results: List[SearchResult]
+    available_filters: Optional[Dict[str, List[str]]]
+
+
+class EmployeeSearch:
+    def __init__(self):
+        self.db = get_database()
+        self.engine = get_columnar_engine()
+
+    @staticmethod
+    def _build_filters(query=None, query_mode=None, status=None, department=None, location=None,
+                       company=None, position=None) -> Dict[str, Any]:
         filters = {}
         if query:
             filters['query'] = query
+            if query_mode:
+                filters['query_mode'] = query_mode
         if status:
             filters['status'] = status
         if department:
@@ -26,24 +96,160 @@ class EmployeeSearch:
             filters['company'] = company
         if position:
             filters['position'] = position
+        return filters
+
+    def search_employees(self, query=None, status=None, department=None, location=None, company=None,
+                         position=None, limit=50, offset=0, organization_id=None, query_mode=None,
+                         cursor=None, include_filters=True, count_mode="exact", count_cap=1000):
+
+        if not organization_id:
+            raise ValueError("Organization ID is required")
+        search_args, key_columns = self._search_args(organization_id, query, status, department, location,
+                                                     company, position, limit, offset, query_mode, cursor,
+                                                     count_mode, count_cap)
+        result = None
+        if self.engine is not None:
+            with timed("columnar"):
+                result = self.engine.search(**search_args)
+        employees, total_count = result if result is not None else self.db.search_employees(**search_args)
+
+        available_filters = None
+        if include_filters:
+            with timed("available_filters"):
+                available_filters = self.db.get_available_filters(organization_id)
+
+        return self._search_result(employees, total_count, search_args, key_columns, available_filters)
+
+    def validate_search(self, organization_id=None, cursor=None, count_mode="exact", **search):
+        """Raise ValueError for /search parameters search_employees would reject, without searching."""
+        if not organization_id:
+            raise ValueError("Organization ID is required")
+        search_args, _ = self._search_args(organization_id, cursor=cursor, count_mode=count_mode, **search)
+        self.db.for_organization(organization_id).validate_search(organization_id, search_args['filters'],
+                                                                  search_args['after'])
 
-        # Get employees from database
-        employees, total_count = self.db.search_employees(
+    def search_employees_batch(self, searches: List[Dict[str, Any]], organization_id=None,
+                               include_filters=True) -> BatchSearchResult:
+        """Run several /search parameter sets for one organization together.
+
+        Searches the columnar engine can answer are served from it; the rest run in
+        one read snapshot, and available filters are looked up once for the batch.
+        """
+        if not organization_id:
+            raise ValueError("Organization ID is required")
+        if not searches:
+            return BatchSearchResult([], None)
+
+        prepared = [self._search_args(organization_id, **search) for search in searches]
+        found = [None] * len(searches)
+        if self.engine is not None:
+            with timed("columnar"):
+                found = [self.engine.search(**search_args) for search_args, _ in prepared]
+        misses = [position for position, result in enumerate(found) if result is None]
+
+        database_args = [{key: value for key, value in prepared[position][0].items() if key != 'organization_id'}
+                         for position in misses]
+        rows, available_filters = self.db.search_employees_batch(organization_id, database_args,
+                                                                 include_filters=include_filters)
+        for position, result in zip(misses, rows):
+            found[position] = result
+
+        results = [self._search_result(employees, total_count, search_args, key_columns, available_filters)
+                   for (search_args, key_columns), (employees, total_count) in zip(prepared, found)]
+        return BatchSearchResult(results, available_filters)
+
+    def _search_args(self, organization_id, query=None, status=None, department=None, location=None,
+                     company=None, position=None, limit=50, offset=0, query_mode=None, cursor=None,
+                     count_mode="exact", count_cap=1000):
+        """Database search arguments for one /search parameter set, and the sort key columns added to it."""
+        if count_mode not in COUNT_MODES:
+            raise ValueError(f"Invalid count_mode '{count_mode}', expected one of: {', '.join(COUNT_MODES)}")
+
+        filters = self._build_filters(query, query_mode, status, department, location, company, position)
+
+        after = decode_cursor(cursor) if cursor else None
+        allowed_columns = get_organization_columns(organization_id)
+        # The sort key is selected too so the last row can produce next_cursor
+        key_columns = [column for column in SORT_KEY_COLUMNS if column not in allowed_columns]
+
+        # Fetch one extra row to know whether another page follows
+        search_args = dict(
             organization_id=organization_id,
             filters=filters,
-            limit=limit,
-            offset=offset
+            limit=limit + 1,
+            offset=offset,
+            after=after,
+            count_cap=count_cap if count_mode == "capped" else None,
+            columns=list(allowed_columns) + key_columns
         )
-        available_filters = self.db.get_available_filters(organization_id)
-        allowed_columns = get_organization_columns(organization_id)
+        return search_args, key_columns
+
+    @staticmethod
+    def _search_result(employees, total_count, search_args, key_columns, available_filters) -> SearchResult:
+        """Trim the extra row fetched by _search_args into next_cursor and drop the added sort key columns."""
+        limit, count_cap = search_args['limit'] - 1, search_args['count_cap']
+        total_count_exact = True
+        if count_cap is not None and total_count > count_cap:
+            total_count, total_count_exact = count_cap, False
+
+        next_cursor = None
+        if len(employees) > limit:
+            employees = employees[:limit]
+            filters = search_args['filters']
+            if not (filters.get('query') and filters.get('query_mode') in RANKED_QUERY_MODES):
+                next_cursor = encode_cursor(employees[-1])
+
+        with timed("columns"):
+            for employee in employees:
+                for column in key_columns:
+                    del employee[column]
+
+        return SearchResult(employees, total_count, available_filters, next_cursor, total_count_exact)
+
+    def facet_counts(self, query=None, status=None, department=None, location=None, company=None,
+                     position=None, organization_id=None, query_mode=None):
+        if not organization_id:
+            raise ValueError("Organization ID is required")
+
+        filters = self._build_filters(query, query_mode, status, department, location, company, position)
+        result = self.engine.facet_counts(organization_id, filters) if self.engine is not None else None
+        return result if result is not None else self.db.get_facet_counts(organization_id, filters)
+
+    def export_employees(self, query=None, status=None, department=None, location=None, company=None,
+                         position=None, organization_id=None, query_mode=None, batch_size=1000):
+        if not organization_id:
+            raise ValueError("Organization ID is required")
+
+        filters = self._build_filters(query, query_mode, status, department, location, company, position)
+        return self.db.stream_employees(organization_id, filters,
+                                        columns=get_organization_columns(organization_id),
+                                        batch_size=batch_size)
+
+    def suggest(self, query=None, organization_id=None, limit=10, fuzzy=False, status=None) -> List[Dict[str, Any]]:
+        if not organization_id:
+            raise ValueError("Organization ID is required")
+        if not query or not query.strip():
+            return []
+
+        suggester = get_suggester()
+        if suggester is not None:
+            return suggester.suggest(organization_id, query, limit=limit, fuzzy=fuzzy, status=status)
+        database = self.db.for_organization(organization_id)
+        with database.read_pool.connection() as conn:
+            return sqlite_suggest(conn, database.fts_enabled, organization_id, query.lower().split(), limit,
+                                  status, "email" in get_organization_columns(organization_id))
+
+    async def search_employees_async(self, **kwargs) -> SearchResult:
+        return await self.db.run_async(self.search_employees, **kwargs)
+
+    async def facet_counts_async(self, **kwargs) -> Dict[str, Any]:
+        return await self.db.run_async(self.facet_counts, **kwargs)
 
-        filtered_employees = []
-        for employee in employees:
-            filtered_employee = {}
-            for column in allowed_columns:
-                if column in employee:
-                    filtered_employee[column] = employee[column]
-            filtered_employees.append(filtered_employee)
+    async def export_employees_async(self, **kwargs):
+        return await self.db.run_async(self.export_employees, **kwargs)
 
-        return filtered_employees, total_count, available_filters
+    async def search_employees_batch_async(self, **kwargs) -> BatchSearchResult:
+        return await self.db.run_async(self.search_employees_batch, **kwargs)
 
+    async def suggest_async(self, **kwargs) -> List[Dict[str, Any]]:
+        return await self.db.run_async(self.suggest, **kwargs)
@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without the optional dependency
+    orjson = None
+
+RESPONSE_SHAPES = ("rows", "columnar")
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON response for content that is already made of plain JSON types.
+
+    Skips FastAPI's response_model validation and jsonable_encoder pass, so it must
+    only be used for trusted data such as rows read from our own database.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def search_response_content(employees: List[Dict[str, Any]], columns: List[str], shape: str = "rows",
+                            **fields: Any) -> Dict[str, Any]:
+    """Body of a /search response.
+
+    The "rows" shape matches EmployeeSearchResponse. The "columnar" shape replaces
+    ``employees`` with ``rows``, one array per employee in ``columns`` order, which
+    avoids repeating every key on every row.
+    """
+    if shape not in RESPONSE_SHAPES:
+        raise ValueError(f"Invalid shape '{shape}', expected one of: {', '.join(RESPONSE_SHAPES)}")
+
+    content = {}
+    if shape == "columnar":
+        content["rows"] = [[employee.get(column) for column in columns] for employee in employees]
+    else:
+        content["employees"] = employees
+    content.update(fields)
+    content["columns"] = columns
+    return content
+
+
+def ndjson_chunks(columns: List[str], batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """One chunk per batch, one JSON object per line."""
+    for rows in batches:
+        yield b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def csv_chunks(columns: List[str], batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """Header chunk, then one chunk per batch. NULL becomes an empty field."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode("utf-8")
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,258 @@
+"""Production server: one supervisor process and WORKERS forked uvicorn workers.
+
+    python -m app.server --workers 4 --port 8000
+
+The supervisor imports the app, binds the listening socket and forks the workers,
+which all accept on that socket. Nothing opens the database at import time, so each
+worker opens its own SQLite connections after the fork. Those connections map the
+database files read-only with ``mmap_size`` large enough to cover them, so every
+worker reads the same page-cache pages instead of copying the data into its own
+heap; the supervisor reads the files once before forking so the first requests
+do not go to disk.
+
+Writes need no broadcast: every worker notices a commit from any process through
+``PRAGMA data_version`` and the change log, and retires its cached results, facets
+and in-memory indexes for the organizations that changed.
+
+Workers are replaced after WORKER_MAX_REQUESTS requests or WORKER_MAX_AGE seconds
+(each plus some jitter so they do not all restart at once), and when one exits for
+any other reason. SIGHUP replaces every worker, one at a time, without closing the
+socket; SIGTERM and SIGINT stop the workers gracefully and then the supervisor.
+"""
+import argparse
+import glob
+import os
+import random
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Dict, Optional
+
+import uvicorn
+
+from app import config
+
+# A worker that dies sooner than this after starting is failing on startup, so the
+# supervisor waits before forking its replacement instead of spinning
+MIN_WORKER_LIFETIME = 1.0
+RESPAWN_BACKOFF = 1.0
+
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn server that also stops once it is ``max_age`` seconds old."""
+
+    def __init__(self, server_config: uvicorn.Config, max_age: Optional[float] = None):
+        super().__init__(server_config)
+        self.max_age = max_age
+        self.started_at = time.monotonic()
+
+    async def on_tick(self, counter: int) -> bool:
+        if await super().on_tick(counter):
+            return True
+        return self.max_age is not None and time.monotonic() - self.started_at >= self.max_age
+
+
+def database_files(db_path: str = None) -> list:
+    """The SQLite files the workers will open: the database or its shards, and shard replicas."""
+    from app.database import default_database_path
+
+    db_path = db_path or default_database_path()
+    base_path = db_path[:-len(".db")] if db_path.endswith(".db") else db_path
+    # Shard files and their replicas are named after the database path
+    paths = {db_path, *glob.glob(f"{glob.escape(base_path)}.*.db")}
+    if config.SHARD_REPLICA_DIR:
+        paths.update(glob.glob(os.path.join(glob.escape(config.SHARD_REPLICA_DIR), "*.db")))
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+def share_database_pages(paths: list, prewarm: bool = True) -> int:
+    """Size ``mmap_size`` to cover every database file and optionally pull them into the page cache.
+
+    Returns the mmap size the workers will use. Headroom for growth is left so a
+    database that grows after startup stays fully mapped.
+    """
+    largest = max((os.path.getsize(path) for path in paths), default=0)
+    config.DB_MMAP_SIZE = max(config.DB_MMAP_SIZE, 2 * largest)
+    if prewarm and hasattr(os, "posix_fadvise"):
+        for path in paths:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+    return config.DB_MMAP_SIZE
+
+
+def _jittered(limit: float, jitter: float) -> float:
+    return limit + random.uniform(0, jitter) if jitter else limit
+
+
+class Supervisor:
+    def __init__(self, app, host: str = "0.0.0.0", port: int = 8000, workers: int = None,
+                 max_requests: int = None, max_requests_jitter: int = None, max_age: float = None,
+                 max_age_jitter: float = None, graceful_timeout: float = None):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = config.WORKERS if workers is None else workers
+        self.max_requests = config.WORKER_MAX_REQUESTS if max_requests is None else max_requests
+        self.max_requests_jitter = (config.WORKER_MAX_REQUESTS_JITTER if max_requests_jitter is None
+                                    else max_requests_jitter)
+        self.max_age = config.WORKER_MAX_AGE if max_age is None else max_age
+        self.max_age_jitter = config.WORKER_MAX_AGE_JITTER if max_age_jitter is None else max_age_jitter
+        self.graceful_timeout = config.WORKER_GRACEFUL_TIMEOUT if graceful_timeout is None else graceful_timeout
+
+        self.socket: Optional[socket.socket] = None
+        # pid -> monotonic start time, for workers that should be replaced when they exit
+        self._workers: Dict[int, float] = {}
+        # Workers told to stop by a SIGHUP recycle; their replacements are already running
+        self._retiring: Dict[int, float] = {}
+        self._stopping = False
+        self._recycle = False
+
+    def _server_config(self) -> uvicorn.Config:
+        max_requests = int(_jittered(self.max_requests, self.max_requests_jitter)) if self.max_requests else None
+        return uvicorn.Config(self.app, host=self.host, port=self.port, limit_max_requests=max_requests,
+                              timeout_graceful_shutdown=self.graceful_timeout or None)
+
+    def _spawn(self) -> int:
+        server_config = self._server_config()
+        max_age = _jittered(self.max_age, self.max_age_jitter) if self.max_age else None
+        # Anything still buffered would otherwise be written by the child as well
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid:
+            self._workers[pid] = time.monotonic()
+            return pid
+
+        status = 0
+        try:
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, signal.SIG_DFL)
+            # Recycling is the supervisor's business; a terminal hangup must not kill workers
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            WorkerServer(server_config, max_age).run(sockets=[self.socket])
+        except BaseException:
+            traceback.print_exc()
+            status = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status)
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_recycle(self, signum, frame):
+        self._recycle = True
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if self._retiring.pop(pid, None) is not None:
+                continue
+            started = self._workers.pop(pid, None)
+            if started is None or self._stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code:
+                print(f"Worker {pid} exited with status {code}, restarting it")
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                time.sleep(RESPAWN_BACKOFF)
+            self._spawn()
+
+    def _recycle_workers(self):
+        """Replace each worker in turn, starting its successor before stopping it."""
+        self._recycle = False
+        for pid in list(self._workers):
+            if self._stopping:
+                return
+            self._workers.pop(pid)
+            self._retiring[pid] = time.monotonic()
+            self._spawn()
+            self._signal(pid, signal.SIGTERM)
+
+    @staticmethod
+    def _signal(pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _shutdown(self):
+        children = list(self._workers) + list(self._retiring)
+        for pid in children:
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + (self.graceful_timeout or 30) + 5
+        remaining = set(children)
+        while remaining and time.monotonic() < deadline:
+            for pid in list(remaining):
+                try:
+                    if os.waitpid(pid, os.WNOHANG)[0]:
+                        remaining.discard(pid)
+                except ChildProcessError:
+                    remaining.discard(pid)
+            time.sleep(0.05)
+        for pid in remaining:
+            print(f"Worker {pid} did not stop in time, killing it")
+            self._signal(pid, signal.SIGKILL)
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self._workers.clear()
+        self._retiring.clear()
+
+    def run(self):
+        self.socket = uvicorn.Config(self.app, host=self.host, port=self.port).bind_socket()
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_recycle)
+        print(f"Supervisor {os.getpid()} forking {self.workers} workers on {self.host}:{self.port}")
+        try:
+            for _ in range(self.workers):
+                self._spawn()
+            while not self._stopping:
+                if self._recycle:
+                    self._recycle_workers()
+                self._reap()
+                time.sleep(0.1)
+        finally:
+            self._shutdown()
+            self.socket.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to WORKERS")
+    args = parser.parse_args()
+
+    workers = config.WORKERS if args.workers is None else args.workers
+    if workers > 1:
+        # Per-process limits would let a client through once per worker
+        os.environ.setdefault("RATE_LIMIT_BACKEND", "shared_memory")
+        config.RATE_LIMIT_BACKEND = os.environ["RATE_LIMIT_BACKEND"]
+
+    paths = database_files()
+    mmap_size = share_database_pages(paths, prewarm=config.WORKER_PREWARM)
+    if paths:
+        print(f"Mapping up to {mmap_size / 2 ** 20:.0f} MiB of {len(paths)} database files in each worker")
+
+    # Imported after the settings above are final: the rate limiter is built at import
+    from app.main import app
+
+    Supervisor(app, host=args.host, port=args.port, workers=workers).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,527 @@
+"""Organization sharding: one SQLite file per shard, optional replicas, and moving organizations.
+
+    python -m app.sharding status
+    python -m app.sharding move org_42 big_tenant
+    python -m app.sharding isolate --min-rows 500000
+
+The tool opens the same files as the server (DATABASE_PATH, DATABASE_SHARDS) and
+can run next to it: workers pick up moved organizations from the shard catalog.
+"""
+import argparse
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from app import config
+from app.connection_pool import ConnectionPool
+from app.database import EMPLOYEE_COLUMNS, Database, _init_lock, default_database_path
+from app.executor import BoundedExecutor
+
+SHARD_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# Organizations created by insert_sample_data
+SAMPLE_ORGANIZATIONS = ("org_1", "org_2")
+
+MOVE_BATCH_SIZE = 5000
+
+
+def hash_shard(organization_id: str, shards: int) -> str:
+    """Default shard of an organization; stable across processes, unlike hash()."""
+    return str(zlib.crc32(organization_id.encode("utf-8")) % shards)
+
+
+def dedicated_shard_name(organization_id: str) -> str:
+    return "tenant-" + re.sub(r"[^A-Za-z0-9_-]", "_", organization_id)
+
+
+class ShardCatalog:
+    """Organizations pinned to a shard, kept in a small SQLite file shared by all workers.
+
+    Lookups are served from memory. The file is checked for assignments made by
+    other processes at most every ``refresh_interval`` seconds, using PRAGMA
+    data_version, which only changes when another connection commits.
+    """
+
+    def __init__(self, path: str, refresh_interval: float = 1.0):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=config.DB_BUSY_TIMEOUT_MS / 1000)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        with self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS organization_shards (
+                    organization_id TEXT PRIMARY KEY,
+                    shard TEXT NOT NULL,
+                    moved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+        self._lock = threading.Lock()
+        self._assignments = {}
+        self._data_version = None
+        self._checked_at = 0.0
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._assignments = dict(self._conn.execute("SELECT organization_id, shard FROM organization_shards"))
+            self._data_version = data_version
+        self._checked_at = time.monotonic()
+
+    def get(self, organization_id: str, refresh: bool = False) -> Optional[str]:
+        """The organization's pinned shard; ``refresh`` checks the file for new moves first."""
+        if refresh or time.monotonic() - self._checked_at >= self.refresh_interval:
+            with self._lock:
+                self._refresh()
+        return self._assignments.get(organization_id)
+
+    def assign(self, organization_id: str, shard: str):
+        with self._lock:
+            with self._conn:
+                self._conn.execute('''
+                    INSERT INTO organization_shards (organization_id, shard) VALUES (?, ?)
+                    ON CONFLICT(organization_id) DO UPDATE SET shard = excluded.shard, moved_at = CURRENT_TIMESTAMP
+                ''', (organization_id, shard))
+            # Replaced rather than mutated, so get() can read it without the lock
+            self._assignments = dict(self._assignments, **{organization_id: shard})
+
+    def assignments(self) -> Dict[str, str]:
+        with self._lock:
+            self._refresh()
+            return dict(self._assignments)
+
+    def close(self):
+        self._conn.close()
+
+
+class ReplicaSet:
+    """Read pool for one shard: the shard file plus read-only snapshot copies of it.
+
+    A snapshot is a backup API copy opened with ``immutable=1``, so its readers
+    take no file locks at all. Snapshots serve reads only while the shard is
+    unchanged since they were taken, so a replica read is never stale: a changed
+    shard is read from the primary until a background refresh, at most every
+    ``refresh_interval`` seconds, copies it again.
+
+    Connections are handed out round-robin over the primary and the current
+    snapshots; release() returns each to the pool it came from. Snapshots belong
+    to one process, so every worker keeps its own copies.
+    """
+
+    def __init__(self, primary: ConnectionPool, replica_prefixes: Sequence[str], refresh_interval: float = 5.0):
+        self.primary = primary
+        self.db_path = primary.db_path
+        self.max_size = primary.max_size
+        self.refresh_interval = refresh_interval
+        self._prefixes = list(replica_prefixes)
+        self._replicas: List[Tuple[ConnectionPool, str]] = []
+        self._snapshot_version = None
+        self._refreshed_at = float("-inf")
+        self._refreshing = False
+        # Kept only to watch PRAGMA data_version for commits from any other connection
+        self._monitor = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._owners = {}
+        self._turn = itertools.count()
+        self._serial = itertools.count()
+        self.refreshes = 0
+        self.replica_reads = 0
+
+    def _pools(self) -> List[ConnectionPool]:
+        with self._lock:
+            fresh = self._monitor.execute("PRAGMA data_version").fetchone()[0] == self._snapshot_version
+            due = (not fresh and not self._refreshing
+                   and time.monotonic() - self._refreshed_at >= self.refresh_interval)
+            if due:
+                self._refreshing = True
+            pools = [self.primary] + [pool for pool, _ in self._replicas] if fresh else [self.primary]
+        if due:
+            threading.Thread(target=self._refresh_in_background, name="replica-refresh", daemon=True).start()
+        return pools
+
+    def acquire(self, wait: bool = True) -> Optional[sqlite3.Connection]:
+        pools = self._pools()
+        pool = pools[next(self._turn) % len(pools)]
+        conn = pool.acquire(wait)
+        if conn is None:
+            return None
+        if pool is not self.primary:
+            self.replica_reads += 1
+        self._owners[id(conn)] = pool
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        self._owners.pop(id(conn), self.primary).release(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def refresh(self):
+        """Copy the shard into new snapshots and swap them in for the current ones."""
+        # Read before copying: a commit during the copy leaves the snapshot marked stale
+        with self._lock:
+            version = self._monitor.execute("PRAGMA data_version").fetchone()[0]
+
+        serial = f"{os.getpid()}.{next(self._serial)}"
+        replicas = []
+        source = sqlite3.connect(self.db_path)
+        try:
+            for prefix in self._prefixes:
+                path = f"{prefix}.{serial}.db"
+                target = sqlite3.connect(path)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                replicas.append((ConnectionPool(f"file:{quote(path)}?immutable=1", max_size=self.max_size), path))
+        except BaseException:
+            self._discard(replicas)
+            raise
+        finally:
+            source.close()
+
+        with self._lock:
+            replicas, self._replicas = self._replicas, replicas
+            self._snapshot_version = version
+            self._refreshed_at = time.monotonic()
+            self.refreshes += 1
+        self._discard(replicas)
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"⚠️ Replica refresh failed for {self.db_path}: {e}")
+            with self._lock:
+                self._refreshed_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    @staticmethod
+    def _discard(replicas: List[Tuple[ConnectionPool, str]]):
+        for pool, path in replicas:
+            # Checked-out connections are closed on release; the unlinked file stays readable until then
+            pool.close()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def health_check(self) -> bool:
+        return self.primary.health_check()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.primary.stats()
+        with self._lock:
+            stats["replicas"] = {
+                "count": len(self._replicas),
+                "refreshes": self.refreshes,
+                "reads": self.replica_reads,
+                "age_seconds": (round(time.monotonic() - self._refreshed_at, 3)
+                                if self._replicas else None),
+            }
+        return stats
+
+    def close(self):
+        self.primary.close()
+        with self._lock:
+            replicas, self._replicas = self._replicas, []
+            self._monitor.close()
+        self._discard(replicas)
+
+
+class ShardedDatabase:
+    """Routes each organization to a shard: a Database over its own SQLite file.
+
+    An organization lives on one of ``shards`` hash shards unless the catalog pins
+    it elsewhere, typically a dedicated shard for a large tenant created by
+    move_organization. Shards have their own write and read pools and caches, so a
+    tenant's bulk load or long scans no longer hold the writer or the page cache
+    that everyone else needs; the executor for blocking calls is shared.
+
+    The organization-keyed Database methods are routed on organization_id; code
+    that needs a shard's pools goes through for_organization().
+    """
+
+    def __init__(self, path: str = None, shards: int = None, replicas: int = None,
+                 replica_refresh_interval: float = None, replica_dir: str = None,
+                 seed_sample_data: bool = None, catalog_refresh_interval: float = None):
+        path = path or default_database_path()
+        self.base_path = path[:-len(".db")] if path.endswith(".db") else path
+        self.shard_count = config.DATABASE_SHARDS if shards is None else shards
+        if self.shard_count < 1:
+            raise ValueError("A sharded database needs at least one shard")
+        self.replicas = config.SHARD_REPLICAS if replicas is None else replicas
+        self.replica_refresh_interval = (config.SHARD_REPLICA_REFRESH_INTERVAL
+                                         if replica_refresh_interval is None else replica_refresh_interval)
+        self.replica_dir = config.SHARD_REPLICA_DIR if replica_dir is None else replica_dir
+        self.db_path = f"{self.base_path}.shards.db"
+        self.executor = BoundedExecutor(max_workers=config.DB_EXECUTOR_WORKERS,
+                                        max_queue=config.DB_EXECUTOR_QUEUE_SIZE)
+        self.catalog = ShardCatalog(self.db_path, config.SHARD_CATALOG_REFRESH_INTERVAL
+                                    if catalog_refresh_interval is None else catalog_refresh_interval)
+        self._shards = {}
+        self._lock = threading.Lock()
+
+        pinned = sorted(set(self.catalog.assignments().values()))
+        for name in [str(index) for index in range(self.shard_count)] + pinned:
+            self.shard(name)
+        if config.SEED_SAMPLE_DATA if seed_sample_data is None else seed_sample_data:
+            self._seed_sample_data()
+
+    def shard_path(self, name: str) -> str:
+        return f"{self.base_path}.{name}.db"
+
+    def shard(self, name: str) -> Database:
+        """The shard called ``name``, opened, and created if needed, on first use."""
+        database = self._shards.get(name)
+        if database is not None:
+            return database
+        if not SHARD_NAME.match(name):
+            raise ValueError(f"Invalid shard name '{name}'")
+
+        with self._lock:
+            database = self._shards.get(name)
+            if database is None:
+                database = Database(self.shard_path(name), seed_sample_data=False, executor=self.executor)
+                if self.replicas:
+                    directory = self.replica_dir or os.path.dirname(database.db_path)
+                    prefix = os.path.join(directory, os.path.basename(self.base_path) + f".{name}")
+                    database.read_pool = ReplicaSet(
+                        database.read_pool, [f"{prefix}.replica{index}" for index in range(self.replicas)],
+                        refresh_interval=self.replica_refresh_interval)
+                self._shards[name] = database
+        return database
+
+    def shards(self) -> Dict[str, Database]:
+        with self._lock:
+            return dict(self._shards)
+
+    def shard_name(self, organization_id: str, refresh: bool = False) -> str:
+        return self.catalog.get(organization_id, refresh) or hash_shard(organization_id, self.shard_count)
+
+    def for_organization(self, organization_id: str, refresh: bool = False) -> Database:
+        return self.shard(self.shard_name(organization_id, refresh))
+
+    def _seed_sample_data(self):
+        for organization_id in SAMPLE_ORGANIZATIONS:
+            database = self.for_organization(organization_id)
+            with _init_lock(database.db_path), database.write_pool.connection() as conn:
+                exists = conn.execute("SELECT 1 FROM employees WHERE organization_id = ? LIMIT 1",
+                                      (organization_id,)).fetchone()
+                if exists is None:
+                    database.insert_sample_data(conn.cursor(), [organization_id])
+                    conn.commit()
+            if exists is None:
+                database.record_write([organization_id])
+
+    def search_employees(self, organization_id: str, *args, **kwargs):
+        return self.for_organization(organization_id).search_employees(organization_id, *args, **kwargs)
+
+    def search_employees_batch(self, organization_id: str, *args, **kwargs):
+        return self.for_organization(organization_id).search_employees_batch(organization_id, *args, **kwargs)
+
+    def get_available_filters(self, organization_id: str) -> Dict[str, List[str]]:
+        return self.for_organization(organization_id).get_available_filters(organization_id)
+
+    async def get_available_filters_async(self, organization_id: str) -> Dict[str, List[str]]:
+        return await self.run_async(self.get_available_filters, organization_id)
+
+    def stream_employees(self, organization_id: str, *args, **kwargs):
+        return self.for_organization(organization_id).stream_employees(organization_id, *args, **kwargs)
+
+    def get_facet_counts(self, organization_id: str, filters: Dict[str, Any]) -> Dict[str, Any]:
+        return self.for_organization(organization_id).get_facet_counts(organization_id, filters)
+
+    def data_version(self, organization_id: str) -> Tuple[int, int]:
+        return self.for_organization(organization_id).data_version(organization_id)
+
+    def organization_version(self, organization_id: str) -> int:
+        return self.for_organization(organization_id).organization_version(organization_id)
+
+    def version_tag(self, organization_id: str) -> str:
+        # Change log positions are per shard file, so a move must change the tag even if they coincide
+        return f"{self.shard_name(organization_id)}.{self.organization_version(organization_id)}"
+
+    def record_write(self, organization_ids):
+        by_shard = {}
+        for organization_id in set(organization_ids):
+            by_shard.setdefault(self.shard_name(organization_id), []).append(organization_id)
+        for name, shard_organizations in by_shard.items():
+            self.shard(name).record_write(shard_organizations)
+
+    def optimize_after_bulk_load(self, rows_written: int = None):
+        for database in self.shards().values():
+            database.optimize_after_bulk_load(rows_written)
+
+    def warmup(self, connections: int = None) -> int:
+        return sum(database.warmup(connections) for database in self.shards().values())
+
+    async def run_async(self, fn, *args, **kwargs):
+        return await self.executor.run(fn, *args, **kwargs)
+
+    def health_check(self) -> bool:
+        return all(database.health_check() for database in self.shards().values())
+
+    def index_report(self, organization_id: str = None) -> Dict[str, Any]:
+        if organization_id:
+            report = self.for_organization(organization_id).index_report(organization_id)
+            report["shard"] = self.shard_name(organization_id)
+            return report
+        return {"shards": {name: database.index_report() for name, database in self.shards().items()}}
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {"shards": {name: database.cache_stats() for name, database in self.shards().items()}}
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return {
+            "executor": self.executor.stats(),
+            "shards": {name: {"read": database.read_pool.stats(), "write": database.write_pool.stats(),
+                              "export": database.export_pool.stats()}
+                       for name, database in self.shards().items()},
+        }
+
+    def organization_counts(self) -> Dict[str, Dict[str, int]]:
+        """Shard -> organization -> rows."""
+        counts = {}
+        for name, database in sorted(self.shards().items()):
+            with database.read_pool.connection() as conn:
+                counts[name] = dict(conn.execute(
+                    "SELECT organization_id, COUNT(*) FROM employees GROUP BY organization_id").fetchall())
+        return counts
+
+    def close(self):
+        for database in self.shards().values():
+            database.close()
+        self.executor.shutdown()
+        self.catalog.close()
+
+
+def move_organization(router: ShardedDatabase, organization_id: str, target: str,
+                      grace_seconds: float = None) -> int:
+    """Copy an organization's rows to the ``target`` shard, repoint it there and delete the originals.
+
+    Writes to the source shard are held off from the start of the copy until the
+    originals are deleted. Writers look the organization up again once they hold
+    a shard's write lock (see BulkIngestor.flush), so a write that was waiting
+    on the source goes to the target instead of being left behind. Between
+    repointing and deleting, the move waits ``grace_seconds`` (by default twice
+    the catalog refresh interval) so every worker routes the organization to the
+    target before its rows disappear from the source. Returns the rows moved.
+    """
+    if grace_seconds is None:
+        grace_seconds = 2 * router.catalog.refresh_interval
+    source = router.for_organization(organization_id)
+    destination = router.shard(target)
+    if source is destination:
+        return 0
+
+    columns = ", ".join(EMPLOYEE_COLUMNS)
+    insert_sql = f"INSERT INTO employees ({columns}) VALUES ({', '.join('?' for _ in EMPLOYEE_COLUMNS)})"
+    moved = 0
+    with source.write_pool.connection() as source_conn, destination.write_pool.connection() as destination_conn:
+        try:
+            source_conn.execute("BEGIN IMMEDIATE")
+            # Leftovers of an earlier, interrupted move to this shard
+            destination_conn.execute("DELETE FROM employees WHERE organization_id = ?", (organization_id,))
+            cursor = source_conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(f"SELECT {columns} FROM employees WHERE organization_id = ?", (organization_id,))
+            while True:
+                rows = cursor.fetchmany(MOVE_BATCH_SIZE)
+                if not rows:
+                    break
+                destination_conn.executemany(insert_sql, rows)
+                moved += len(rows)
+            destination_conn.commit()
+
+            router.catalog.assign(organization_id, target)
+            time.sleep(grace_seconds)
+            source_conn.execute("DELETE FROM employees WHERE organization_id = ?", (organization_id,))
+            source_conn.commit()
+        except BaseException:
+            source_conn.rollback()
+            destination_conn.rollback()
+            raise
+
+    source.record_write([organization_id])
+    destination.record_write([organization_id])
+    if moved:
+        destination.optimize_after_bulk_load(moved)
+    return moved
+
+
+def isolate_large_organizations(router: ShardedDatabase, min_rows: int,
+                                grace_seconds: float = None) -> List[Tuple[str, str, int]]:
+    """Move every organization with at least ``min_rows`` rows that shares its shard to a dedicated one.
+
+    Returns (organization_id, shard, rows moved) per move.
+    """
+    moves = []
+    for name, organizations in router.organization_counts().items():
+        if len(organizations) < 2:
+            continue
+        for organization_id, rows in sorted(organizations.items(), key=lambda item: -item[1]):
+            if rows >= min_rows:
+                target = dedicated_shard_name(organization_id)
+                moves.append((organization_id, target,
+                              move_organization(router, organization_id, target, grace_seconds)))
+    return moves
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None, help="DATABASE_PATH the shard files are named after")
+    parser.add_argument("--shards", type=int, default=None, help="hash shards, defaults to DATABASE_SHARDS")
+    parser.add_argument("--grace", type=float, default=None,
+                        help="seconds between repointing an organization and deleting its old rows")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="rows per organization and shard")
+    move = commands.add_parser("move", help="move one organization to a shard")
+    move.add_argument("organization_id")
+    move.add_argument("shard")
+    isolate = commands.add_parser("isolate", help="give large organizations a shard of their own")
+    isolate.add_argument("--min-rows", type=int, required=True)
+    args = parser.parse_args()
+
+    router = ShardedDatabase(args.db, shards=args.shards or config.DATABASE_SHARDS or 1, replicas=0,
+                             seed_sample_data=False)
+    try:
+        if args.command == "status":
+            pinned = router.catalog.assignments()
+            for name, organizations in router.organization_counts().items():
+                path = router.shard_path(name)
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+                print(f"shard {name}: {sum(organizations.values())} rows, {len(organizations)} organizations, "
+                      f"{size / 2 ** 20:.1f} MiB ({path})")
+                for organization_id, rows in sorted(organizations.items(), key=lambda item: -item[1])[:10]:
+                    note = " (pinned)" if pinned.get(organization_id) == name else ""
+                    print(f"  {organization_id}: {rows}{note}")
+        elif args.command == "move":
+            started = time.perf_counter()
+            moved = move_organization(router, args.organization_id, args.shard, args.grace)
+            print(f"moved {args.organization_id}: {moved} rows to shard {args.shard} "
+                  f"in {time.perf_counter() - started:.1f}s")
+        else:
+            for organization_id, shard, moved in isolate_large_organizations(router, args.min_rows, args.grace):
+                print(f"moved {organization_id}: {moved} rows to shard {shard}")
+    finally:
+        router.close()
+
+
+if __name__ == "__main__":
+    main()
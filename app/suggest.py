@@ -0,0 +1,427 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from app import get_organization_columns
+from app.migrations import change_log_position
+
+# Tokens shorter than this are not expanded to their edit-distance-1 neighbours
+FUZZY_MIN_LENGTH = 3
+# Change log entries applied during a lookup; a longer backlog is left to a background reload
+INLINE_CHANGES = 64
+# Candidates checked against the table per lookup before settling for fewer results
+MAX_CANDIDATES = 2000
+# Seconds before an organization found too large to index is counted again
+TOO_LARGE_RECHECK = 300
+# Seconds before an organization found to have no employees is looked at again
+EMPTY_RECHECK = 60
+# Organizations whose lookups are counted towards a first load, and organizations
+# remembered as empty, per index slot; organization ids come from request headers
+TRACKED_PER_ORG = 16
+# Candidate rows looked at in memory per lookup, including those the prefilter drops
+MAX_SCANNED = 50_000
+# Keys an additional query word may match and still be used to prefilter candidates in memory
+PREFILTER_MAX_KEYS = 10_000
+
+# Keys are "<term>\0<rowid>": unique, and still ordered by term
+_SEPARATOR = "\x00"
+_AFTER_SEPARATOR = "\x01"
+_WORD = re.compile(r"\w+")
+
+
+def _terms(first_name: str, last_name: str, email: Optional[str]) -> Set[str]:
+    """Lowercased name words, plus the whole email address when the organization shows it."""
+    terms = set(_WORD.findall(f"{first_name} {last_name}".lower()))
+    if email:
+        terms.add(email.lower())
+    return terms
+
+
+def _keys(rowid: int, terms: Set[str]) -> List[str]:
+    return [f"{term}{_SEPARATOR}{rowid}" for term in terms]
+
+
+def _has_prefix(keys: List[str], prefix: str) -> bool:
+    index = bisect_left(keys, prefix)
+    return index < len(keys) and keys[index].startswith(prefix)
+
+
+def _next_chars(keys: List[str], head: str) -> List[str]:
+    """Characters that follow ``head`` in some term, one bisect per distinct character."""
+    chars = []
+    position = len(head)
+    index = bisect_left(keys, head)
+    while index < len(keys) and keys[index].startswith(head):
+        char = keys[index][position]
+        if char == _SEPARATOR:
+            # Terms equal to head; skip all of them at once
+            index = bisect_left(keys, head + _AFTER_SEPARATOR, index)
+            continue
+        chars.append(char)
+        index = bisect_left(keys, head + chr(ord(char) + 1), index)
+    return chars
+
+
+def _neighbours(keys: List[str], token: str) -> List[str]:
+    """Prefixes one edit away from ``token`` that start at least one term.
+
+    Substitutions and insertions only try characters that actually follow the
+    unchanged head in the index, so the sorted keys act as a trie.
+    """
+    variants = set()
+    for i in range(len(token)):
+        variants.add(token[:i] + token[i + 1:])
+        if i + 1 < len(token):
+            variants.add(token[:i] + token[i + 1] + token[i] + token[i + 2:])
+    for i in range(len(token) + 1):
+        head = token[:i]
+        for char in _next_chars(keys, head):
+            if i < len(token):
+                variants.add(head + char + token[i + 1:])
+            variants.add(head + char + token[i:])
+    variants.discard(token)
+    return sorted(variant for variant in variants
+                  if len(variant) >= FUZZY_MIN_LENGTH and _has_prefix(keys, variant))
+
+
+def _prefix_rowids(keys: List[str], prefix: str) -> Iterator[int]:
+    index = bisect_left(keys, prefix)
+    while index < len(keys) and keys[index].startswith(prefix):
+        yield int(keys[index].rpartition(_SEPARATOR)[2])
+        index += 1
+
+
+def _prefix_count(keys: List[str], prefix: str) -> int:
+    return bisect_left(keys, prefix + "\U0010ffff") - bisect_left(keys, prefix)
+
+
+class SuggestIndex:
+    """Sorted term keys of one organization's employees; a prefix lookup is a bisect.
+
+    Keys are added as employees change but never removed: lookups check every
+    candidate against its current row, so the keys an employee had before an
+    update or delete only cost a skipped candidate until the next reload.
+    ``seq`` is the last employee_changes entry reflected in the keys.
+    """
+
+    def __init__(self, organization_id: str, db_path: str, seq: int, keys: List[str], include_email: bool):
+        self.organization_id = organization_id
+        self.db_path = db_path
+        self.seq = seq
+        self.keys = keys
+        self.include_email = include_email
+        self.stale = 0
+        self.loaded_at = time.monotonic()
+
+    def with_changes(self, seq: int, rows: Sequence[tuple], changed: int) -> "SuggestIndex":
+        """A copy with keys for the given current (rowid, first_name, last_name, email) rows.
+
+        Readers keep using the old key list while the new one is built.
+        """
+        added = []
+        for rowid, first_name, last_name, email in rows:
+            for key in _keys(rowid, _terms(first_name, last_name, email if self.include_email else None)):
+                position = bisect_left(self.keys, key)
+                if position == len(self.keys) or self.keys[position] != key:
+                    added.append(key)
+        keys = self.keys + sorted(added)
+        # Two sorted runs: timsort merges them in linear time
+        keys.sort()
+        index = SuggestIndex(self.organization_id, self.db_path, seq, keys, self.include_email)
+        index.stale = self.stale + changed
+        index.loaded_at = self.loaded_at
+        return index
+
+
+class Suggester:
+    """Name autocomplete from per-organization SuggestIndex structures.
+
+    An organization's index is built in the background once it has been looked
+    up ``hot_threshold`` times, for organizations of at most ``max_rows``
+    employees, and kept for the ``max_orgs`` most recently used organizations.
+    Organizations without employees get no index. Before each lookup the
+    organization's employee_changes entries since the index was built are
+    applied, which sees writes from other processes too; a long backlog or a
+    pruned log triggers a reload instead. Whenever the index cannot answer,
+    the lookup runs against SQLite.
+    """
+
+    def __init__(self, db, max_orgs: int = 8, max_rows: int = 100_000, hot_threshold: int = 2):
+        self.db = db
+        self.max_orgs = max_orgs
+        self.max_rows = max_rows
+        self.hot_threshold = hot_threshold
+        self._indexes = OrderedDict()
+        self._too_large = {}
+        # Both most recent last and bounded by _track
+        self._lookups = OrderedDict()
+        self._empty = OrderedDict()
+        self._loading = set()
+        self._lock = threading.Lock()
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="suggest-loader")
+        self.hits = 0
+        self.fallbacks = 0
+        self.loads = 0
+        self.updates = 0
+
+    def load(self, organization_id: str) -> Optional[SuggestIndex]:
+        """Build the organization's index synchronously and install it; None if it is too large or empty."""
+        database = self.db.for_organization(organization_id)
+        include_email = "email" in get_organization_columns(organization_id)
+        with database.read_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            # One read transaction, so the rows are exactly those as of seq
+            cursor.execute("BEGIN")
+            try:
+                count = cursor.execute("SELECT COUNT(*) FROM employees WHERE organization_id = ?",
+                                       (organization_id,)).fetchone()[0]
+                if count > self.max_rows:
+                    with self._lock:
+                        self._too_large[organization_id] = time.monotonic()
+                    return None
+                if not count:
+                    with self._lock:
+                        self._indexes.pop(organization_id, None)
+                        self._track(self._empty, organization_id, time.monotonic())
+                    return None
+                seq = change_log_position(cursor)
+                rows = cursor.execute("""
+                    SELECT rowid, first_name, last_name, email FROM employees WHERE organization_id = ?
+                """, (organization_id,)).fetchall()
+            finally:
+                conn.rollback()
+
+        keys = []
+        for rowid, first_name, last_name, email in rows:
+            keys.extend(_keys(rowid, _terms(first_name, last_name, email if include_email else None)))
+        keys.sort()
+        index = SuggestIndex(organization_id, database.db_path, seq, keys, include_email)
+        self._install(index)
+        with self._lock:
+            self.loads += 1
+        return index
+
+    def _install(self, index: SuggestIndex):
+        with self._lock:
+            self._indexes[index.organization_id] = index
+            self._indexes.move_to_end(index.organization_id)
+            while len(self._indexes) > self.max_orgs:
+                self._indexes.popitem(last=False)
+
+    def _load_in_background(self, organization_id: str):
+        try:
+            self.load(organization_id)
+        finally:
+            with self._lock:
+                self._loading.discard(organization_id)
+
+    def _track(self, entries: OrderedDict, organization_id: str, value):
+        entries.pop(organization_id, None)
+        entries[organization_id] = value
+        while len(entries) > TRACKED_PER_ORG * self.max_orgs:
+            entries.popitem(last=False)
+
+    def _schedule_load(self, organization_id: str, first: bool = False):
+        """Load the organization's index in the background; a ``first`` load waits until it is hot."""
+        now = time.monotonic()
+        with self._lock:
+            too_large_at = self._too_large.get(organization_id)
+            empty_at = self._empty.get(organization_id)
+            if organization_id in self._loading or (
+                    too_large_at is not None and now - too_large_at < TOO_LARGE_RECHECK) or (
+                    empty_at is not None and now - empty_at < EMPTY_RECHECK):
+                return
+            if first:
+                lookups = self._lookups.get(organization_id, 0) + 1
+                if lookups < self.hot_threshold:
+                    self._track(self._lookups, organization_id, lookups)
+                    return
+            self._lookups.pop(organization_id, None)
+            self._empty.pop(organization_id, None)
+            self._loading.add(organization_id)
+        self._loader.submit(self._load_in_background, organization_id)
+
+    def _current_index(self, conn, database, organization_id: str) -> Optional[SuggestIndex]:
+        """The organization's index brought up to date with the change log, or None."""
+        with self._lock:
+            index = self._indexes.get(organization_id)
+            if index is not None:
+                self._indexes.move_to_end(organization_id)
+        if index is None or index.db_path != database.db_path:
+            self._schedule_load(organization_id, first=index is None)
+            return None
+
+        floor = conn.execute("SELECT MIN(seq) FROM employee_changes").fetchone()[0]
+        if floor is not None and floor > index.seq + 1:
+            # Entries newer than the index were trimmed from the log; some may have been ours
+            self._schedule_load(organization_id)
+            return None
+        changes = conn.execute("""
+            SELECT seq, employee_rowid FROM employee_changes WHERE organization_id = ? AND seq > ?
+            ORDER BY seq LIMIT ?
+        """, (organization_id, index.seq, INLINE_CHANGES + 1)).fetchall()
+        if not changes:
+            return index
+        if len(changes) > INLINE_CHANGES:
+            self._schedule_load(organization_id)
+            return None
+
+        rowids = sorted({change[1] for change in changes})
+        rows = conn.execute(f"""
+            SELECT rowid, first_name, last_name, email FROM employees
+            WHERE organization_id = ? AND rowid IN ({",".join("?" for _ in rowids)})
+        """, [organization_id] + rowids).fetchall()
+        updated = index.with_changes(changes[-1][0], rows, len(rowids))
+        with self._lock:
+            if self._indexes.get(organization_id) is index:
+                self._indexes[organization_id] = updated
+            self.updates += 1
+        if updated.stale > max(1024, len(updated.keys) // 4):
+            self._schedule_load(organization_id)
+        return updated
+
+    def _candidates(self, index: SuggestIndex, token: str, fuzzy: bool) -> Iterator[Tuple[int, str, bool]]:
+        """(rowid, matched prefix, fuzzy) in order: exact prefix matches, then one-edit matches."""
+        for rowid in _prefix_rowids(index.keys, token):
+            yield rowid, token, False
+        if fuzzy and len(token) >= FUZZY_MIN_LENGTH:
+            for variant in _neighbours(index.keys, token):
+                for rowid in _prefix_rowids(index.keys, variant):
+                    yield rowid, variant, True
+
+    def suggest(self, organization_id: str, query: str, limit: int = 10, fuzzy: bool = False,
+                status: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        tokens = query.lower().split()
+        if not tokens:
+            return []
+        database = self.db.for_organization(organization_id)
+        include_email = "email" in get_organization_columns(organization_id)
+
+        with database.read_pool.connection() as conn:
+            index = self._current_index(conn, database, organization_id)
+            if index is None:
+                self.fallbacks += 1
+                return sqlite_suggest(conn, database.fts_enabled, organization_id, tokens, limit, status,
+                                      include_email)
+            self.hits += 1
+
+            # The word with the fewest keys drives the lookup, and is the one allowed a typo:
+            # a misspelt word usually starts no term at all. Keys are a superset of the
+            # current terms, so a row without keys for every other word is skipped unread.
+            counts = [_prefix_count(index.keys, token) for token in tokens]
+            driver = tokens[counts.index(min(counts))]
+            if not min(counts) and not fuzzy:
+                return []
+            others = [token for token in tokens if token != driver]
+            required = [set(_prefix_rowids(index.keys, token)) for token, count in zip(tokens, counts)
+                        if token != driver and count <= PREFILTER_MAX_KEYS]
+            results = []
+            seen = set()
+            batch = []
+            candidates = self._candidates(index, driver, fuzzy)
+            examined = 0
+            while len(results) < limit and examined < MAX_CANDIDATES and len(seen) < MAX_SCANNED:
+                batch.clear()
+                for rowid, prefix, is_fuzzy in candidates:
+                    if rowid not in seen:
+                        seen.add(rowid)
+                        if all(rowid in rowids for rowids in required):
+                            batch.append((rowid, prefix, is_fuzzy))
+                            if len(batch) >= 2 * limit:
+                                break
+                        elif len(seen) >= MAX_SCANNED:
+                            break
+                if not batch:
+                    break
+                examined += len(batch)
+                results.extend(self._verify(conn, organization_id, batch, others, status, include_email))
+            return results[:limit]
+
+    @staticmethod
+    def _verify(conn, organization_id: str, batch: List[Tuple[int, str, bool]], other_tokens: List[str],
+                status: Optional[Sequence[str]], include_email: bool) -> List[Dict[str, Any]]:
+        """Keep the candidates whose current row still matches, in candidate order."""
+        rows = {row[0]: row for row in conn.execute(f"""
+            SELECT rowid, id, first_name, last_name, email, status FROM employees
+            WHERE organization_id = ? AND rowid IN ({",".join("?" for _ in batch)})
+        """, [organization_id] + [candidate[0] for candidate in batch]).fetchall()}
+
+        matches = []
+        for rowid, prefix, is_fuzzy in batch:
+            row = rows.get(rowid)
+            if row is None or (status and row[5] not in status):
+                continue
+            terms = _terms(row[2], row[3], row[4] if include_email else None)
+            if not any(term.startswith(prefix) for term in terms):
+                continue
+            if not all(any(term.startswith(token) for term in terms) for token in other_tokens):
+                continue
+            matches.append(_suggestion(row, include_email, is_fuzzy))
+        return matches
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                # Counts only: /health is not scoped to an organization
+                "organizations": len(self._indexes),
+                "keys": sum(len(index.keys) for index in self._indexes.values()),
+                "stale_keys": sum(index.stale for index in self._indexes.values()),
+                "too_large": len(self._too_large),
+                "hits": self.hits,
+                "fallbacks": self.fallbacks,
+                "loads": self.loads,
+                "updates": self.updates,
+            }
+
+    def close(self):
+        self._loader.shutdown(wait=True)
+
+
+def _suggestion(row: tuple, include_email: bool, fuzzy: bool) -> Dict[str, Any]:
+    suggestion = {"id": row[1], "first_name": row[2], "last_name": row[3], "fuzzy": fuzzy}
+    if include_email:
+        suggestion["email"] = row[4]
+    return suggestion
+
+
+def sqlite_suggest(conn, fts_enabled: bool, organization_id: str, tokens: List[str], limit: int,
+                   status: Optional[Sequence[str]], include_email: bool) -> List[Dict[str, Any]]:
+    """Prefix suggestions straight from SQLite, for organizations without an index.
+
+    Uses the unicode61 full-text index with prefix queries, restricted to the
+    columns the organization may see; without FTS5, a LIKE 'q%' over the same
+    columns. No fuzzy matching.
+    """
+    columns = ["first_name", "last_name"] + (["email"] if include_email else [])
+    params: List[Any] = []
+    if fts_enabled:
+        words = [word for token in tokens for word in _WORD.findall(token)]
+        if not words:
+            return []
+        match = "{%s} : (%s)" % (" ".join(columns), " AND ".join('"{}"*'.format(word) for word in words))
+        condition = "employees.rowid IN (SELECT rowid FROM employees_fts WHERE employees_fts MATCH ?)"
+        params.append(match)
+    else:
+        conditions = []
+        for token in tokens:
+            conditions.append("(" + " OR ".join(f"{column} LIKE ?" for column in columns) + ")")
+            params.extend([f"{token}%"] * len(columns))
+        condition = " AND ".join(conditions)
+
+    status_condition = ""
+    if status:
+        status_condition = f"AND status IN ({','.join('?' for _ in status)})"
+        params.extend(status)
+
+    rows = conn.execute(f"""
+        SELECT rowid, id, first_name, last_name, email, status FROM employees
+        WHERE organization_id = ? AND {condition} {status_condition}
+        ORDER BY first_name, last_name, id
+        LIMIT ?
+    """, [organization_id] + params + [limit]).fetchall()
+    return [_suggestion(row, include_email, False) for row in rows]
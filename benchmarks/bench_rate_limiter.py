@@ -0,0 +1,63 @@
+"""Cost per RateLimiter.is_allowed call and memory as the number of identifiers grows.
+
+    python -m benchmarks.bench_rate_limiter --identifiers 1000000
+    python -m benchmarks.bench_rate_limiter --backend shared_memory --shm-path /dev/shm/rl_bench
+"""
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+
+from app.rate_limiter import RateLimiter, MemoryBackend, SharedMemoryBackend
+
+
+def run(identifiers: int, checks: int = 200_000, requests_per_minute: int = 100,
+        backend: str = "memory", shm_path: str = None):
+    if backend == "shared_memory":
+        if os.path.exists(shm_path):
+            os.remove(shm_path)
+        limiter = RateLimiter(requests_per_minute=requests_per_minute, backend=SharedMemoryBackend(shm_path))
+    else:
+        limiter = RateLimiter(requests_per_minute=requests_per_minute, backend=MemoryBackend())
+    keys = [f"org_{i % 100}:client_{i}" for i in range(identifiers)]
+
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    for key in keys:
+        limiter.is_allowed(key)
+    populate_seconds = time.perf_counter() - started
+    memory_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Steady state: repeated checks against the populated table
+    sample = keys[:: max(len(keys) // checks, 1)][:checks]
+    started = time.perf_counter()
+    for key in sample:
+        limiter.is_allowed(key)
+    check_seconds = time.perf_counter() - started
+
+    return {
+        "backend": backend,
+        "identifiers": identifiers,
+        "tracked_identifiers": len(limiter) if backend == "memory" else None,
+        "populate_ns_per_call": round(populate_seconds / identifiers * 1e9, 1),
+        "check_ns_per_call": round(check_seconds / len(sample) * 1e9, 1),
+        "bytes_per_identifier": round(memory_bytes / identifiers, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--identifiers", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--backend", choices=["memory", "shared_memory"], default="memory")
+    parser.add_argument("--shm-path", default="/tmp/rate_limit_bench")
+    args = parser.parse_args()
+
+    for identifiers in args.identifiers:
+        print(run(identifiers, backend=args.backend, shm_path=args.shm_path))
+
+
+if __name__ == "__main__":
+    main()
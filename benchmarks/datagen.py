@@ -0,0 +1,163 @@
+"""Deterministic synthetic employees for benchmarks, with skewed value distributions.
+
+Real directories are lopsided: most employees are active, a few departments and
+offices hold most of the headcount and some names are far more common than others.
+Values are drawn from Zipf-like weights so filters and text queries see the same
+mix of broad and narrow matches.
+
+    python -m benchmarks.datagen --db /tmp/bench.db --sizes 10k 100k 1m
+"""
+import argparse
+import itertools
+import random
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Sequence
+
+from app.models import Company, Department, Location, Status
+
+STATUS_WEIGHTS = {
+    Status.ACTIVE.value: 0.82,
+    Status.TERMINATED.value: 0.13,
+    Status.NOT_STARTED.value: 0.05,
+}
+
+POSITIONS = {
+    "engineering": ["Software Engineer", "Senior Software Engineer", "Staff Engineer", "Engineering Manager",
+                    "QA Engineer", "DevOps Engineer", "Data Engineer"],
+    "marketing": ["Marketing Specialist", "Content Strategist", "Marketing Manager", "SEO Analyst"],
+    "sales": ["Account Executive", "Sales Representative", "Sales Manager", "Solutions Consultant"],
+    "hr": ["HR Generalist", "Recruiter", "HR Business Partner", "People Operations Manager"],
+    "finance": ["Accountant", "Financial Analyst", "Controller", "Payroll Specialist"],
+    "operations": ["Operations Analyst", "Operations Manager", "Office Manager", "Logistics Coordinator"],
+    "it": ["IT Support Specialist", "Systems Administrator", "Network Engineer", "Security Analyst"],
+    "product": ["Product Manager", "Senior Product Manager", "Product Analyst"],
+    "design": ["Product Designer", "UX Researcher", "Visual Designer"],
+}
+
+_SYLLABLES = ["an", "be", "ca", "da", "el", "fi", "ga", "ha", "is", "jo", "ka", "li", "ma", "no", "ol", "pa",
+              "ri", "sa", "ta", "ul", "va", "wi", "ya", "zo"]
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10000, '1m' -> 1000000, '2500' -> 2500."""
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def size_label(rows: int) -> str:
+    if rows >= 1_000_000 and rows % 1_000_000 == 0:
+        return f"{rows // 1_000_000}m"
+    if rows >= 1_000 and rows % 1_000 == 0:
+        return f"{rows // 1_000}k"
+    return str(rows)
+
+
+def zipf_weights(count: int, exponent: float = 1.1) -> List[float]:
+    return [1.0 / (rank + 1) ** exponent for rank in range(count)]
+
+
+def _names(rng: random.Random, count: int) -> List[str]:
+    names = set()
+    while len(names) < count:
+        names.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize())
+    return sorted(names)
+
+
+class _Picker:
+    """Weighted choice with precomputed cumulative weights."""
+
+    def __init__(self, rng: random.Random, values: Sequence, weights: Sequence[float]):
+        self.rng = rng
+        self.values = list(values)
+        self.cum_weights = list(itertools.accumulate(weights))
+
+    def __call__(self):
+        return self.rng.choices(self.values, cum_weights=self.cum_weights)[0]
+
+
+def generate_employees(organization_id: str, rows: int, seed: int = 0) -> Iterator[Dict[str, str]]:
+    """Yield ``rows`` employee records for an organization; the same seed gives the same rows."""
+    rng = random.Random(f"{seed}:{organization_id}")
+    first_names = _names(rng, 2000)
+    last_names = _names(rng, 5000)
+    rng.shuffle(first_names)
+    rng.shuffle(last_names)
+
+    pick_first = _Picker(rng, first_names, zipf_weights(len(first_names)))
+    pick_last = _Picker(rng, last_names, zipf_weights(len(last_names), 0.9))
+    pick_status = _Picker(rng, STATUS_WEIGHTS, STATUS_WEIGHTS.values())
+    pick_department = _Picker(rng, [d.value for d in Department], zipf_weights(len(Department)))
+    pick_location = _Picker(rng, [l.value for l in Location], zipf_weights(len(Location), 1.3))
+    pick_company = _Picker(rng, [c.value for c in Company], zipf_weights(len(Company), 1.5))
+    pick_position = {department: _Picker(rng, positions, zipf_weights(len(positions), 0.8))
+                     for department, positions in POSITIONS.items()}
+
+    epoch = date(2010, 1, 1)
+    for index in range(rows):
+        first_name, last_name = pick_first(), pick_last()
+        department = pick_department()
+        status = pick_status()
+        hire_date = epoch + timedelta(days=rng.randrange(5000))
+        termination_date = None
+        if status == Status.TERMINATED.value:
+            termination_date = (hire_date + timedelta(days=rng.randrange(30, 2000))).isoformat()
+        yield {
+            "id": f"{organization_id}_{index:07d}",
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": f"{first_name}.{last_name}{index}@{organization_id}.example.com".lower(),
+            "status": status,
+            "department": department,
+            "location": pick_location(),
+            "company": pick_company(),
+            "position": pick_position[department](),
+            "phone": f"+1-555-{rng.randrange(10_000_000):07d}",
+            "hire_date": hire_date.isoformat(),
+            "termination_date": termination_date,
+        }
+
+
+def populate(db, sizes: Sequence[int], seed: int = 0, batch_size: int = 10_000) -> Dict[str, int]:
+    """Load one ``bench_<size>`` organization per size into ``db``, skipping orgs already loaded.
+
+    Returns organization id -> row count.
+    """
+    from app.ingest import ingest_records
+
+    organizations = {}
+    for rows in sizes:
+        organization_id = f"bench_{size_label(rows)}"
+        organizations[organization_id] = rows
+        with db.for_organization(organization_id).read_pool.connection() as conn:
+            existing = conn.execute("SELECT COUNT(*) FROM employees WHERE organization_id = ?",
+                                    (organization_id,)).fetchone()[0]
+        if existing == rows:
+            continue
+
+        started = time.perf_counter()
+        records = enumerate(generate_employees(organization_id, rows, seed=seed), start=1)
+        stats = ingest_records(db, organization_id, records, batch_size=batch_size)
+        print(f"loaded {organization_id}: {stats['rows_written']} rows in {time.perf_counter() - started:.1f}s")
+    return organizations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="/tmp/employees_bench.db")
+    parser.add_argument("--sizes", nargs="+", default=["10k", "100k"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from app.database import Database
+
+    db = Database(args.db)
+    try:
+        populate(db, [parse_size(size) for size in args.sizes], seed=args.seed)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
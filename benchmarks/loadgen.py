@@ -0,0 +1,61 @@
+"""In-process HTTP load generator for ASGI apps.
+
+Requests go through httpx.ASGITransport straight into the app, so the numbers
+cover routing, validation, the executor hop, SQLite and serialization without any
+network or server process in the way. A fixed number of workers share one request
+budget, giving a closed-loop load at the chosen concurrency.
+"""
+import asyncio
+import itertools
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import httpx
+
+from benchmarks.results import summarize
+
+Request = Tuple[str, Dict[str, str]]
+
+
+async def run_load(app, requests: Sequence[Request], concurrency: int = 16, total: int = 2000,
+                   duration: Optional[float] = None) -> Dict[str, Any]:
+    """Send ``total`` GET requests (or keep going for ``duration`` seconds) cycling through ``requests``.
+
+    Returns the latency summary with qps and a count per response status.
+    """
+    pending = itertools.cycle(requests)
+    remaining = total
+    latencies = []
+    statuses = {}
+    deadline = time.perf_counter() + duration if duration else None
+
+    def next_request() -> Optional[Request]:
+        nonlocal remaining
+        if deadline is not None:
+            return next(pending) if time.perf_counter() < deadline else None
+        if remaining <= 0:
+            return None
+        remaining -= 1
+        return next(pending)
+
+    async def worker(client: httpx.AsyncClient):
+        while True:
+            request = next_request()
+            if request is None:
+                return
+            path, headers = request
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    summary = summarize(latencies, elapsed=elapsed)
+    summary["concurrency"] = concurrency
+    summary["statuses"] = {str(status): count for status, count in sorted(statuses.items())}
+    return summary
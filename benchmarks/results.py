@@ -0,0 +1,134 @@
+"""Latency summaries, result files and regression comparison.
+
+A result file is JSON: ``meta`` describes the run (commit, versions, CPU count)
+and ``benchmarks`` maps a benchmark name to its summary, e.g. ``p50_ms``.
+
+    python -m benchmarks.results baseline.json current.json --threshold 0.10
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms", "mean_ms")
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(latencies: List[float], elapsed: float = None) -> Dict[str, Any]:
+    """Summary of per-call latencies in seconds; qps is included when ``elapsed`` is given."""
+    latencies = sorted(latencies)
+    summary = {
+        "count": len(latencies),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 4) if latencies else 0.0,
+        "min_ms": round(latencies[0] * 1000, 4) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+        "max_ms": round(latencies[-1] * 1000, 4) if latencies else 0.0,
+    }
+    if elapsed:
+        summary["qps"] = round(len(latencies) / elapsed, 1)
+    return summary
+
+
+def measure(fn: Callable[[], Any], iterations: int = 200, warmup: int = 10) -> Dict[str, Any]:
+    """Call ``fn`` repeatedly and summarize the latency of each call."""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, elapsed=time.perf_counter() - started)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_metadata(**extra: Any) -> Dict[str, Any]:
+    meta = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    meta.update(extra)
+    return meta
+
+
+def write_results(path: str, benchmarks: Dict[str, Dict[str, Any]], **meta: Any) -> Dict[str, Any]:
+    results = {"meta": run_metadata(**meta), "benchmarks": benchmarks}
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return results
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.10,
+            metric: str = "p50_ms") -> List[Dict[str, Any]]:
+    """Per-benchmark change of ``metric`` between two result files.
+
+    ``change`` is the relative change, positive meaning slower (or fewer qps); a
+    benchmark is a regression when it got worse by more than ``threshold``.
+    """
+    rows = []
+    for name in sorted(set(baseline["benchmarks"]) & set(current["benchmarks"])):
+        before = baseline["benchmarks"][name].get(metric)
+        after = current["benchmarks"][name].get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        if metric == "qps":
+            change = -change
+        rows.append({"name": name, "before": before, "after": after, "change": round(change, 4),
+                     "regression": change > threshold})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown that counts as a regression")
+    parser.add_argument("--metric", default="p50_ms", choices=LATENCY_METRICS + ("qps",),
+                        help="summary field to compare; qps counts as worse when it drops")
+    args = parser.parse_args()
+
+    rows = compare(load_results(args.baseline), load_results(args.current), args.threshold, args.metric)
+    width = max((len(row["name"]) for row in rows), default=10)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['name']:<{width}}  {row['before']:>12.4f}  {row['after']:>12.4f}  {row['change']:>+8.1%}  {flag}")
+    sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Benchmark suite: synthetic data, micro-benchmarks and an in-process HTTP load test.
+
+    python -m benchmarks.run --sizes 10k 100k --output benchmarks/results/current.json
+    python -m benchmarks.results benchmarks/results/baseline.json benchmarks/results/current.json
+
+Organizations are generated once per database file by benchmarks.datagen and
+reused by later runs. The result cache is disabled for the search benchmarks,
+so they measure SQLite; search.*.cached shows the cache-hit path.
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict
+
+
+def _search_cases(database, organization_id: str) -> Dict[str, Callable[[], Any]]:
+    def search(filters, limit=50, offset=0, after=None):
+        return lambda: database.search_employees(organization_id, filters, limit, offset, after=after)
+
+    # The last row of the first page, to time a keyset page that is not the first
+    first_page, _ = database.search_employees(organization_id, {"status": "active"}, 50, 0,
+                                              columns=["first_name", "last_name", "id"])
+    after = (first_page[-1]["first_name"], first_page[-1]["last_name"], first_page[-1]["id"]) if first_page else None
+
+    return {
+        "no_filters": search({}),
+        "status": search({"status": "active"}),
+        "multi_filter": search({"status": ["active", "not_started"], "department": "engineering",
+                                "location": ["new_york", "london"]}),
+        "rare_filter": search({"location": "mumbai", "company": "subsidiary_2"}),
+        "position": search({"position": "engineer"}),
+        "substring": search({"query": "ana"}),
+        "prefix": search({"query": "ka", "query_mode": "prefix"}),
+        "deep_offset": search({"status": "active"}, offset=5000),
+        "cursor": search({"status": "active"}, after=after),
+    }
+
+
+def run_micro(database, organizations: Dict[str, int], iterations: int) -> Dict[str, Dict[str, Any]]:
+    from benchmarks.results import measure
+
+    results = {}
+    result_cache_size = database.result_cache.maxsize
+    database.result_cache.maxsize = 0
+    try:
+        for organization_id, rows in organizations.items():
+            label = organization_id[len("bench_"):]
+            slow_iterations = max(iterations // 4, 1) if rows >= 1_000_000 else iterations
+            for case, fn in _search_cases(database, organization_id).items():
+                results[f"search.{label}.{case}"] = measure(fn, iterations=slow_iterations)
+
+            def uncached_filters():
+                with database.for_organization(organization_id).read_pool.connection() as conn:
+                    return database._query_available_filters(conn.cursor(), organization_id)
+
+            results[f"filters.{label}.uncached"] = measure(uncached_filters, iterations=slow_iterations)
+            results[f"filters.{label}.cached"] = measure(lambda: database.get_available_filters(organization_id),
+                                                         iterations=iterations * 10)
+            results[f"facets.{label}"] = measure(lambda: database.get_facet_counts(organization_id, {"status": "active"}),
+                                                 iterations=max(iterations // 10, 5))
+    finally:
+        database.result_cache.maxsize = result_cache_size
+
+    for organization_id in organizations:
+        label = organization_id[len("bench_"):]
+        results[f"search.{label}.cached"] = measure(
+            lambda: database.search_employees(organization_id, {"status": "active"}, 50, 0), iterations=iterations * 10)
+    return results
+
+
+def run_rate_limiter(identifiers: int = 100_000, checks: int = 100_000) -> Dict[str, Dict[str, Any]]:
+    from app.rate_limiter import RateLimiter
+    from benchmarks.results import summarize
+
+    limiter = RateLimiter(requests_per_minute=1_000_000)
+    keys = [f"org_{i % 100}:client_{i}" for i in range(identifiers)]
+    for key in keys:
+        limiter.is_allowed(key)
+
+    # Batches of calls: one call is too short for perf_counter to time on its own
+    batch = 100
+    latencies = []
+    started = time.perf_counter()
+    for offset in range(0, checks, batch):
+        batch_started = time.perf_counter()
+        for key in keys[offset % identifiers:offset % identifiers + batch]:
+            limiter.is_allowed(key)
+        latencies.append((time.perf_counter() - batch_started) / batch)
+    elapsed = time.perf_counter() - started
+    summary = summarize(latencies)
+    summary.update({"qps": round(checks / elapsed, 1), "identifiers": identifiers})
+    return {"rate_limiter.is_allowed": summary}
+
+
+def run_http(organizations: Dict[str, int], concurrency: int, total: int) -> Dict[str, Dict[str, Any]]:
+    from app.main import app
+    from benchmarks.loadgen import run_load
+
+    results = {}
+    for organization_id in organizations:
+        label = organization_id[len("bench_"):]
+        headers = {"X-Organization-ID": organization_id, "X-Client-ID": "bench"}
+        mix = [
+            ("/search?status=active", headers),
+            ("/search?status=active&department=engineering&location=new_york&include_filters=false", headers),
+            ("/search?query=ana&limit=20", headers),
+            ("/search?query=ka&query_mode=prefix&count_mode=capped", headers),
+            ("/search?position=manager&offset=100", headers),
+            ("/filters", headers),
+        ]
+        results[f"http.{label}.mixed"] = asyncio.run(run_load(app, mix, concurrency=concurrency, total=total))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="/tmp/employees_bench.db")
+    parser.add_argument("--sizes", nargs="+", default=["10k", "100k"], help="rows per organization, e.g. 10k 100k 1m")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="HTTP requests per organization")
+    parser.add_argument("--skip-http", action="store_true")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "latest.json"))
+    args = parser.parse_args()
+
+    # The app reads these at import time, so set them before anything imports app.main
+    os.environ["DATABASE_PATH"] = args.db
+    os.environ.setdefault("RATE_LIMIT_REQUESTS_PER_MINUTE", str(10 ** 9))
+
+    from app.database import get_database
+    from benchmarks.datagen import parse_size, populate
+    from benchmarks.results import write_results
+
+    db = get_database()
+    sizes = [parse_size(size) for size in args.sizes]
+    organizations = populate(db, sizes, seed=args.seed)
+
+    benchmarks = {}
+    benchmarks.update(run_micro(db, organizations, args.iterations))
+    benchmarks.update(run_rate_limiter())
+    if not args.skip_http:
+        benchmarks.update(run_http(organizations, args.concurrency, args.requests))
+
+    write_results(args.output, benchmarks, sizes=sizes, seed=args.seed, iterations=args.iterations,
+                  concurrency=args.concurrency)
+    width = max(len(name) for name in benchmarks)
+    for name, summary in sorted(benchmarks.items()):
+        print(f"{name:<{width}}  p50 {summary['p50_ms']:>9.3f} ms  p99 {summary['p99_ms']:>9.3f} ms"
+              f"  {summary.get('qps', 0):>10.1f} qps")
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
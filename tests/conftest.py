@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# Give every test session a fresh database instead of reusing whatever an earlier
+# run or a local server left in /tmp, seeded with the demo organizations the
+# tests search.
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(prefix="employee-search-tests-"), "employees.db"))
+os.environ.setdefault("SEED_SAMPLE_DATA", "true")
@@ -0,0 +1,59 @@
+import asyncio
+from collections import Counter
+
+from app.main import app
+from benchmarks.datagen import generate_employees, parse_size, size_label
+from benchmarks.loadgen import run_load
+from benchmarks.results import compare, percentile, summarize
+
+
+def test_generated_employees_are_deterministic_and_skewed():
+    first = list(generate_employees("bench_test", 2000, seed=7))
+    assert first == list(generate_employees("bench_test", 2000, seed=7))
+    assert first != list(generate_employees("bench_test", 2000, seed=8))
+    assert len({employee["id"] for employee in first}) == 2000
+
+    statuses = Counter(employee["status"] for employee in first)
+    assert statuses["active"] > 0.7 * len(first)
+    locations = Counter(employee["location"] for employee in first).most_common()
+    assert locations[0][1] > 5 * locations[-1][1]
+
+
+def test_size_labels():
+    assert parse_size("10k") == 10_000
+    assert parse_size("1m") == 1_000_000
+    assert parse_size("2500") == 2500
+    assert size_label(100_000) == "100k"
+    assert size_label(1_000_000) == "1m"
+
+
+def test_percentiles_and_summary():
+    values = [i / 1000 for i in range(1, 101)]
+    assert percentile(values, 0.50) == 0.050
+    assert percentile(values, 0.99) == 0.099
+    summary = summarize(values, elapsed=2.0)
+    assert summary["count"] == 100
+    assert summary["p95_ms"] == 95.0
+    assert summary["qps"] == 50.0
+
+
+def test_compare_flags_regressions():
+    baseline = {"benchmarks": {"fast": {"p50_ms": 1.0, "qps": 100}, "slow": {"p50_ms": 1.0, "qps": 100},
+                               "removed": {"p50_ms": 1.0}}}
+    current = {"benchmarks": {"fast": {"p50_ms": 0.5, "qps": 200}, "slow": {"p50_ms": 1.5, "qps": 95}}}
+
+    rows = {row["name"]: row for row in compare(baseline, current, threshold=0.1)}
+    assert set(rows) == {"fast", "slow"}
+    assert not rows["fast"]["regression"] and rows["slow"]["regression"]
+
+    rows = {row["name"]: row for row in compare(baseline, current, threshold=0.1, metric="qps")}
+    assert not rows["fast"]["regression"] and not rows["slow"]["regression"]
+
+
+def test_load_generator_reports_latency_and_statuses():
+    requests = [("/search?status=active", {"X-Organization-ID": "org_1", "X-Client-ID": "loadgen"}),
+                ("/filters", {"X-Organization-ID": "org_1", "X-Client-ID": "loadgen"})]
+    summary = asyncio.run(run_load(app, requests, concurrency=4, total=20))
+    assert summary["count"] == 20
+    assert summary["statuses"] == {"200": 20}
+    assert summary["p50_ms"] <= summary["p99_ms"]
@@ -0,0 +1,52 @@
+import pytest
+import time
+from app.cache import LRUCache
+
+
+def test_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2, ttl=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_entries_expire():
+    cache = LRUCache(maxsize=2, ttl=0.01)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_version_mismatch_is_a_miss():
+    cache = LRUCache(maxsize=2)
+    cache.set("org_1", "old", version=1)
+
+    assert cache.get("org_1", version=2) is None
+    assert cache.get("org_1", version=1) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 0
+    assert stats["misses"] == 2
+
+
+def test_cache_invalidate_by_predicate():
+    cache = LRUCache(maxsize=10)
+    cache.set(("org_1", "a"), 1)
+    cache.set(("org_2", "a"), 2)
+
+    cache.invalidate(lambda key: key[0] == "org_1")
+    assert cache.get(("org_1", "a")) is None
+    assert cache.get(("org_2", "a")) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
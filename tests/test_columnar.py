@@ -0,0 +1,125 @@
+import pytest
+
+from app.columnar import CHUNK_BITS, SEARCH_COUNTS_PER_ORG, ColumnarEngine, _set_positions
+from app.database import Database
+
+FILTER_SETS = [
+    {},
+    {"status": "active"},
+    {"status": ["active", "terminated"]},
+    {"department": ["engineering"], "location": ["new_york", "london"]},
+    {"company": "headquarters", "status": ["not_started"]},
+    {"position": "engineer"},
+    {"position": "S_n%r"},
+    {"status": ["no_such_status"]},
+]
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "columnar.db"))
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def engine(database):
+    engine = ColumnarEngine(database, max_orgs=2, hot_threshold=1)
+    engine.load("org_1")
+    yield engine
+    engine.close()
+
+
+def test_set_positions_skips_and_limits():
+    positions = (3, CHUNK_BITS - 1, CHUNK_BITS, CHUNK_BITS + 9, 3 * CHUNK_BITS + 5)
+    bitset = [0] * 4
+    for position in positions:
+        bitset[position // CHUNK_BITS] |= 1 << (position % CHUNK_BITS)
+
+    assert _set_positions(bitset, 0, 0, 10) == list(positions)
+    assert _set_positions(bitset, 0, 2, 2) == [CHUNK_BITS, CHUNK_BITS + 9]
+    assert _set_positions(bitset, CHUNK_BITS, 1, 10) == [CHUNK_BITS + 9, 3 * CHUNK_BITS + 5]
+    assert _set_positions(bitset, 4 * CHUNK_BITS, 0, 10) == []
+    assert _set_positions([], 0, 0, 10) == []
+
+
+@pytest.mark.parametrize("filters", FILTER_SETS)
+def test_search_matches_sqlite(database, engine, filters):
+    for limit, offset, count_cap in ((5, 0, None), (3, 2, None), (50, 0, 2)):
+        expected = database.search_employees("org_1", filters, limit, offset, count_cap=count_cap)
+        assert engine.search("org_1", filters, limit, offset, count_cap=count_cap) == expected
+
+
+@pytest.mark.parametrize("filters", FILTER_SETS)
+def test_facet_counts_match_sqlite(database, engine, filters):
+    assert engine.facet_counts("org_1", filters) == database.get_facet_counts("org_1", filters)
+
+
+def test_cursor_pages_match_sqlite(database, engine):
+    filters = {"status": ["active", "not_started"]}
+    columns = ["first_name", "last_name", "id"]
+    after = None
+    while True:
+        expected, _ = database.search_employees("org_1", filters, 2, 0, after=after, columns=columns)
+        result, _ = engine.search("org_1", filters, 2, 0, after=after, columns=columns)
+        assert result == expected
+        if not result:
+            break
+        after = (result[-1]["first_name"], result[-1]["last_name"], result[-1]["id"])
+
+
+def test_text_queries_fall_back_to_sqlite(engine):
+    assert engine.search("org_1", {"query": "john"}, 10, 0) is None
+
+
+def test_stale_snapshot_falls_back_until_reloaded(database, engine):
+    with database.write_pool.connection() as conn:
+        conn.execute("UPDATE employees SET status = 'terminated' WHERE organization_id = 'org_1'")
+        conn.commit()
+    database.record_write(["org_1"])
+
+    assert engine.search("org_1", {"status": "terminated"}, 10, 0) is None
+    engine.close()  # waits for the scheduled reload
+
+    _, total_count = engine.search("org_1", {"status": "terminated"}, 10, 0)
+    assert total_count == database.search_employees("org_1", {}, 10, 0)[1]
+
+
+def test_hot_organizations_are_loaded_and_evicted(database):
+    engine = ColumnarEngine(database, max_orgs=1, hot_threshold=2)
+    assert engine.search("org_2", {}, 10, 0) is None
+    assert engine.stats()["loading"] == 0
+
+    engine.search("org_2", {}, 10, 0)
+    engine.close()
+    assert list(engine._snapshots) == ["org_2"] and engine.stats()["rows"] == 200
+
+    engine.load("org_1")
+    assert list(engine._snapshots) == ["org_1"] and engine.stats()["organizations"] == 1
+
+
+def test_search_counts_are_bounded(database):
+    engine = ColumnarEngine(database, max_orgs=1, hot_threshold=2)
+    try:
+        engine.search("org_2", {}, 10, 0)
+        for index in range(SEARCH_COUNTS_PER_ORG * 4):
+            engine.search(f"org_unknown_{index}", {}, 10, 0)
+        assert len(engine._searches) == SEARCH_COUNTS_PER_ORG
+        # The oldest count was dropped, so org_2 starts over
+        engine.search("org_2", {}, 10, 0)
+        assert engine.stats()["loading"] == 0 and engine._searches["org_2"] == 1
+    finally:
+        engine.close()
+
+
+def test_organizations_without_rows_get_no_snapshot(database):
+    engine = ColumnarEngine(database, max_orgs=1, hot_threshold=2)
+    try:
+        engine.load("org_1")
+        for _ in range(2):
+            engine.search("org_missing", {}, 10, 0)
+        engine.close()
+        assert list(engine._snapshots) == ["org_1"]
+        assert engine.stats()["loads"] == 1 and "org_missing" not in engine._searches
+    finally:
+        engine.close()
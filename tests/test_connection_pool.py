@@ -0,0 +1,65 @@
+import sqlite3
+import threading
+import pytest
+from app.connection_pool import ConnectionPool, PoolTimeoutError
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "pool.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.execute("INSERT INTO items (name) VALUES ('a')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_pool_reuses_connections(db_path):
+    pool = ConnectionPool(db_path, max_size=2)
+
+    with pool.connection() as conn:
+        first = conn
+    with pool.connection() as conn:
+        assert conn is first
+
+    stats = pool.stats()
+    assert stats["created"] == 1
+    assert stats["acquired"] == 2
+    assert stats["in_use"] == 0
+
+
+def test_reader_connections_are_query_only(db_path):
+    pool = ConnectionPool(db_path, max_size=1, read_only=True)
+
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO items (name) VALUES ('b')")
+
+
+def test_pool_is_bounded(db_path):
+    pool = ConnectionPool(db_path, max_size=1, timeout=0.05)
+
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+
+    released = threading.Timer(0.01, pool.release, args=(conn,))
+    pool.timeout = 1.0
+    released.start()
+    with pool.connection() as conn:
+        assert conn.execute("SELECT 1").fetchone()[0] == 1
+    assert pool.stats()["waits"] == 1
+
+
+def test_health_check_discards_broken_connections(db_path):
+    pool = ConnectionPool(db_path, max_size=2)
+
+    with pool.connection() as conn:
+        conn.close()
+
+    assert pool.health_check() is True
+    assert pool.stats()["discarded"] == 1
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import pytest
+from app.executor import BoundedExecutor, ExecutorOverloadedError
+
+
+def test_run_executes_off_the_event_loop():
+    executor = BoundedExecutor(max_workers=2, max_queue=2)
+
+    async def main():
+        loop_thread = threading.get_ident()
+        worker_thread = await executor.run(threading.get_ident)
+        return loop_thread, worker_thread
+
+    loop_thread, worker_thread = asyncio.run(main())
+    assert loop_thread != worker_thread
+    assert executor.stats()["completed"] == 1
+    executor.shutdown()
+
+
+def test_run_rejects_work_beyond_queue_depth():
+    executor = BoundedExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def main():
+        blocked = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(ExecutorOverloadedError):
+            await executor.run(release.wait)
+        release.set()
+        await asyncio.gather(*blocked)
+
+    asyncio.run(main())
+    stats = executor.stats()
+    assert stats["rejected"] == 1
+    assert stats["pending"] == 0
+    executor.shutdown()
+
+
+def test_run_propagates_exceptions():
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        asyncio.run(executor.run(fail))
+    assert executor.stats()["pending"] == 0
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,86 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import Database
+from app.main import app
+from app.index_advisor import IndexAdvisor, QueryShape, WorkloadRecorder
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "advisor.db"))
+    yield database
+    database.close()
+
+
+def test_query_shapes_ignore_values():
+    assert QueryShape.from_filters({"location": ["tokyo"], "department": "hr"}) == \
+        QueryShape.from_filters({"department": "it", "location": "paris"})
+    assert QueryShape.from_filters({"query": "ann"}).query_mode == "substring"
+    assert QueryShape.from_filters({"query_mode": "prefix"}).query_mode is None
+
+
+def test_recorder_bounds_distinct_shapes():
+    recorder = WorkloadRecorder(max_shapes=1)
+    recorder.record({"status": "active"})
+    recorder.record({"department": "hr"})
+    recorder.record({"status": "terminated"})
+    assert recorder.total == 3
+    assert recorder.shapes() == [(QueryShape(("status",), False, None), 2)]
+
+
+def test_recommends_indexes_for_unserved_shapes(database):
+    advisor = IndexAdvisor(database, min_queries=3)
+    for _ in range(5):
+        advisor.record({"location": "tokyo", "company": "headquarters"})
+        advisor.record({"location": "paris"})
+        advisor.record({"status": "active", "department": "hr"})
+        advisor.record({"query": "ann", "department": "hr"})
+    advisor.record({"company": "branch_1"})
+
+    recommendations = advisor.recommend()
+    # status+department is a prefix of idx_search_comprehensive, location alone shares
+    # the location+company index, text queries and rare shapes get nothing
+    assert [(r.name, r.columns[:3], r.queries) for r in recommendations] == [
+        ("idx_auto_location_company", ("organization_id", "location", "company"), 10)
+    ]
+    assert recommendations[0].columns[-3:] == ("first_name", "last_name", "id")
+
+
+def test_apply_creates_indexes_used_by_the_planner(database):
+    advisor = IndexAdvisor(database, min_queries=1)
+    filters = {"department": "engineering"}
+    advisor.record(filters)
+    assert "idx_auto_department" not in " ".join(advisor.explain("org_1", filters)["count"])
+
+    before, before_total = database.search_employees("org_1", filters, 10, 0)
+    assert advisor.apply() == ["idx_auto_department"]
+    assert advisor.recommend() == []
+    assert "idx_auto_department" in " ".join(advisor.explain("org_1", filters)["count"])
+    assert database.search_employees("org_1", filters, 10, 0) == (before, before_total)
+
+
+def test_searches_feed_the_workload(database):
+    database.search_employees("org_1", {"department": "sales"}, 5, 0)
+    database.get_facet_counts("org_1", {"department": "sales"})
+    assert dict(database.index_advisor.recorder.shapes())[QueryShape(("department",), False, None)] == 2
+
+
+def test_explain_handles_uri_characters_in_the_path(tmp_path):
+    database = Database(str(tmp_path / "odd?name#1.db"))
+    try:
+        assert database.index_advisor.explain("org_1", {"status": "active"})["page"]
+    finally:
+        database.close()
+
+
+def test_index_endpoint_is_scoped_to_the_caller():
+    with TestClient(app) as client:
+        assert client.get("/indexes").status_code == 400
+        client.get("/search?status=active", headers={"X-Organization-ID": "org_1"})
+
+        response = client.get("/indexes?explain=true", headers={"X-Organization-ID": "org_1"})
+        assert response.status_code == 200
+        shapes = response.json()["shapes"]
+        assert shapes and all("plan" in entry for entry in shapes)
+        assert "plan" not in str(client.get("/indexes", headers={"X-Organization-ID": "org_1"}).json())
@@ -0,0 +1,133 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Database
+from app.ingest import CsvParser, NdjsonParser, iter_records, ingest_records
+
+client = TestClient(app)
+
+
+def make_employee(i, **overrides):
+    employee = {
+        "id": f"ing_{i}",
+        "first_name": f"Ingest{i}",
+        "last_name": "Loader",
+        "email": f"ingest{i}@example.com",
+        "status": "active",
+        "department": "engineering",
+        "location": "berlin",
+        "company": "headquarters",
+        "position": "Data Engineer",
+    }
+    employee.update(overrides)
+    return employee
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "ingest.db"))
+    yield database
+    database.close()
+
+
+def test_csv_parser_handles_quoted_newlines():
+    lines = [
+        "id,first_name,position\n",
+        '1,Ann,"Lead\n',
+        'Engineer"\n',
+        "2,Bob,\n",
+        "3,Cid\n",
+    ]
+    records = list(iter_records(CsvParser(), lines))
+
+    assert records[0] == (2, {"id": "1", "first_name": "Ann", "position": "Lead\nEngineer"})
+    assert records[1] == (4, {"id": "2", "first_name": "Bob", "position": None})
+    assert isinstance(records[2][1], ValueError)
+
+
+def test_ingest_upserts_in_batches(database):
+    records = [(i, make_employee(i)) for i in range(25)]
+    stats = ingest_records(database, "org_bulk", records, batch_size=10)
+
+    assert stats["rows_written"] == 25
+    assert stats["batches"] == 3
+    _, total_count = database.search_employees("org_bulk", {"query": "loader"}, 50, 0)
+    assert total_count == 25
+
+    # Unchanged records are skipped, changed ones update in place
+    records[0] = (0, make_employee(0, last_name="Renamed"))
+    stats = ingest_records(database, "org_bulk", records, batch_size=10)
+    assert stats["rows_written"] == 1
+    assert stats["rows_unchanged"] == 24
+    employees, _ = database.search_employees("org_bulk", {"query": "renamed"}, 50, 0)
+    assert [employee["id"] for employee in employees] == ["ing_0"]
+
+
+def test_only_large_loads_fully_optimize(database, monkeypatch):
+    statements = []
+    monkeypatch.setattr("app.config.BULK_OPTIMIZE_MIN_ROWS", 20)
+    with database.write_pool.connection() as conn:
+        conn.set_trace_callback(statements.append)
+    try:
+        ingest_records(database, "org_bulk", [(i, make_employee(i)) for i in range(5)])
+        assert not [statement for statement in statements if "'optimize'" in statement or statement == "ANALYZE"]
+        assert "PRAGMA optimize" in statements
+
+        ingest_records(database, "org_bulk", [(i, make_employee(i)) for i in range(5, 25)])
+        assert "ANALYZE" in statements
+    finally:
+        with database.write_pool.connection() as conn:
+            conn.set_trace_callback(None)
+
+
+def test_ingest_rejects_invalid_records(database):
+    records = list(iter_records(NdjsonParser(), [
+        json.dumps(make_employee(1)),
+        "{not json",
+        json.dumps(make_employee(2, status="retired")),
+        json.dumps(make_employee(3, email=None)),
+        json.dumps(make_employee(4, organization_id="org_other")),
+        json.dumps(make_employee(5, department="janitorial")),
+        json.dumps(make_employee(6, location="hq")),
+        json.dumps(make_employee(7, company="acme")),
+    ]))
+    stats = ingest_records(database, "org_bulk", records)
+
+    assert stats["rows_written"] == 1
+    assert stats["rows_rejected"] == 7
+    assert stats["errors"][0].startswith("record 2: invalid JSON")
+    assert stats["errors"][4:] == ["record 6: invalid department 'janitorial'", "record 7: invalid location 'hq'",
+                                   "record 8: invalid company 'acme'"]
+    assert database.get_available_filters("org_bulk")["locations"] == ["berlin"]
+
+
+def test_ingest_cannot_overwrite_other_organizations(database):
+    stats = ingest_records(database, "org_bulk", [(1, make_employee(1, id="e_org1_0"))])
+
+    assert stats["rows_written"] == 0
+    employees, _ = database.search_employees("org_1", {"query": "phan0@"}, 10, 0)
+    assert employees[0]["first_name"] == "Kha0"
+
+
+def test_bulk_endpoint_streams_ndjson_and_csv():
+    headers = {"X-Organization-ID": "org_bulk_api"}
+    body = "\n".join(json.dumps(make_employee(i)) for i in range(5))
+    response = client.post("/employees/bulk?batch_size=2", content=body, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["rows_written"] == 5
+    assert response.json()["batches"] == 3
+
+    csv_body = "id,first_name,last_name,email,status,department,location,company,position\n" \
+               "ing_9,Csv,Loader,csv@example.com,not_started,sales,paris,branch_1,Analyst\n"
+    response = client.post("/employees/bulk", content=csv_body, headers={**headers, "Content-Type": "text/csv"})
+    assert response.json()["rows_written"] == 1
+
+    search = client.get("/search?query=loader", headers=headers).json()
+    assert search["total_count"] == 6
+    assert "paris" in search["available_filters"]["locations"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
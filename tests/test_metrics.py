@@ -0,0 +1,70 @@
+import logging
+
+from fastapi.testclient import TestClient
+
+from app.database import Database
+from app.main import app
+from app.metrics import Histogram, MetricsRegistry, RequestTimings, timed, _current_timings
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency.", ("stage",), buckets=(0.01, 0.1))
+    for seconds in (0.005, 0.01, 0.05, 2.0):
+        histogram.observe(("query",), seconds)
+
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{stage="query",le="0.01"} 2' in lines
+    assert 'latency_seconds_bucket{stage="query",le="0.1"} 3' in lines
+    assert 'latency_seconds_bucket{stage="query",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{stage="query"} 4' in lines
+
+
+def test_organization_labels_are_bounded():
+    registry = MetricsRegistry(max_organizations=2)
+    assert [registry.organization_label(org) for org in ("a", "b", "c", "a")] == ["a", "b", "other", "a"]
+
+
+def test_timed_is_a_no_op_outside_requests():
+    with timed("query") as stage:
+        pass
+    assert stage.timings is None
+
+    timings = RequestTimings()
+    token = _current_timings.set(timings)
+    try:
+        with timed("query"):
+            pass
+        with timed("query"):
+            pass
+    finally:
+        _current_timings.reset(token)
+    assert list(timings.stages) == ["query"]
+    assert timings.server_timing(0.002).endswith("total;dur=2.000")
+
+
+def test_search_reports_server_timing_and_metrics():
+    response = client.get("/search?status=active&limit=7", headers={"X-Organization-ID": "org_1"})
+    assert response.status_code == 200
+    stages = {entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")}
+    assert {"rate_limit", "result_cache", "columns", "serialize", "total"} <= stages
+    assert "query" in stages or "columnar" in stages
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{path="/search",organization_id="org_1",status="200"}' in metrics.text
+    assert 'search_stage_duration_seconds_count{path="/search",stage="serialize",organization_id="org_1"}' in metrics.text
+
+
+def test_slow_queries_are_logged_with_plan(tmp_path, caplog):
+    database = Database(str(tmp_path / "slow.db"))
+    database.slow_query_seconds = 1e-9
+    with caplog.at_level(logging.WARNING, logger="app.slow_queries"):
+        database.search_employees("org_1", {"status": "active"}, 5, 0)
+    database.close()
+
+    message = caplog.records[-1].getMessage()
+    assert "SELECT" in message and "'org_1'" in message
+    assert "plan:" in message and ("SEARCH" in message or "SCAN" in message)
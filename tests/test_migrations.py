@@ -0,0 +1,81 @@
+import sqlite3
+
+from app.database import Database
+from app.migrations import (
+    MIGRATIONS, Migration, apply_migrations, change_log_position, organization_change_position, prune_change_log
+)
+
+
+def index_names(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        conn.close()
+
+
+def test_migrations_are_recorded_and_run_once(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "migrations.db"))
+    assert apply_migrations(conn) == [migration.name for migration in MIGRATIONS]
+    assert apply_migrations(conn) == []
+
+    versions = [row[0] for row in conn.execute("SELECT version FROM schema_migrations ORDER BY version")]
+    assert versions == [migration.version for migration in MIGRATIONS]
+
+    extra = Migration(MIGRATIONS[-1].version + 1, "add column", "ALTER TABLE employees ADD COLUMN nickname TEXT")
+    assert apply_migrations(conn, MIGRATIONS + [extra]) == ["add column"]
+    assert apply_migrations(conn, MIGRATIONS + [extra]) == []
+    conn.close()
+
+
+def test_failed_migration_is_rolled_back(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "migrations.db"))
+    apply_migrations(conn)
+    broken = Migration(100, "broken", "CREATE TABLE audit (id INTEGER); SELECT * FROM missing_table")
+    try:
+        apply_migrations(conn, MIGRATIONS + [broken])
+    except sqlite3.OperationalError:
+        pass
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'audit'").fetchone() is None
+    assert conn.execute("SELECT 1 FROM schema_migrations WHERE version = 100").fetchone() is None
+    conn.close()
+
+
+def test_database_restarts_on_a_legacy_schema(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    legacy = sqlite3.connect(path)
+    legacy.executescript(MIGRATIONS[0].apply + """
+        CREATE INDEX idx_org_id ON employees(organization_id);
+        CREATE INDEX idx_name ON employees(first_name, last_name);
+    """)
+    legacy.close()
+
+    Database(path).close()
+    database = Database(path)
+    employees, total = database.search_employees("org_1", {"status": "active"}, 5, 0)
+    database.close()
+
+    assert total > 0
+    indexes = index_names(path)
+    assert "idx_org_name" in indexes
+    assert not {"idx_org_id", "idx_name"} & indexes
+
+
+def test_change_log_tracks_writes_and_keeps_each_organizations_newest_entry(tmp_path):
+    database = Database(str(tmp_path / "changes.db"), seed_sample_data=True)
+    conn = sqlite3.connect(database.db_path)
+    org_1, org_2 = (organization_change_position(conn, organization_id) for organization_id in ("org_1", "org_2"))
+    assert 0 < org_1 < org_2 == change_log_position(conn)
+
+    conn.execute("UPDATE employees SET department = 'sales' WHERE id = 'e_org1_0'")
+    conn.commit()
+    assert organization_change_position(conn, "org_1") > org_2
+    assert organization_change_position(conn, "org_2") == org_2
+
+    latest = organization_change_position(conn, "org_1")
+    prune_change_log(conn, 0)
+    conn.commit()
+    assert conn.execute("SELECT organization_id, seq FROM employee_changes ORDER BY seq").fetchall() == [
+        ("org_2", org_2), ("org_1", latest)]
+    conn.close()
+    database.close()
@@ -0,0 +1,40 @@
+import pytest
+
+from app.database import Database
+from app.query_builder import JSON_LIST, MAX_INLINE_VALUES, bind_search, compile_clauses, compile_search
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "employees.db"), seed_sample_data=True)
+    database.result_cache.maxsize = 0
+    yield database
+    database.close()
+
+
+def test_values_and_list_lengths_share_one_statement():
+    three, params = bind_search("org_1", {"department": ["sales", "hr", "it"], "status": "active"}, True)
+    four, _ = bind_search("org_2", {"department": ["a", "b", "c", "d"], "status": ["terminated"]}, True)
+    assert three == four
+    assert three.lists == (1, 4, 0, 0)
+    assert params == ["org_1", "active", "sales", "hr", "it", "it"]
+    assert compile_search(three, "*", False, False) is compile_search(four, "*", False, False)
+    assert "department IN (?, ?, ?, ?)" in compile_clauses(three).where_clause
+
+    # The query text decides how it is matched, not what the statement looks like
+    assert (bind_search("org_1", {"query": "kha"}, True)[0] == bind_search("org_1", {"query": "phan"}, True)[0]
+            != bind_search("org_1", {"query": "kh"}, True)[0])
+    with pytest.raises(ValueError):
+        bind_search("org_1", {"query": "kha", "query_mode": "regex"}, True)
+
+
+def test_padded_and_json_lists_match_the_same_rows(db):
+    departments = ["engineering", "sales", "hr"]
+    padded, total = db.search_employees("org_1", {"department": departments}, 200, 0)
+    assert total == 120
+    assert {employee["department"] for employee in padded} == set(departments)
+
+    many = departments + [f"unknown_{index}" for index in range(MAX_INLINE_VALUES)]
+    shape, _ = bind_search("org_1", {"department": many}, db.fts_enabled)
+    assert shape.lists[1] == JSON_LIST
+    assert db.search_employees("org_1", {"department": many}, 200, 0) == (padded, total)
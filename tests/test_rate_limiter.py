@@ -1,6 +1,19 @@
+import multiprocessing
 import pytest
+import threading
 import time
-from app.rate_limiter import RateLimiter
+from app import rate_limiter
+from app.rate_limiter import (
+    RateLimiter, MemoryBackend, SharedMemoryBackend, RemoteBackend, LocalCounterStore
+)
+
+
+class FakeClock:
+    def __init__(self, now=1_000_020.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
 
 
 def test_rate_limiter_allows_requests():
@@ -34,5 +47,143 @@ def test_different_clients_different_limits():
     assert limiter.is_allowed(client2) == False
 
 
+def test_sliding_window_weights_previous_window(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "time", clock)
+    limiter = RateLimiter(requests_per_minute=10)
+
+    for _ in range(10):
+        assert limiter.is_allowed("client") == True
+    assert limiter.is_allowed("client") == False
+
+    # Half of the previous window still overlaps the sliding window: 5 of 10 count
+    clock.now += 90
+    for _ in range(5):
+        assert limiter.is_allowed("client") == True
+    assert limiter.is_allowed("client") == False
+
+    clock.now += 120
+    assert limiter.is_allowed("client") == True
+
+
+def test_request_cost_is_charged(monkeypatch):
+    monkeypatch.setattr(time, "time", FakeClock())
+    limiter = RateLimiter(requests_per_minute=10)
+
+    assert limiter.is_allowed("client", cost=8) == True
+    assert limiter.is_allowed("client", cost=3) == False
+    assert limiter.is_allowed("client", cost=2) == True
+
+
+def test_idle_identifiers_are_evicted(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "time", clock)
+    limiter = RateLimiter(requests_per_minute=10, backend=MemoryBackend(shards=4))
+
+    for i in range(100):
+        limiter.is_allowed(f"client_{i}")
+    assert len(limiter) == 100
+
+    clock.now += 180
+    limiter.cleanup_old_requests()
+    assert len(limiter) == 0
+
+
+def test_concurrent_checks_never_exceed_limit():
+    limiter = RateLimiter(requests_per_minute=500, backend=MemoryBackend(shards=2))
+    allowed = []
+
+    def worker():
+        allowed.append(sum(limiter.is_allowed("shared") for _ in range(200)))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(allowed) == 500
+
+
+@pytest.fixture(params=["memory", "shared_memory", "remote"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryBackend()
+    elif request.param == "shared_memory":
+        backend = SharedMemoryBackend(str(tmp_path / "rate_limit"), buckets=64)
+        yield backend
+        backend.close()
+    else:
+        yield RemoteBackend(LocalCounterStore())
+
+
+def test_backends_enforce_limit_per_identifier(backend):
+    limiter = RateLimiter(requests_per_minute=3, backend=backend)
+
+    for _ in range(3):
+        assert limiter.is_allowed("client_1") == True
+    assert limiter.is_allowed("client_1") == False
+    assert limiter.is_allowed("client_2") == True
+
+
+def test_backends_weight_previous_window(backend, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "time", clock)
+    limiter = RateLimiter(requests_per_minute=10, backend=backend)
+
+    for _ in range(10):
+        assert limiter.is_allowed("client") == True
+    clock.now += 90
+    assert sum(limiter.is_allowed("client") for _ in range(10)) == 5
+
+
+def _hammer_shared_table(path, results):
+    limiter = RateLimiter(requests_per_minute=300, backend=SharedMemoryBackend(path, buckets=64))
+    results.put(sum(limiter.is_allowed("shared_client") for _ in range(200)))
+
+
+def test_shared_memory_limit_spans_processes(tmp_path):
+    path = str(tmp_path / "rate_limit")
+    SharedMemoryBackend(path, buckets=64).close()
+    results = multiprocessing.Queue()
+
+    workers = [multiprocessing.Process(target=_hammer_shared_table, args=(path, results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sum(results.get() for _ in workers) == 300
+
+
+def test_shared_memory_reuses_stalest_slot_when_bucket_is_full(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "time", clock)
+    backend = SharedMemoryBackend(str(tmp_path / "rate_limit"), buckets=1, bucket_size=2, stripes=1)
+    limiter = RateLimiter(requests_per_minute=1, backend=backend)
+
+    assert limiter.is_allowed("a") == True
+    clock.now += 60
+    assert limiter.is_allowed("b") == True
+    assert limiter.is_allowed("c") == True
+    assert len(limiter) == 2
+    assert limiter.is_allowed("b") == False
+    backend.close()
+
+
+def test_shared_memory_rejects_mismatched_layout(tmp_path):
+    path = str(tmp_path / "rate_limit")
+    SharedMemoryBackend(path, buckets=64).close()
+
+    with pytest.raises(ValueError):
+        SharedMemoryBackend(path, buckets=32)
+
+
+def test_shared_memory_needs_fcntl(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "fcntl", None)
+    with pytest.raises(RuntimeError):
+        SharedMemoryBackend(str(tmp_path / "rate_limit"), buckets=64)
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -1,8 +1,17 @@
+import csv
+import io
+import json
+import sqlite3
+import threading
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 from app.search import EmployeeSearch
-from app import get_organization_columns
+from app.database import Database, ExportLimitError, get_database
+from app.models import EmployeeSearchResponse
+from app import serialization
+from app import get_organization_columns, config
+from app.migrations import change_log_position
 
 client = TestClient(app)
 
@@ -97,5 +106,430 @@ def test_available_filters_in_search_response():
         assert isinstance(filters[filter_type], list)
 
 
+def test_substring_query_matches_like_fallback():
+    substring = client.get("/search?query=han1", headers={"X-Organization-ID": "org_1"}).json()
+    like = client.get("/search?query=han1&query_mode=like", headers={"X-Organization-ID": "org_1"}).json()
+
+    assert substring["total_count"] > 0
+    assert substring["total_count"] == like["total_count"]
+    assert substring["employees"] == like["employees"]
+
+
+def test_short_substring_query_uses_like():
+    response = client.get("/search?query=19", headers={"X-Organization-ID": "org_1"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_count"] > 0
+    for employee in data["employees"]:
+        assert any("19" in employee[field].lower() for field in ["first_name", "last_name", "email", "position"])
+
+
+def test_prefix_and_token_query_modes():
+    prefix = client.get("/search?query=kha19&query_mode=prefix", headers={"X-Organization-ID": "org_1"}).json()
+    token = client.get("/search?query=kha19&query_mode=token", headers={"X-Organization-ID": "org_1"}).json()
+
+    assert token["total_count"] == 1
+    assert token["employees"][0]["first_name"] == "Kha19"
+    assert prefix["total_count"] == 11
+    assert prefix["employees"][0]["first_name"] == "Kha19"
+
+
+def test_invalid_query_mode():
+    response = client.get("/search?query=kha&query_mode=fuzzy", headers={"X-Organization-ID": "org_1"})
+
+    assert response.status_code == 400
+
+
+def test_full_text_index_follows_writes(tmp_path):
+    database = Database(str(tmp_path / "fts.db"))
+    with database.write_pool.connection() as conn:
+        conn.execute("UPDATE employees SET last_name = 'Zebrafish' WHERE id = 'e_org1_7'")
+        conn.execute("DELETE FROM employees WHERE id = 'e_org1_8'")
+        conn.commit()
+
+    employees, total_count = database.search_employees("org_1", {"query": "zebrafish"}, 10, 0)
+    assert total_count == 1
+    assert employees[0]["id"] == "e_org1_7"
+
+    _, total_count = database.search_employees("org_1", {"query": "phan8@", "query_mode": "substring"}, 10, 0)
+    assert total_count == 0
+    database.close()
+
+
+def test_cursor_pagination_walks_all_results():
+    headers = {"X-Organization-ID": "org_2"}
+    offset_page = client.get("/search?status=active&limit=1000", headers=headers).json()
+
+    seen = []
+    cursor = None
+    while True:
+        url = "/search?status=active&limit=7" + (f"&cursor={cursor}" if cursor else "")
+        data = client.get(url, headers=headers).json()
+        assert data["total_count"] == offset_page["total_count"]
+        seen.extend(data["employees"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == offset_page["employees"]
+
+
+def test_cursor_and_offset_are_exclusive():
+    first = client.get("/search?limit=5", headers={"X-Organization-ID": "org_1"}).json()
+
+    response = client.get(
+        f"/search?limit=5&offset=5&cursor={first['next_cursor']}",
+        headers={"X-Organization-ID": "org_1"}
+    )
+    assert response.status_code == 400
+
+
+def test_invalid_cursor():
+    response = client.get("/search?cursor=not-a-cursor", headers={"X-Organization-ID": "org_1"})
+
+    assert response.status_code == 400
+
+
+def test_offset_is_bounded():
+    response = client.get("/search?offset=1000000", headers={"X-Organization-ID": "org_1"})
+
+    assert response.status_code == 422
+
+
+def test_search_without_available_filters():
+    response = client.get("/search?include_filters=false", headers={"X-Organization-ID": "org_1"})
+
+    assert response.status_code == 200
+    assert response.json()["available_filters"] is None
+
+
+def test_available_filters_cache_is_invalidated_on_write(tmp_path):
+    database = Database(str(tmp_path / "facets.db"))
+    assert "mumbai" not in database.get_available_filters("org_1")["locations"]
+    assert database.get_available_filters("org_1") is database.get_available_filters("org_1")
+
+    with database.write_pool.connection() as conn:
+        conn.execute("UPDATE employees SET location = 'mumbai' WHERE id = 'e_org1_0'")
+        conn.commit()
+    database.record_write(["org_1"])
+
+    assert "mumbai" in database.get_available_filters("org_1")["locations"]
+    database.close()
+
+
+def test_capped_count_mode():
+    headers = {"X-Organization-ID": "org_1"}
+    exact = client.get("/search", headers=headers).json()
+    capped = client.get("/search?count_mode=capped&count_cap=100", headers=headers).json()
+    under_cap = client.get("/search?status=active&count_mode=capped&count_cap=100", headers=headers).json()
+
+    assert exact["total_count"] == 200
+    assert exact["total_count_exact"] is True
+    assert capped["total_count"] == 100
+    assert capped["total_count_exact"] is False
+    assert capped["employees"] == exact["employees"]
+    assert under_cap["total_count"] == 67
+    assert under_cap["total_count_exact"] is True
+
+
+def test_total_count_past_last_page():
+    response = client.get("/search?status=active&offset=500", headers={"X-Organization-ID": "org_1"})
+
+    data = response.json()
+    assert data["employees"] == []
+    assert data["total_count"] == 67
+
+
+def test_facet_counts():
+    response = client.get("/facets", headers={"X-Organization-ID": "org_1"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_count"] == 200
+    assert data["status"] == {"active": 67, "not_started": 67, "terminated": 66}
+    assert sum(data["locations"].values()) == 200
+    assert sum(data["positions"].values()) == 200
+
+
+def test_facet_counts_follow_filters():
+    headers = {"X-Organization-ID": "org_1"}
+    facets = client.get("/facets?status=active&location=new_york", headers=headers).json()
+    search = client.get("/search?status=active&location=new_york&department=engineering", headers=headers).json()
+
+    assert facets["status"] == {"active": facets["total_count"]}
+    assert facets["locations"] == {"new_york": facets["total_count"]}
+    assert facets["departments"]["engineering"] == search["total_count"]
+
+
+def test_search_returns_only_organization_columns():
+    response = client.get("/search?limit=3", headers={"X-Organization-ID": "org_2"})
+
+    data = response.json()
+    assert data["columns"] == get_organization_columns("org_2")
+    for employee in data["employees"]:
+        assert list(employee) == data["columns"]
+
+
+def test_column_projection_is_pushed_into_sql():
+    search = EmployeeSearch()
+    employees, total_count = search.db.search_employees("org_1", {"status": "active"}, 3, 0, columns=["email"])
+
+    assert total_count == 67
+    assert all(list(employee) == ["email"] for employee in employees)
+    with pytest.raises(ValueError):
+        search.db.search_employees("org_1", {}, 3, 0, columns=["email; DROP TABLE employees"])
+
+
+def test_columnar_response_shape():
+    headers = {"X-Organization-ID": "org_1"}
+    rows = client.get("/search?status=active&limit=5", headers=headers).json()
+    columnar = client.get("/search?status=active&limit=5&shape=columnar", headers=headers).json()
+
+    assert "employees" not in columnar
+    assert columnar["columns"] == rows["columns"]
+    assert columnar["rows"] == [[e[c] for c in rows["columns"]] for e in rows["employees"]]
+    assert columnar["total_count"] == rows["total_count"]
+    assert columnar["next_cursor"] == rows["next_cursor"]
+
+
+def test_fast_response_matches_response_model():
+    data = client.get("/search?limit=2", headers={"X-Organization-ID": "org_1"}).json()
+
+    assert EmployeeSearchResponse(**data).model_dump() == data
+
+
+def test_invalid_response_shape():
+    response = client.get("/search?shape=xml", headers={"X-Organization-ID": "org_1"})
+
+    assert response.status_code == 400
+
+
+def test_dumps_without_orjson(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+
+    assert serialization.dumps({"name": "Zoë", "count": 1}) == '{"name":"Zoë","count":1}'.encode("utf-8")
+
+
+def test_export_streams_ndjson():
+    headers = {"X-Organization-ID": "org_1"}
+    response = client.get("/search/export?status=active", headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert len(lines) == 67
+    first = json.loads(lines[0])
+    assert list(first) == get_organization_columns("org_1")
+    assert first == client.get("/search?status=active&limit=1", headers=headers).json()["employees"][0]
+    assert EmployeeSearch().db.read_pool.stats()["in_use"] == 0
+
+
+def test_export_streams_csv():
+    response = client.get("/search/export?format=csv&location=paris", headers={"X-Organization-ID": "org_2"})
+
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == get_organization_columns("org_2")
+    assert len(rows) == 1 + 66
+
+
+def test_export_releases_connection_when_abandoned():
+    database = EmployeeSearch().db
+    stream = database.stream_employees("org_1", {}, batch_size=10)
+    next(stream)
+    assert database.export_pool.stats()["in_use"] == 1
+    assert database.read_pool.stats()["in_use"] == 0
+
+    del stream
+    assert database.export_pool.stats()["in_use"] == 0
+
+
+def test_exports_beyond_the_limit_are_turned_away(tmp_path):
+    database = Database(str(tmp_path / "exports.db"), seed_sample_data=True)
+    try:
+        streams = [database.stream_employees("org_1", {}, batch_size=10)
+                   for _ in range(database.export_pool.max_size)]
+        with pytest.raises(ExportLimitError):
+            database.stream_employees("org_1", {})
+        # Searches do not share the exports' connections
+        assert database.search_employees("org_1", {}, 5, 0)[1] == 200
+
+        streams.pop().close()
+        assert len(next(database.stream_employees("org_1", {}, batch_size=10))) == 10
+    finally:
+        database.close()
+
+
+def test_search_results_are_cached_until_write(tmp_path):
+    database = Database(str(tmp_path / "results.db"))
+    first, total = database.search_employees("org_1", {"status": ["active"]}, 5, 0)
+    first[0]["first_name"] = "mutated by caller"
+
+    before = database.result_cache.stats()
+    second, _ = database.search_employees("org_1", {"status": "active"}, 5, 0)
+    assert database.result_cache.stats()["hits"] == before["hits"] + 1
+    assert second[0]["first_name"] != "mutated by caller"
+
+    with database.write_pool.connection() as conn:
+        conn.execute("UPDATE employees SET status = 'terminated' WHERE id = ?", (second[0]["id"],))
+        conn.commit()
+    database.record_write(["org_1"])
+
+    _, total_after_write = database.search_employees("org_1", {"status": "active"}, 5, 0)
+    assert total_after_write == total - 1
+    database.close()
+
+
+def test_batch_search_matches_individual_searches():
+    headers = {"X-Organization-ID": "org_1", "X-Client-ID": "batch-equivalence"}
+    searches = [
+        {"department": ["engineering"], "limit": 5},
+        {"status": ["active"], "location": ["london", "tokyo"], "limit": 3, "offset": 2},
+        {"query": "han1", "count_mode": "capped", "count_cap": 10, "limit": 2},
+        {"position": "engineer", "limit": 1000},
+    ]
+    response = client.post("/search/batch", json={"searches": searches}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["available_filters"] == client.get("/filters", headers=headers).json()
+
+    for search, result in zip(searches, data["results"]):
+        single = client.get("/search", params={**search, "include_filters": False}, headers=headers).json()
+        single.pop("available_filters")
+        assert result == single
+
+    columnar = client.post("/search/batch", json={"searches": searches[:1], "shape": "columnar",
+                                                  "include_filters": False}, headers=headers).json()
+    assert columnar["available_filters"] is None
+    assert len(columnar["results"][0]["rows"]) == 5
+
+
+def test_batch_search_validation_and_rate_limit():
+    headers = {"X-Organization-ID": "org_1", "X-Client-ID": "batch-rate-limit"}
+    assert client.post("/search/batch", json={"searches": []}, headers=headers).status_code == 422
+    assert client.post("/search/batch", json={"searches": [{}] * 51}, headers=headers).status_code == 400
+    invalid = client.post("/search/batch", json={"searches": [{"cursor": "x", "offset": 5}]}, headers=headers)
+    assert invalid.status_code == 400
+
+    # Charged one request per search, against the same 100 per minute as /search
+    assert client.post("/search/batch", json={"searches": [{}] * 50}, headers=headers).status_code == 200
+    assert client.post("/search/batch", json={"searches": [{}] * 49}, headers=headers).status_code == 200
+    assert client.post("/search/batch", json={"searches": [{}] * 2}, headers=headers).status_code == 429
+    assert client.get("/search", headers=headers).status_code == 429
+
+
+def test_batch_search_shares_one_snapshot_across_connections(tmp_path, monkeypatch):
+    database = Database(str(tmp_path / "batch.db"))
+    searches = [{"filters": {"status": [status]}, "limit": 3, "offset": 0}
+                for status in ("active", "not_started", "terminated")] * 2
+    expected = [database.search_employees("org_1", **search) for search in searches]
+    database.result_cache.invalidate(lambda key: True)
+
+    monkeypatch.setattr(config, "BATCH_SEARCH_PARALLELISM", 3)
+    results, available_filters = database.search_employees_batch("org_1", searches, include_filters=True)
+    assert results == expected
+    assert available_filters == database.get_available_filters("org_1")
+    assert database.result_cache.stats()["size"] == 3
+
+    # A helper whose transaction sees a different change log position leaves its share to the caller
+    with database.write_pool.connection() as conn:
+        conn.execute("UPDATE employees SET department = 'sales' WHERE id = 'e_org1_0'")
+        conn.commit()
+    with database.read_pool.connection() as conn:
+        position = change_log_position(conn)
+    pending = [(0, None, searches[0])]
+    assert database._run_searches_at(position - 1, "org_1", pending) is None
+    assert database._run_searches_at(position, "org_1", pending)[0][2][2] == 67
+    database.close()
+
+
+def test_concurrent_batches_do_not_starve_the_read_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_POOL_SIZE", 2)
+    monkeypatch.setattr(config, "DB_POOL_TIMEOUT", 0.5)
+    monkeypatch.setattr(config, "BATCH_SEARCH_PARALLELISM", 3)
+    database = Database(str(tmp_path / "batches.db"), seed_sample_data=True)
+    database.result_cache.maxsize = 0
+    searches = [{"filters": {"department": [department]}, "limit": 20, "offset": offset}
+                for department in ("engineering", "sales", "hr") for offset in (0, 20)]
+    expected = [database.search_employees("org_1", **search) for search in searches]
+
+    start = threading.Barrier(database.read_pool.max_size)
+    results, errors = [], []
+
+    def run_batches():
+        start.wait()
+        try:
+            for _ in range(10):
+                results.append(database.search_employees_batch("org_1", searches)[0])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run_batches) for _ in range(database.read_pool.max_size)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    database.close()
+
+    assert errors == []
+    assert all(result == expected for result in results) and len(results) == 20
+    assert database.read_pool.stats()["timeouts"] == 0
+
+
+def test_search_and_filters_answer_304_until_the_organization_changes(tmp_path):
+    headers = {"X-Organization-ID": "org_etag"}
+    first = client.get("/search", headers=headers)
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == config.HTTP_CACHE_CONTROL
+    assert first.headers["vary"] == "X-Organization-ID"
+
+    not_modified = client.get("/search", headers={**headers, "If-None-Match": f'"other", {etag}'})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+    # Parameters that would fail the search fail the same way with a matching ETag
+    for params in ("cursor=garbage", "count_mode=approximate", "query=kha&query_mode=regex",
+                   "query=kha&query_mode=prefix&cursor=WyJhIiwiYiIsImMiXQ"):
+        assert client.get(f"/search?{params}", headers={**headers, "If-None-Match": etag}).status_code == 400
+    filters_etag = client.get("/filters", headers=headers).headers["etag"]
+    assert client.get("/filters", headers={**headers, "If-None-Match": filters_etag}).status_code == 304
+
+    # A write from another process, which this one only notices through the database file
+    org_1_etag = client.get("/search", headers={"X-Organization-ID": "org_1"}).headers["etag"]
+    conn = sqlite3.connect(get_database().db_path)
+    conn.execute("""
+        INSERT INTO employees (id, organization_id, first_name, last_name, email, status, department, location,
+                               company, position)
+        VALUES ('etag_1', 'org_etag', 'Etag', 'Person', 'etag@example.com', 'active', 'it', 'paris',
+                'headquarters', 'Engineer')
+    """)
+    conn.commit()
+    conn.close()
+
+    changed = client.get("/search", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    # Cached results are retired by the same version, so the new tag comes with the new rows
+    assert changed.json()["total_count"] == 1
+    assert client.get("/filters", headers={**headers, "If-None-Match": filters_etag}).status_code == 200
+    assert client.get("/search", headers={"X-Organization-ID": "org_1",
+                                          "If-None-Match": org_1_etag}).status_code == 304
+
+
+
+def test_organization_versions_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "ORGANIZATION_VERSION_CACHE_SIZE", 4)
+    database = Database(str(tmp_path / "versions.db"), seed_sample_data=True)
+    try:
+        org_1_version = database.organization_version("org_1")
+        for index in range(50):
+            assert database.organization_version(f"org_random_{index}") == 0
+        assert len(database._organization_versions) == 4
+        assert database.organization_version("org_1") == org_1_version
+    finally:
+        database.close()
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
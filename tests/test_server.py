@@ -0,0 +1,81 @@
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get(port, path, organization_id="org_1"):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", headers={"X-Organization-ID": organization_id})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return response.status, response.headers, json.loads(response.read())
+
+
+def workers(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as children:
+        return set(map(int, children.read().split()))
+
+
+def wait_until(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return
+        except (OSError, urllib.error.URLError):
+            pass
+        time.sleep(0.1)
+    raise AssertionError("timed out")
+
+
+@pytest.mark.skipif(not os.path.exists(f"/proc/{os.getpid()}/task/{os.getpid()}/children"),
+                    reason="needs /proc to list worker processes")
+def test_workers_share_the_socket_and_are_recycled(tmp_path):
+    port = free_port()
+    db_path = str(tmp_path / "employees.db")
+    env = dict(os.environ, DATABASE_PATH=db_path, SEED_SAMPLE_DATA="true", DB_WARMUP_CONNECTIONS="1",
+               WORKER_MAX_REQUESTS="5", WORKER_GRACEFUL_TIMEOUT="5",
+               RATE_LIMIT_SHM_PATH=str(tmp_path / "rate_limit"))
+    supervisor = subprocess.Popen([sys.executable, "-m", "app.server", "--workers", "2", "--host", "127.0.0.1",
+                                   "--port", str(port)], cwd=ROOT, env=env)
+    try:
+        wait_until(lambda: get(port, "/ready")[0] == 200 and len(workers(supervisor.pid)) == 2)
+        first = workers(supervisor.pid)
+
+        # Every request is answered while workers retire after five and are replaced
+        etag = None
+        for _ in range(20):
+            status, headers, body = get(port, "/search?limit=1")
+            assert status == 200 and body["total_count"] == 200
+            assert etag in (None, headers["ETag"])
+            etag = headers["ETag"]
+        wait_until(lambda: len(workers(supervisor.pid)) == 2 and not first & workers(supervisor.pid))
+
+        # A write from another process reaches every worker
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("UPDATE employees SET status = 'terminated' WHERE id = 'e_org1_0'")
+        for _ in range(4):
+            assert get(port, "/search?limit=1")[1]["ETag"] != etag
+
+        before = workers(supervisor.pid)
+        supervisor.send_signal(signal.SIGHUP)
+        wait_until(lambda: len(workers(supervisor.pid)) == 2 and not before & workers(supervisor.pid))
+        wait_until(lambda: get(port, "/ready")[0] == 200)
+    finally:
+        supervisor.send_signal(signal.SIGTERM)
+        assert supervisor.wait(timeout=30) == 0
@@ -0,0 +1,127 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.ingest import ingest_records
+from app.sharding import (
+    ShardedDatabase, dedicated_shard_name, hash_shard, isolate_large_organizations, move_organization
+)
+
+
+def organization_rows(path, organization_id):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM employees WHERE organization_id = ?", (organization_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def employees(organization_id, count):
+    return [(i, {"id": f"{organization_id}_{i}", "first_name": f"Shard{i}", "last_name": "Tenant",
+                 "email": f"shard{i}@example.com", "status": "active", "department": "engineering",
+                 "location": "berlin", "company": "headquarters", "position": "Engineer"})
+            for i in range(count)]
+
+
+@pytest.fixture
+def router(tmp_path):
+    router = ShardedDatabase(str(tmp_path / "employees.db"), shards=2, replicas=0, seed_sample_data=True,
+                             catalog_refresh_interval=0)
+    yield router
+    router.close()
+
+
+def test_organizations_are_routed_to_their_hash_shard(router):
+    for organization_id in ("org_1", "org_2"):
+        shard = hash_shard(organization_id, 2)
+        assert router.shard_name(organization_id) == shard
+        assert organization_rows(router.shard_path(shard), organization_id) == 200
+        _, total_count = router.search_employees(organization_id, {}, 10, 0)
+        assert total_count == 200
+    assert router.get_available_filters("org_2")["locations"] == ["berlin", "london", "paris"]
+
+    ingest_records(router, "org_new", employees("org_new", 30))
+    assert organization_rows(router.shard_path(hash_shard("org_new", 2)), "org_new") == 30
+    assert router.get_facet_counts("org_new", {})["total_count"] == 30
+
+
+def test_move_organization_to_a_dedicated_shard(router, tmp_path):
+    source = router.shard_path(router.shard_name("org_1"))
+    before = router.search_employees("org_1", {"status": "active"}, 20, 0)
+
+    assert move_organization(router, "org_1", "big", grace_seconds=0) == 200
+    assert organization_rows(source, "org_1") == 0
+    assert organization_rows(router.shard_path("big"), "org_1") == 200
+    assert router.search_employees("org_1", {"status": "active"}, 20, 0) == before
+    assert move_organization(router, "org_1", "big", grace_seconds=0) == 0
+
+    # Another process sees the move through the catalog and opens the new shard
+    other = ShardedDatabase(str(tmp_path / "employees.db"), shards=2, replicas=0, seed_sample_data=False)
+    try:
+        assert other.shard_name("org_1") == "big"
+        assert other.search_employees("org_1", {"status": "active"}, 20, 0) == before
+    finally:
+        other.close()
+
+
+def test_writes_waiting_on_a_move_follow_the_organization(router, tmp_path):
+    source = router.shard_path(router.shard_name("org_1"))
+    # Another process, whose catalog would not look for moves on its own for a minute
+    writer = ShardedDatabase(str(tmp_path / "employees.db"), shards=2, replicas=0, seed_sample_data=False,
+                             catalog_refresh_interval=60)
+    try:
+        assert writer.shard_name("org_1") != "big"
+        mover = threading.Thread(target=move_organization, args=(router, "org_1", "big"),
+                                 kwargs={"grace_seconds": 0.5})
+        mover.start()
+        time.sleep(0.2)
+        # Picks the source shard, then waits on its write lock until the move is done
+        assert ingest_records(writer, "org_1", employees("org_1", 10))["rows_written"] == 10
+        mover.join()
+
+        assert organization_rows(source, "org_1") == 0
+        assert organization_rows(router.shard_path("big"), "org_1") == 210
+    finally:
+        writer.close()
+
+
+def test_isolate_moves_only_large_organizations_that_share_a_shard(tmp_path):
+    router = ShardedDatabase(str(tmp_path / "employees.db"), shards=1, replicas=0, seed_sample_data=True)
+    try:
+        ingest_records(router, "org_small", employees("org_small", 5))
+        assert isolate_large_organizations(router, min_rows=100, grace_seconds=0) == [
+            ("org_1", dedicated_shard_name("org_1"), 200),
+            ("org_2", dedicated_shard_name("org_2"), 200),
+        ]
+        assert router.organization_counts()["0"] == {"org_small": 5}
+        assert isolate_large_organizations(router, min_rows=100, grace_seconds=0) == []
+    finally:
+        router.close()
+
+
+def test_replicas_serve_reads_only_while_current(tmp_path):
+    router = ShardedDatabase(str(tmp_path / "employees.db"), shards=1, replicas=2, seed_sample_data=True,
+                             replica_refresh_interval=3600)
+    try:
+        replica_set = router.shard("0").read_pool
+        replica_set.refresh()
+        before = router.search_employees("org_1", {"status": "active"}, 5, 0)
+        for _ in range(6):
+            router.get_facet_counts("org_1", {})
+        assert replica_set.replica_reads == 4
+
+        ingest_records(router, "org_1", employees("org_1", 3))
+        reads = replica_set.replica_reads
+        _, total_count = router.search_employees("org_1", {"status": "active"}, 5, 0)
+        assert total_count == before[1] + 3
+        assert replica_set.replica_reads == reads
+
+        replica_set.refresh()
+        assert replica_set.stats()["replicas"]["count"] == 2
+        for _ in range(3):
+            assert router.get_facet_counts("org_1", {})["total_count"] == 203
+        assert replica_set.replica_reads == reads + 2
+    finally:
+        router.close()
@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.database import Database, get_database
+from app.main import app
+
+
+def test_importing_the_app_does_not_open_the_database(tmp_path):
+    path = tmp_path / "lazy.db"
+    code = ("import app.main, app.database as database, app.search as search; "
+            "assert database._database is None and search._columnar_engine is None")
+    env = dict(os.environ, DATABASE_PATH=str(path))
+    subprocess.run([sys.executable, "-c", code], check=True, env=env,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert not path.exists()
+
+
+def test_sample_data_is_opt_in(tmp_path):
+    database = Database(str(tmp_path / "empty.db"), seed_sample_data=False)
+    assert database.search_employees("org_1", {}, 5, 0) == ([], 0)
+    database.close()
+
+
+def test_concurrent_initialization_seeds_once(tmp_path):
+    path = str(tmp_path / "shared.db")
+    databases, errors = [], []
+
+    def open_database():
+        try:
+            databases.append(Database(path, seed_sample_data=True))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=open_database) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for database in databases:
+        database.close()
+
+    assert errors == []
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM employees").fetchone()[0] == 400
+    conn.close()
+
+
+def test_warmup_opens_read_connections(tmp_path):
+    database = Database(str(tmp_path / "warm.db"))
+    assert database.warmup(3) == 3
+    stats = database.read_pool.stats()
+    assert stats["size"] == 3 and stats["in_use"] == 0
+    database.close()
+
+
+def test_lifespan_reports_readiness_and_closes_the_database():
+    assert TestClient(app).get("/ready").status_code == 503
+
+    with TestClient(app) as client:
+        database = get_database()
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert set(response.json()["startup_ms"]) == {"imports", "database", "warmup", "ready"}
+        assert 'process_startup_seconds{phase="ready"}' in client.get("/metrics").text
+
+    assert database.read_pool._closed
+    assert get_database() is not database
@@ -0,0 +1,139 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import Database
+from app.ingest import ingest_records
+from app.main import app
+from app.suggest import Suggester, sqlite_suggest
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "employees.db"), seed_sample_data=True)
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def suggester(db):
+    suggester = Suggester(db, max_orgs=2, max_rows=1000)
+    suggester.load("org_1")
+    suggester.load("org_2")
+    yield suggester
+    suggester.close()
+
+
+def employee(employee_id, first_name, last_name, status="active"):
+    return {"id": employee_id, "first_name": first_name, "last_name": last_name,
+            "email": f"{first_name.lower()}.{last_name.lower()}@org1.com", "status": status,
+            "department": "engineering", "location": "london", "company": "headquarters",
+            "position": "Engineer"}
+
+
+def names(suggestions):
+    return [f"{suggestion['first_name']} {suggestion['last_name']}" for suggestion in suggestions]
+
+
+def test_prefix_suggestions_from_the_index(suggester):
+    suggestions = suggester.suggest("org_1", "kha19", limit=5)
+    assert names(suggestions) == ["Kha19 Phan19", "Kha190 Phan190", "Kha191 Phan191", "Kha192 Phan192",
+                                  "Kha193 Phan193"]
+    assert suggestions[0] == {"id": "e_org1_19", "first_name": "Kha19", "last_name": "Phan19",
+                              "email": "kha.phan19@org1.com", "fuzzy": False}
+    assert names(suggester.suggest("org_1", "phan12 kha", limit=5)) == ["Kha12 Phan12", "Kha120 Phan120",
+                                                                      "Kha121 Phan121", "Kha122 Phan122",
+                                                                      "Kha123 Phan123"]
+    assert names(suggester.suggest("org_1", "kha.phan7@", limit=5)) == ["Kha7 Phan7"]
+    assert suggester.suggest("org_1", "nobody") == []
+    assert suggester.stats()["hits"] == 4
+
+
+def test_fuzzy_suggestions_come_after_exact_ones(suggester):
+    assert suggester.suggest("org_1", "kah19") == []
+    suggestions = suggester.suggest("org_1", "kah19", limit=3, fuzzy=True)
+    assert names(suggestions) == ["Kha19 Phan19", "Kha190 Phan190", "Kha191 Phan191"]
+    assert all(suggestion["fuzzy"] for suggestion in suggestions)
+
+    exact_first = suggester.suggest("org_1", "kha1", limit=200, fuzzy=True)
+    flags = [suggestion["fuzzy"] for suggestion in exact_first]
+    assert flags == sorted(flags) and not flags[0] and flags[-1]
+
+
+def test_status_filter_and_hidden_email(suggester):
+    suggestions = suggester.suggest("org_1", "kha1", limit=50, status=["terminated"])
+    assert suggestions and all(int(suggestion["id"].rsplit("_", 1)[1]) % 3 == 2 for suggestion in suggestions)
+
+    # org_2 does not show email: it is neither returned nor matched
+    assert "email" not in suggester.suggest("org_2", "andy1")[0]
+    assert suggester.suggest("org_2", "andy.nguyen1") == []
+
+
+def test_index_follows_writes_through_the_change_log(db, suggester):
+    ingest_records(db, "org_1", [(1, employee("new_1", "Zelda", "Quintero")),
+                                 (2, employee("e_org1_5", "Renamed", "Person"))])
+
+    assert names(suggester.suggest("org_1", "zel")) == ["Zelda Quintero"]
+    assert names(suggester.suggest("org_1", "renamed")) == ["Renamed Person"]
+    # The old name's keys are still in the index but no longer match the row
+    assert "Kha5 Phan5" not in names(suggester.suggest("org_1", "kha5", limit=20))
+    assert suggester.stats()["updates"] == 1
+
+    with db.write_pool.connection() as conn:
+        conn.execute("DELETE FROM employees WHERE id = 'new_1'")
+        conn.commit()
+    assert suggester.suggest("org_1", "zel") == []
+    assert suggester.stats()["loads"] == 2
+
+
+def test_sqlite_fallback_matches_the_index(db, suggester):
+    with db.read_pool.connection() as conn:
+        for organization_id, query in (("org_1", "kha19"), ("org_1", "phan12 kha"), ("org_2", "smith3")):
+            include_email = organization_id == "org_1"
+            expected = suggester.suggest(organization_id, query, limit=50)
+            fallback = sqlite_suggest(conn, db.fts_enabled, organization_id, query.split(), 50, None, include_email)
+            assert sorted(names(fallback)) == sorted(names(expected))
+            assert sqlite_suggest(conn, False, organization_id, query.split(), 50, None, include_email) == fallback
+
+
+def test_unindexed_organization_falls_back_and_loads_in_the_background(db):
+    suggester = Suggester(db, max_orgs=1, max_rows=1000, hot_threshold=2)
+    try:
+        assert names(suggester.suggest("org_1", "kha19", limit=2)) == ["Kha19 Phan19", "Kha190 Phan190"]
+        assert suggester.stats()["loads"] == 0
+        suggester.suggest("org_1", "kha19", limit=2)
+        assert suggester.stats()["fallbacks"] == 2
+        suggester.close()
+        assert suggester.stats()["organizations"] == 1 and suggester.stats()["keys"] == 600
+    finally:
+        suggester.close()
+
+    too_small = Suggester(db, max_orgs=1, max_rows=100)
+    assert too_small.load("org_1") is None
+    assert too_small.stats()["too_large"] == 1
+    too_small.close()
+
+
+def test_organizations_without_employees_get_no_index(suggester):
+    for index in range(3):
+        for _ in range(2):
+            assert suggester.suggest(f"org_missing_{index}", "kha") == []
+    suggester.close()
+    assert set(suggester._indexes) == {"org_1", "org_2"}
+    assert set(suggester._empty) == {"org_missing_0", "org_missing_1", "org_missing_2"}
+
+    # Remembered as empty, so further lookups do not load again
+    loads = suggester.stats()["loads"]
+    suggester.suggest("org_missing_0", "kha")
+    suggester.suggest("org_missing_0", "kha")
+    assert suggester.stats()["loads"] == loads and not suggester._loading
+
+
+def test_suggest_endpoint():
+    with TestClient(app) as client:
+        response = client.get("/suggest?query=kha19&fuzzy=true&limit=2", headers={"X-Organization-ID": "org_1"})
+        assert response.status_code == 200
+        assert names(response.json()["suggestions"]) == ["Kha19 Phan19", "Kha190 Phan190"]
+
+        response = client.get("/suggest?query=andy1&limit=1", headers={"X-Organization-ID": "org_2"})
+        assert "email" not in response.json()["suggestions"][0]
+        assert client.get("/suggest?query=", headers={"X-Organization-ID": "org_1"}).status_code == 422